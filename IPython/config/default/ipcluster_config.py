@@ -26,6 +26,7 @@ c = get_config()
 
 # Options are:
 # - LocalEngineSetLauncher
+# - LocalForkEngineSetLauncher
 # - MPIExecEngineSetLauncher
 # - PBSEngineSetLauncher
 # - WindowsHPCEngineSetLauncher
@@ -64,6 +65,35 @@ c = get_config()
 # Command line argument passed to the engines.
 # c.LocalEngineSetLauncher.engine_args = ['--log-to-file','--log-level', '40']
 
+# The fork launcher starts one ipengine that forks the engines.
+# c.LocalForkEngineSetLauncher.engine_args = ['--log-to-file','--log-level', '40']
+
+#-----------------------------------------------------------------------------
+# Autoscaling
+#-----------------------------------------------------------------------------
+
+# Add engines when tasks are waiting and retire idle engines. New engines are
+# started with new instances of Global.engine_launcher.
+# c.Global.autoscale = False
+
+# The bounds on the number of engines.
+# c.Autoscaler.min_engines = 1
+# c.Autoscaler.max_engines = 8
+
+# Add engines when there are more than this many scheduled tasks per engine,
+# or when a task has been waiting for an engine longer than wait_threshold
+# seconds.
+# c.Autoscaler.queue_threshold = 1.0
+# c.Autoscaler.wait_threshold = 10.0
+
+# Retire engines that have been idle this many seconds.
+# c.Autoscaler.idle_timeout = 60.0
+
+# The maximum number of engines to add at once and the time in seconds
+# between two looks at the task queue.
+# c.Autoscaler.step = 4
+# c.Autoscaler.interval = 1.0
+
 #-----------------------------------------------------------------------------
 # MPIExec launchers
 #-----------------------------------------------------------------------------
@@ -35,6 +35,16 @@ c = get_config()
 # will override the values set for the client and engine connections below.
 # c.Global.secure = True
 
+# Send runs of consecutive push/execute/pull commands that are queued for an
+# engine in a single network call. This cuts the number of round trips for
+# pipelined workloads.
+# c.Global.pipeline = False
+
+# Discard the results of block=False multiengine calls that clients have not
+# collected this many seconds after they are ready. None keeps them until
+# they are collected.
+# c.Global.result_timeout = None
+
 # The working directory for the process. The application will use os.chdir
 # to change to this directory before starting.
 # c.Global.work_dir = os.getcwd()
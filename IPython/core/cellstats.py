@@ -0,0 +1,230 @@
+""" Per cell timing and resource instrumentation """
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010 The IPython Development Team.
+#
+#  Distributed under the terms of the BSD License.
+#
+#  The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+from __future__ import print_function
+
+# Stdlib imports
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+# Our own packages
+from IPython.config.configurable import Configurable
+from IPython.core.error import UsageError
+from IPython.utils.sizeof import format_bytes
+from IPython.utils.timing import format_time
+from IPython.utils.traitlets import Bool, Instance
+
+#-----------------------------------------------------------------------------
+# Classes and functions
+#-----------------------------------------------------------------------------
+
+# What is recorded for each cell, in the order of the columns of the
+# cell_stats table of the history database.
+#   wall, cpu: wall clock and CPU (user+system) time, in seconds
+#   peak_rss_delta: how much the peak resident set size grew, in bytes
+#   compile, prefilter, display: the time spent compiling the cell, in
+#     IPython's input transformations and in the displayhook, in seconds
+#   iopub_bytes: the bytes published by the kernel for this cell
+stats_fields = ('wall', 'cpu', 'peak_rss_delta', 'compile', 'prefilter',
+                'display', 'iopub_bytes')
+
+
+def _cpu_time():
+    if resource is None:
+        return time.clock()
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _peak_rss():
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, OS X bytes.
+    if sys.platform != 'darwin':
+        peak *= 1024
+    return peak
+
+
+class _Phase(object):
+    """Add the time spent in a with block to a field of the current cell."""
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+
+    def __exit__(self, *exc_info):
+        self.stats[self.name] += time.time() - self.start
+
+
+class _NoPhase(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+_no_phase = _NoPhase()
+
+
+class CellStats(Configurable):
+    """Record how long each cell took and what it cost.
+
+    When enabled, :meth:`begin` and :meth:`end` are called around each cell
+    by ``run_cell`` (and around each ``execute_request`` by the kernel, which
+    also counts what it publishes).  The statistics of each cell are stored
+    in the history database, next to its input, and the ones of the last
+    cell are kept in :attr:`last`.
+    """
+
+    # Off by default: it costs a few getrusage() calls per cell.
+    enabled = Bool(False, config=True)
+
+    shell = Instance('IPython.core.interactiveshell.InteractiveShellABC')
+
+    # The statistics of the last cell, a dict with stats_fields as keys.
+    last = Instance(dict, allow_none=True)
+
+    def __init__(self, shell, config=None):
+        super(CellStats, self).__init__(shell=shell, config=config)
+        self.current = None
+        self._depth = 0
+
+    def begin(self):
+        """Start recording the cell about to run.
+
+        Calls can be nested, only the outermost pair records anything.
+        """
+        if not self.enabled and not self._depth:
+            return
+        self._depth += 1
+        if self._depth > 1:
+            return
+        self.current = dict.fromkeys(stats_fields, 0)
+        self._line = self.shell.execution_count
+        self._wall = time.time()
+        self._cpu = _cpu_time()
+        self._rss = _peak_rss()
+
+    def end(self):
+        """Finish recording, store and return the statistics of the cell.
+
+        None is returned if nothing was recorded or nothing was run.
+        """
+        if not self._depth:
+            return None
+        self._depth -= 1
+        if self._depth:
+            return None
+        stats, self.current = self.current, None
+        if self.shell.execution_count == self._line:
+            # A blank cell, or one that didn't go in the history.
+            return None
+        stats['wall'] = time.time() - self._wall
+        stats['cpu'] = _cpu_time() - self._cpu
+        stats['peak_rss_delta'] = _peak_rss() - self._rss
+        self.last = stats
+        self.shell.history_manager.store_stats(self._line, stats)
+        return stats
+
+    def phase(self, name):
+        """Return a context manager timing a phase of the current cell."""
+        if self.current is None:
+            return _no_phase
+        return _Phase(self.current, name)
+
+    def add(self, name, value):
+        """Add value to a field of the current cell, if one is recorded."""
+        if self.current is not None:
+            self.current[name] += value
+
+
+def magic_stats(self, parameter_s=''):
+    """Show the cells that took the longest to run.
+
+    Usage:
+      %stats on
+      %stats off
+      %stats [-n N] [-s field] [-g]
+
+    With 'on', the wall and CPU time, the growth of the peak memory use, the
+    time spent compiling, transforming the input and displaying the result,
+    and (in the kernel) the bytes published of every cell are recorded in
+    the history database. This can also be turned on at startup with
+    CellStats.enabled = True in the configuration.
+
+    Without arguments, the 10 slowest cells of this session are shown.
+
+    Options:
+
+      -n N: show N cells.
+
+      -s field: sort by this field rather than wall. One of: wall, cpu,
+      peak_rss_delta, compile, prefilter, display, iopub_bytes.
+
+      -g: look at all the sessions in the history database, not only the
+      current one.
+    """
+    opts, args = self.parse_options(parameter_s, 'n:s:g')
+    cell_stats = self.shell.cell_stats
+    if args == 'on':
+        cell_stats.enabled = True
+        print('Recording the statistics of each cell.')
+        return
+    elif args == 'off':
+        cell_stats.enabled = False
+        print('No longer recording the statistics of cells.')
+        return
+    elif args:
+        raise UsageError('%%stats takes on, off or no argument: %s' % args)
+
+    n = int(opts.get('n', 10))
+    order = opts.get('s', 'wall')
+    if order not in stats_fields:
+        raise UsageError('Unknown field %r, use one of: %s' %
+                         (order, ', '.join(stats_fields)))
+    session = None if opts.has_key('g') else 0
+    rows = list(self.shell.history_manager.get_stats(session, order, n))
+    if not rows:
+        if not cell_stats.enabled:
+            print('No statistics recorded, use %stats on first.')
+        else:
+            print('No statistics recorded yet.')
+        return
+
+    print('%-9s %9s %9s %9s %9s %9s %9s %9s  %s' % ('Cell', 'wall', 'cpu',
+          'peak rss', 'compile', 'prefilter', 'display', 'iopub', 'input'))
+    for sess, line, source, stats in rows:
+        if session is None:
+            name = '%i/%i' % (sess, line)
+        else:
+            name = str(line)
+        first = (source or '').strip().split('\n')[0]
+        print('%-9s %9s %9s %9s %9s %9s %9s %9s  %s' % (name,
+              format_time(stats['wall']), format_time(stats['cpu']),
+              format_bytes(stats['peak_rss_delta']),
+              format_time(stats['compile']), format_time(stats['prefilter']),
+              format_time(stats['display']),
+              format_bytes(stats['iopub_bytes']), first[:40]))
+
+
+def init_ipython(ip):
+    ip.define_magic("stats", magic_stats)
@@ -23,6 +23,7 @@ from collections import defaultdict
 
 # Our own packages
 from IPython.config.configurable import Configurable
+from IPython.core.cellstats import stats_fields
 import IPython.utils.io
 
 from IPython.testing import decorators as testdec
@@ -75,6 +76,7 @@ class HistoryManager(Configurable):
     # The input and output caches
     db_input_cache = List()
     db_output_cache = List()
+    db_stats_cache = List()
     
     # Private interface
     # Variables used to store the three last inputs from the user.  On each new
@@ -137,6 +139,11 @@ class HistoryManager(Configurable):
         self.db.execute("""CREATE TABLE IF NOT EXISTS output_history
                         (session integer, line integer, output text,
                         PRIMARY KEY (session, line))""")
+        # Timings and resource use of cells, see IPython.core.cellstats.
+        self.db.execute("""CREATE TABLE IF NOT EXISTS cell_stats
+                        (session integer, line integer, %s,
+                        PRIMARY KEY (session, line))""" %
+                        ', '.join('%s real' % f for f in stats_fields))
         self.db.commit()
     
     def new_session(self):
@@ -208,7 +215,49 @@ class HistoryManager(Configurable):
         return cur
         
     
-    def get_tail(self, n=10, raw=True, output=False, include_latest=False):
+    def _get_latest(self, where, params, n, raw=True, output=False,
+                    unique=False, before=None):
+        """Get the n latest lines matching an SQL condition.
+
+        where and params are an SQL condition on the history table and its
+        parameters (or '' and () for all lines), n may be None for all lines.
+        unique and before are as for :meth:`get_tail`.
+
+        Returns a list of tuples as :meth:`get_range`, the latest line first.
+        """
+        table = "history." if output else ""
+        conditions = [where] if where else []
+        if before is not None:
+            session, line = before
+            conditions.append("({0}session < ? OR ({0}session == ? AND "
+                              "{0}line < ?))".format(table))
+            params = tuple(params) + (session, session, line)
+        sql = ""
+        if conditions:
+            sql = "WHERE " + " AND ".join(conditions) + " "
+        sql += "ORDER BY {0}session DESC, {0}line DESC".format(table)
+        if n is not None and not unique:
+            sql += " LIMIT ?"
+            params = tuple(params) + (n,)
+        cur = self._run_sql(sql, params, raw=raw, output=output)
+        if not unique:
+            return list(cur)
+        # SQLite reads the rows lazily, backwards through the primary key, so
+        # only what's needed to find n distinct inputs is looked at.
+        lines = []
+        seen = set()
+        for row in cur:
+            inp = row[2][0] if output else row[2]
+            if inp in seen:
+                continue
+            seen.add(inp)
+            lines.append(row)
+            if n is not None and len(lines) == n:
+                break
+        return lines
+
+    def get_tail(self, n=10, raw=True, output=False, include_latest=False,
+                 unique=False, before=None):
         """Get the last n lines from the history database.
         
         Parameters
@@ -221,22 +270,28 @@ class HistoryManager(Configurable):
           If False (default), n+1 lines are fetched, and the latest one
           is discarded. This is intended to be used where the function
           is called by a user command, which it should not return.
+        unique : bool
+          If True, only the latest occurrence of each input is returned.
+        before : (session, line) tuple, optional
+          Only get lines older than this one, to page through the history.
+          include_latest is ignored when this is given.
         
         Returns
         -------
         Tuples as :meth:`get_range`
         """
         self.writeout_cache()
-        if not include_latest:
+        drop_latest = not include_latest and before is None
+        if drop_latest:
             n += 1
-        cur = self._run_sql("ORDER BY session DESC, line DESC LIMIT ?",
-                                (n,), raw=raw, output=output)
-        if not include_latest:
-            return reversed(list(cur)[1:])
-        return reversed(list(cur))
+        lines = self._get_latest("", (), n, raw=raw, output=output,
+                                 unique=unique, before=before)
+        if drop_latest:
+            lines = lines[1:]
+        return reversed(lines)
         
     def search(self, pattern="*", raw=True, search_raw=True,
-                                                        output=False):
+               output=False, n=None, unique=False, before=None):
         """Search the database using unix glob-style matching (wildcards
         * and ?).
         
@@ -248,6 +303,10 @@ class HistoryManager(Configurable):
           If True, search the raw input, otherwise, the parsed input
         raw, output : bool
           See :meth:`get_range`
+        n : int, optional
+          If given, only the n latest matches are returned.
+        unique, before : 
+          See :meth:`get_tail`
         
         Returns
         -------
@@ -257,8 +316,13 @@ class HistoryManager(Configurable):
         if output:
             tosearch = "history." + tosearch
         self.writeout_cache()
-        return self._run_sql("WHERE %s GLOB ?" % tosearch, (pattern,),
+        where = "%s GLOB ?" % tosearch
+        if n is None and not unique and before is None:
+            return self._run_sql("WHERE " + where, (pattern,),
                                     raw=raw, output=output)
+        return reversed(self._get_latest(where, (pattern,), n, raw=raw,
+                                         output=output, unique=unique,
+                                         before=before))
                                 
     def _get_range_session(self, start=1, stop=None, raw=True, output=False):
         """Get input and output history from the current session. Called by
@@ -342,6 +406,45 @@ class HistoryManager(Configurable):
             for line in self.get_range(sess, s, e, raw=raw, output=output):
                 yield line
     
+    def get_stats(self, session=0, order='wall', n=None):
+        """Get the statistics recorded for cells, most expensive first.
+
+        Parameters
+        ----------
+        session : int or None
+          The session to look at, 0 (default) for the current one, negative
+          numbers to count back from it, or None for all sessions.
+        order : str
+          One of :data:`IPython.core.cellstats.stats_fields`, the statistic
+          to sort by (descending).
+        n : int, optional
+          Only return the first n cells.
+
+        Returns
+        -------
+        An iterator over (session, line, source, stats) tuples, where source
+        is the raw input of the cell (or None if it isn't in the history) and
+        stats a dict keyed by stats_fields.
+        """
+        if order not in stats_fields:
+            raise ValueError("Unknown cell statistic: %r" % order)
+        self.writeout_cache()
+        sql = "SELECT session, line, source_raw, %s FROM cell_stats " \
+              "LEFT JOIN history USING (session, line) " % \
+              ', '.join(stats_fields)
+        params = ()
+        if session is not None:
+            if session <= 0:
+                session += self.session_number
+            sql += "WHERE session==? "
+            params += (session,)
+        sql += "ORDER BY %s DESC" % order
+        if n is not None:
+            sql += " LIMIT ?"
+            params += (n,)
+        for row in self.db.execute(sql, params):
+            yield row[0], row[1], row[2], dict(zip(stats_fields, row[3:]))
+
     ## ----------------------------
     ## Methods for storing history:
     ## ----------------------------
@@ -410,6 +513,21 @@ class HistoryManager(Configurable):
         if self.db_cache_size <= 1:
             self.writeout_cache()
         
+    def store_stats(self, line_num, stats):
+        """Save the statistics of a cell, a dict keyed by stats_fields.
+
+        Parameters
+        ----------
+        line_num : int
+          The prompt number of the cell.
+        stats : dict
+          As recorded by :class:`IPython.core.cellstats.CellStats`.
+        """
+        row = (line_num,) + tuple(stats[f] for f in stats_fields)
+        self.db_stats_cache.append(row)
+        if self.db_cache_size <= 1:
+            self.writeout_cache()
+
     def _writeout_input_cache(self):
         for line in self.db_input_cache:
             with self.db:
@@ -422,6 +540,13 @@ class HistoryManager(Configurable):
                 self.db.execute("INSERT INTO output_history VALUES (?, ?, ?)",
                                 (self.session_number,)+line)
     
+    def _writeout_stats_cache(self):
+        for row in self.db_stats_cache:
+            with self.db:
+                self.db.execute("INSERT OR REPLACE INTO cell_stats VALUES "
+                                "(?%s)" % (', ?'*len(row)),
+                                (self.session_number,)+row)
+
     def writeout_cache(self):
         """Write any entries in the cache to the database."""
         try:
@@ -446,7 +571,27 @@ class HistoryManager(Configurable):
         finally:
             self.db_output_cache = []
 
-        
+        try:
+            self._writeout_stats_cache()
+        finally:
+            self.db_stats_cache = []
+
+
+def prefix_pattern(prefix):
+    """Return a glob pattern matching the strings starting with prefix.
+
+    The pattern can be passed to :meth:`HistoryManager.search`.
+
+    Examples
+    --------
+    In [1]: prefix_pattern('a[0]*')
+    Out[1]: 'a[[]0][*]*'
+    """
+    for char in '[*?':
+        prefix = prefix.replace(char, '\0%s]' % char)
+    return prefix.replace('\0', '[') + '*'
+
+
 # To match, e.g. ~5/8-~2/3
 range_re = re.compile(r"""
 ((?P<startsess>~?\d+)/)?
@@ -39,6 +39,7 @@ from IPython.core import shadowns
 from IPython.core import ultratb
 from IPython.core.alias import AliasManager
 from IPython.core.builtin_trap import BuiltinTrap
+from IPython.core.cellstats import CellStats
 from IPython.core.compilerop import CachingCompiler
 from IPython.core.display_trap import DisplayTrap
 from IPython.core.displayhook import DisplayHook
@@ -63,6 +64,7 @@ from IPython.utils.ipstruct import Struct
 from IPython.utils.path import get_home_dir, get_ipython_dir, HomeDirError
 from IPython.utils.pickleshare import PickleShareDB
 from IPython.utils.process import system, getoutput
+from IPython.utils.sizeof import estimate_size
 from IPython.utils.strdispatch import StrDispatch
 from IPython.utils.syspathcontext import prepended_to_syspath
 from IPython.utils.text import num_ini_spaces, format_screen, LSString, SList
@@ -225,6 +227,11 @@ class InteractiveShell(Configurable, Magic):
     plugin_manager = Instance('IPython.core.plugin.PluginManager')
     payload_manager = Instance('IPython.core.payload.PayloadManager')
     history_manager = Instance('IPython.core.history.HistoryManager')
+    cell_stats = Instance('IPython.core.cellstats.CellStats')
+
+    # Values estimated to be larger than this (in bytes) are not converted to
+    # strings by %whos and variable_summary(), as it can be slow.
+    variable_str_limit = Int(100000, config=True)
 
     # Private interface
     _post_execute = set()
@@ -1250,6 +1257,7 @@ class InteractiveShell(Configurable, Magic):
     def init_history(self):
         """Sets up the command history, and starts regular autosaves."""
         self.history_manager = HistoryManager(shell=self, config=self.config)
+        self.cell_stats = CellStats(shell=self, config=self.config)
 
     def history_saving_wrapper(self, func):
         """ Wrap func for readline history saving
@@ -1710,6 +1718,8 @@ class InteractiveShell(Configurable, Magic):
         # History was moved to a separate module
         from . import history
         history.init_ipython(self)
+        from . import cellstats
+        cellstats.init_ipython(self)
 
     def magic(self,arg_s):
         """Call a magic function by name.
@@ -1914,6 +1924,8 @@ class InteractiveShell(Configurable, Magic):
         ----------
         names : list of strings
           A list of names of variables to be read from the user namespace.
+          The special name '%whos' asks for :meth:`variable_summary` of all
+          the interactive variables, which doesn't build their repr().
 
         Returns
         -------
@@ -1923,11 +1935,63 @@ class InteractiveShell(Configurable, Magic):
         user_ns = self.user_ns
         for varname in names:
             try:
-                value = repr(user_ns[varname])
+                if varname == '%whos':
+                    value = self.variable_summary()
+                else:
+                    value = repr(user_ns[varname])
             except:
                 value = self._simple_error()
             out[varname] = value
         return out
+
+    def variable_summary(self, names=None):
+        """Describe variables of the user's namespace without repr()'ing them.
+
+        Parameters
+        ----------
+        names : list of strings, optional
+          The variables to describe, by default the ones listed by %who.
+
+        Returns
+        -------
+        A list with a dict per variable, with keys:
+
+          - name, type: the name of the variable and of its type.
+          - size: an estimate of the memory used by the value and what it
+            refers to, in bytes (see :func:`IPython.utils.sizeof.estimate_size`).
+          - size_exact: False if size was extrapolated.
+          - info: the length of containers, the shape and dtype of arrays, and
+            str() of other values, only when it's small.
+        """
+        if names is None:
+            names = self.magic_who_ls()
+        return [self._variable_info(name, self.user_ns[name])
+                for name in names]
+
+    def _variable_info(self, name, value):
+        tn = type(value).__name__
+        if tn == 'instance':
+            tn = str(value.__class__)
+        size, exact = estimate_size(value)
+        if tn in ('dict', 'list', 'tuple', 'set', 'frozenset', 'deque'):
+            info = 'n=%i' % len(value)
+        elif tn == 'ndarray':
+            shape = str(value.shape).replace(',','').replace(' ','x')[1:-1]
+            info = '%s: %s elems, type `%s`, %s bytes' % (shape, value.size,
+                                                          value.dtype,
+                                                          value.nbytes)
+        elif size <= self.variable_str_limit:
+            try:
+                info = str(value)
+            except UnicodeEncodeError:
+                info = unicode(value).encode(sys.getdefaultencoding(),
+                                             'backslashreplace')
+            except Exception:
+                info = '<str() failed>'
+        else:
+            info = ''
+        return dict(name=name, type=tn, size=size, size_exact=exact,
+                    info=info)
         
     def user_expressions(self, expressions):
         """Evaluate a dict of expressions in the user's namespace.
@@ -2101,6 +2165,15 @@ class InteractiveShell(Configurable, Magic):
         cell : str
           A single or multiline string.
         """
+        if not store_history:
+            return self._run_cell(cell, store_history)
+        self.cell_stats.begin()
+        try:
+            return self._run_cell(cell, store_history)
+        finally:
+            self.cell_stats.end()
+
+    def _run_cell(self, cell, store_history):
         # Store the untransformed code
         raw_cell = cell
         
@@ -2108,20 +2181,22 @@ class InteractiveShell(Configurable, Magic):
         # modifications to builtins.
         with self.builtin_trap:
             
-            # We need to break up the input into executable blocks that can
-            # be runin 'single' mode, to provide comfortable user behavior.
-            blocks = self.input_splitter.split_blocks(cell)
-            
-            if not blocks:   # Blank cell
-                return
-            
-            # We only do dynamic transforms on a single line. But a macro
-            # can be expanded to several lines, so we need to split it
-            # into input blocks again.
-            if len(cell.splitlines()) <= 1:
-                cell = self.prefilter_manager.prefilter_line(blocks[0])
+            with self.cell_stats.phase('prefilter'):
+                # We need to break up the input into executable blocks that
+                # can be runin 'single' mode, to provide comfortable user
+                # behavior.
                 blocks = self.input_splitter.split_blocks(cell)
 
+                if not blocks:   # Blank cell
+                    return
+
+                # We only do dynamic transforms on a single line. But a macro
+                # can be expanded to several lines, so we need to split it
+                # into input blocks again.
+                if len(cell.splitlines()) <= 1:
+                    cell = self.prefilter_manager.prefilter_line(blocks[0])
+                    blocks = self.input_splitter.split_blocks(cell)
+
             # Store the 'ipython' version of the cell as well, since
             # that's what needs to go into the translated history and get
             # executed (the original cell may contain non-python syntax).
@@ -2270,7 +2345,8 @@ class InteractiveShell(Configurable, Magic):
             print 'encoding', self.stdin_encoding  # dbg
         
         try:
-            code = self.compile(usource, symbol, self.execution_count)
+            with self.cell_stats.phase('compile'):
+                code = self.compile(usource, symbol, self.execution_count)
         except (OverflowError, SyntaxError, ValueError, TypeError, MemoryError):
             # Case 1
             self.showsyntaxerror(filename)
@@ -49,6 +49,8 @@ from IPython.core.fakemodule import FakeModule
 from IPython.core.macro import Macro
 from IPython.core import page
 from IPython.core.prefilter import ESC_MAGIC
+from IPython.lib.profiling import (LineProfiler, SamplingProfiler,
+                                   ProfileStats)
 from IPython.lib.pylabtools import mpl_runner
 from IPython.external.Itpl import itpl, printpl
 from IPython.testing import decorators as testdec
@@ -56,9 +58,10 @@ from IPython.utils.io import file_read, nlprint
 import IPython.utils.io
 from IPython.utils.path import get_py_filename
 from IPython.utils.process import arg_split, abbrev_cwd
+from IPython.utils.sizeof import format_bytes
 from IPython.utils.terminal import set_term_title
 from IPython.utils.text import LSString, SList, format_screen
-from IPython.utils.timing import clock, clock2
+from IPython.utils.timing import clock, clock2, TimeitResult
 from IPython.utils.warn import warn, error
 from IPython.utils.ipstruct import Struct
 import IPython.utils.generics
@@ -832,17 +835,32 @@ Currently the magic system has the following functions:\n"""
     def magic_whos(self, parameter_s=''):
         """Like %who, but gives some extra information about each variable.
 
+        Usage:\\
+          %whos [-s name|type|size] [-n N] [type1 type2 ...]
+
         The same type filtering of %who can be applied here.
 
-        For all variables, the type is printed. Additionally it prints:
+        For all variables, the type and an estimate of the memory they use
+        (including the objects they contain) are printed. Large containers
+        are measured on a sample of their items, and their size is marked
+        with a '~'. Additionally it prints:
         
-          - For {},[],(): their length.
+          - For {},[],(), sets: their length.
 
           - For numpy arrays, a summary with shape, number of
           elements, typecode and size in memory.
 
           - Everything else: a string representation, snipping their middle if
-          too long.
+          too long. It is skipped for objects larger than
+          InteractiveShell.variable_str_limit bytes, as building it can be
+          slow.
+
+        Options:
+
+          -s, --sort <key>: sort by name (the default), type or size (largest
+          first).
+
+          -n, --top <N>: only show the first N variables.
 
         Examples
         --------
@@ -854,115 +872,71 @@ Currently the magic system has the following functions:\n"""
           In [2]: beta = 'test'
 
           In [3]: %whos
-          Variable   Type        Data/Info
-          --------------------------------
-          alpha      int         123
-          beta       str         test
+          Variable   Type   Size   Data/Info
+          ----------------------------------
+          alpha      int    24 B   123
+          beta       str    41 B   test
+
+          In [4]: %whos --sort size -n 1
+          Variable   Type   Size   Data/Info
+          ----------------------------------
+          beta       str    41 B   test
         """
-        
-        varnames = self.magic_who_ls(parameter_s)
+        opts, args = self.parse_options(parameter_s, 's:n:',
+                                        ['sort=', 'top='])
+        sort = opts.get('s', opts.get('sort', 'name'))
+        if sort not in ('name', 'type', 'size'):
+            raise UsageError('Unknown sort key %r, use name, type or size.'
+                             % sort)
+        varnames = self.magic_who_ls(args)
         if not varnames:
-            if parameter_s:
+            if args:
                 print 'No variables match your requested type.'
             else:
                 print 'Interactive namespace is empty.'
             return
 
         # if we have variables, move on...
+        varinfo = self.shell.variable_summary(varnames)
+        if sort == 'size':
+            varinfo.sort(key=lambda v: v['size'], reverse=True)
+        elif sort == 'type':
+            varinfo.sort(key=lambda v: (v['type'], v['name']))
+        top = opts.get('n', opts.get('top'))
+        if top is not None:
+            varinfo = varinfo[:int(top)]
 
-        # for these types, show len() instead of data:
-        seq_types = ['dict', 'list', 'tuple']
-
-        # for numpy/Numeric arrays, display summary info
-        try:
-            import numpy
-        except ImportError:
-            ndarray_type = None
-        else:
-            ndarray_type = numpy.ndarray.__name__
-        try:
-            import Numeric
-        except ImportError:
-            array_type = None
-        else:
-            array_type = Numeric.ArrayType.__name__
-
-        # Find all variable names and types so we can figure out column sizes
-        def get_vars(i):
-            return self.shell.user_ns[i]
-        
         # some types are well known and can be shorter
         abbrevs = {'IPython.core.macro.Macro' : 'Macro'}
-        def type_name(v):
-            tn = type(v).__name__
-            return abbrevs.get(tn,tn)
-            
-        varlist = map(get_vars,varnames)
-
-        typelist = []
-        for vv in varlist:
-            tt = type_name(vv)
-
-            if tt=='instance':
-                typelist.append( abbrevs.get(str(vv.__class__),
-                                             str(vv.__class__)))
-            else:
-                typelist.append(tt)
+        for v in varinfo:
+            v['type'] = abbrevs.get(v['type'], v['type'])
+            v['size'] = ('' if v['size_exact'] else '~') + \
+                        format_bytes(v['size'])
 
         # column labels and # of spaces as separator
         varlabel = 'Variable'
         typelabel = 'Type'
+        sizelabel = 'Size'
         datalabel = 'Data/Info'
         colsep = 3
-        # variable format strings
-        vformat    = "$vname.ljust(varwidth)$vtype.ljust(typewidth)"
-        vfmt_short = '$vstr[:25]<...>$vstr[-25:]'
-        aformat    = "%s: %s elems, type `%s`, %s bytes"
         # find the size of the columns to format the output nicely
-        varwidth = max(max(map(len,varnames)), len(varlabel)) + colsep
-        typewidth = max(max(map(len,typelist)), len(typelabel)) + colsep
+        varwidth = max(max(len(v['name']) for v in varinfo),
+                       len(varlabel)) + colsep
+        typewidth = max(max(len(v['type']) for v in varinfo),
+                        len(typelabel)) + colsep
+        sizewidth = max(max(len(v['size']) for v in varinfo),
+                        len(sizelabel)) + colsep
         # table header
         print varlabel.ljust(varwidth) + typelabel.ljust(typewidth) + \
-              ' '+datalabel+'\n' + '-'*(varwidth+typewidth+len(datalabel)+1)
+              sizelabel.ljust(sizewidth) + datalabel + '\n' + \
+              '-'*(varwidth+typewidth+sizewidth+len(datalabel))
         # and the table itself
-        kb = 1024
-        Mb = 1048576  # kb**2
-        for vname,var,vtype in zip(varnames,varlist,typelist):
-            print itpl(vformat),
-            if vtype in seq_types:
-                print "n="+str(len(var))
-            elif vtype in [array_type,ndarray_type]:
-                vshape = str(var.shape).replace(',','').replace(' ','x')[1:-1]
-                if vtype==ndarray_type:
-                    # numpy
-                    vsize  = var.size
-                    vbytes = vsize*var.itemsize
-                    vdtype = var.dtype
-                else:
-                    # Numeric
-                    vsize  = Numeric.size(var)
-                    vbytes = vsize*var.itemsize()
-                    vdtype = var.typecode()
-                    
-                if vbytes < 100000:
-                    print aformat % (vshape,vsize,vdtype,vbytes)
-                else:
-                    print aformat % (vshape,vsize,vdtype,vbytes),
-                    if vbytes < Mb:
-                        print '(%s kb)' % (vbytes/kb,)
-                    else:
-                        print '(%s Mb)' % (vbytes/Mb,)
-            else:
-                try:
-                    vstr = str(var)
-                except UnicodeEncodeError:
-                    vstr = unicode(var).encode(sys.getdefaultencoding(),
-                                               'backslashreplace')
-                vstr = vstr.replace('\n','\\n')
-                if len(vstr) < 50:
-                    print vstr
-                else:
-                    printpl(vfmt_short)
+        for v in varinfo:
+            vstr = v['info'].replace('\n','\\n')
+            if len(vstr) >= 50:
+                vstr = vstr[:25] + '<...>' + vstr[-25:]
+            print v['name'].ljust(varwidth) + v['type'].ljust(typewidth) + \
+                  v['size'].ljust(sizewidth) + vstr
                 
     def magic_reset(self, parameter_s=''):
         """Resets the namespace by removing all names defined by the user.
@@ -1342,6 +1316,41 @@ Currently the magic system has the following functions:\n"""
         is generated by a call to the dump_stats() method of profile
         objects. The profile is still shown on screen.
 
+        Two other profilers are available, which report per line rather than
+        per function:
+
+        -L <function>: time each line of the given function, with a line
+        tracer that only runs inside of it. Give the option several times to
+        trace several functions. The function is looked up in the namespace
+        of the statement (for example '-L obj.method'); if it isn't found,
+        any function with that name is traced, which lets '%run -p -L' trace
+        the functions of the program being run. The time of a line includes
+        the time of the calls made on it.
+
+        -S: sample the stack every millisecond from a background thread and
+        report the functions and lines seen most often. The overhead does not
+        depend on the number of calls made, so this also works for code that
+        makes many small calls.
+
+        -I <ms>: the sampling interval for -S, in milliseconds. Default: 1
+
+        With -L and -S, -s and non-numeric -l limits are ignored, a numeric
+        -l limits the number of lines shown and -D saves the results as JSON.
+        With -r, a LineStats or SampleStats object from IPython.lib.profiling
+        is returned. These can be saved with their save() method, loaded
+        with IPython.lib.profiling.load_stats(), and compared with an earlier
+        run with their diff() method. For example:
+
+          In [1]: %prun -L f -D before.json f(10000)
+
+          (edit f and run it again)
+
+          In [2]: after = %prun -r -L f f(10000)
+
+          In [3]: from IPython.lib.profiling import load_stats
+
+          In [4]: print after.diff(load_stats('before.json'))
+
         If you want to run complete programs under the profiler's control, use
         '%run -p [prof_opts] filename.py [args to program]' where prof_opts
         contains profiler specific options as described here.
@@ -1356,7 +1365,7 @@ Currently the magic system has the following functions:\n"""
         parameter_s = parameter_s.replace('"',r'\"').replace("'",r"\'")
         
         if user_mode:  # regular user call
-            opts,arg_str = self.parse_options(parameter_s,'D:l:rs:T:',
+            opts,arg_str = self.parse_options(parameter_s,'D:l:rs:T:L:SI:',
                                               list_all=1)
             namespace = self.shell.user_ns
         else:  # called to run a program by %run -p
@@ -1370,15 +1379,6 @@ Currently the magic system has the following functions:\n"""
             namespace = locals()
 
         opts.merge(opts_def)
-        
-        prof = profile.Profile()
-        try:
-            prof = prof.runctx(arg_str,namespace,namespace)
-            sys_exit = ''
-        except SystemExit:
-            sys_exit = """*** SystemExit exception caught in code being profiled."""
-
-        stats = pstats.Stats(prof).strip_dirs().sort_stats(*opts.s)
 
         lims = opts.l
         if lims:
@@ -1391,26 +1391,39 @@ Currently the magic system has the following functions:\n"""
                         lims.append(float(lim))
                     except ValueError:
                         lims.append(lim)
-                    
-        # Trap output.
-        stdout_trap = StringIO()
 
-        if hasattr(stats,'stream'):
-            # In newer versions of python, the stats object has a 'stream'
-            # attribute to write into.
-            stats.stream = stdout_trap
-            stats.print_stats(*lims)
+        if opts.has_key('L'):
+            prof = LineProfiler()
+            for name in opts.L:
+                try:
+                    func = eval(name, namespace)
+                except Exception:
+                    # Not defined yet (as with %run -p), match by name.
+                    func = name
+                try:
+                    prof.add_function(func)
+                except TypeError, msg:
+                    error(msg)
+                    return
+        elif opts.has_key('S'):
+            prof = SamplingProfiler(float(opts.get('I', [1])[0])/1000)
         else:
-            # For older versions, we manually redirect stdout during printing
-            sys_stdout = sys.stdout
-            try:
-                sys.stdout = stdout_trap
-                stats.print_stats(*lims)
-            finally:
-                sys.stdout = sys_stdout
-                
-        output = stdout_trap.getvalue()
-        output = output.rstrip()
+            prof = profile.Profile()
+
+        try:
+            prof = prof.runctx(arg_str,namespace,namespace)
+            sys_exit = ''
+        except SystemExit:
+            sys_exit = """*** SystemExit exception caught in code being profiled."""
+
+        if opts.has_key('L') or opts.has_key('S'):
+            stats = prof.get_stats()
+            # Only a number of lines makes sense as a limit here.
+            limit = [lim for lim in lims if isinstance(lim, int)][:1]
+            output = stats.report(*limit).rstrip()
+        else:
+            stats = pstats.Stats(prof).strip_dirs().sort_stats(*opts.s)
+            output = self._pstats_output(stats, lims)
 
         page.page(output)
         print sys_exit,
@@ -1418,7 +1431,10 @@ Currently the magic system has the following functions:\n"""
         dump_file = opts.D[0]
         text_file = opts.T[0]
         if dump_file:
-            prof.dump_stats(dump_file)
+            if isinstance(stats, ProfileStats):
+                stats.save(dump_file)
+            else:
+                prof.dump_stats(dump_file)
             print '\n*** Profile stats marshalled to file',\
                   `dump_file`+'.',sys_exit
         if text_file:
@@ -1433,6 +1449,28 @@ Currently the magic system has the following functions:\n"""
         else:
             return None
 
+    def _pstats_output(self, stats, lims):
+        """Return the report of a pstats.Stats object as a string."""
+        # Trap output.
+        stdout_trap = StringIO()
+
+        if hasattr(stats,'stream'):
+            # In newer versions of python, the stats object has a 'stream'
+            # attribute to write into.
+            stats.stream = stdout_trap
+            stats.print_stats(*lims)
+        else:
+            # For older versions, we manually redirect stdout during printing
+            sys_stdout = sys.stdout
+            try:
+                sys.stdout = stdout_trap
+                stats.print_stats(*lims)
+            finally:
+                sys.stdout = sys_stdout
+
+        output = stdout_trap.getvalue()
+        return output.rstrip()
+
     @testdec.skip_doctest
     def magic_run(self, parameter_s ='',runner=None,
                   file_finder=get_py_filename):
@@ -1531,7 +1569,8 @@ Currently the magic system has the following functions:\n"""
         prints a detailed report of execution times, function calls, etc).
 
         You can pass other options after -p which affect the behavior of the
-        profiler itself. See the docs for %prun for details.
+        profiler itself, like -L <function> for line by line timings or -S
+        for a sampling profile. See the docs for %prun for details.
 
         In this mode, the program's variables do NOT propagate back to the
         IPython interactive namespace (because they remain in the namespace
@@ -1546,7 +1585,8 @@ Currently the magic system has the following functions:\n"""
         """
 
         # get arguments and set sys.argv for program to be run.
-        opts,arg_lst = self.parse_options(parameter_s,'nidtN:b:pD:l:rs:T:e',
+        opts,arg_lst = self.parse_options(parameter_s,
+                                          'nidtN:b:pD:l:rs:T:L:SI:e',
                                           mode='list',list_all=1)
 
         try:
@@ -1735,7 +1775,7 @@ Currently the magic system has the following functions:\n"""
         """Time execution of a Python statement or expression
 
         Usage:\\
-          %timeit [-n<N> -r<R> [-t|-c]] statement
+          %timeit [-n<N> -r<R> [-t|-c] -w<W> -a -e<E> -g -q -o] statement
 
         Time execution of a Python statement or expression using the timeit
         module.
@@ -1744,8 +1784,7 @@ Currently the magic system has the following functions:\n"""
         -n<N>: execute the given statement <N> times in a loop. If this value
         is not given, a fitting value is chosen. 
         
-        -r<R>: repeat the loop iteration <R> times and take the best result.
-        Default: 3
+        -r<R>: repeat the loop iteration <R> times. Default: 3
         
         -t: use time.time to measure the time, which is the default on Unix.
         This function measures wall time.
@@ -1757,24 +1796,47 @@ Currently the magic system has the following functions:\n"""
         -p<P>: use a precision of <P> digits to display the timing result.
         Default: 3
 
-        
+        -w<W>: run the loop <W> times before measuring, to warm up caches.
+        Default: 0
+
+        -a: adaptive, keep repeating the loop after the first <R> runs until
+        the 95% confidence interval of the mean is within 1% of it (see -e),
+        for at most 1000 runs or 10 seconds.
+
+        -e<E>: the relative precision, in percent, at which -a stops.
+        Implies -a.
+
+        -g: leave the garbage collector enabled while timing. By default it
+        is disabled, like in the timeit module.
+
+        -q: quiet, do not print the result.
+
+        -o: return a TimeitResult that holds the time of every run, and can
+        be stored or compared programmatically.
+
+        The best time per loop is printed, followed by the mean, standard
+        deviation, median and 95th percentile of the time per loop over all
+        runs.
+
         Examples:
 
           In [1]: %timeit pass
           10000000 loops, best of 3: 53.3 ns per loop
+          mean 54.1 ns +- 0.9 ns (std. dev.), median 53.9 ns, 95th percentile 55 ns
 
           In [2]: u = None
 
-          In [3]: %timeit u is None
-          10000000 loops, best of 3: 184 ns per loop
+          In [3]: %timeit -q -r 4 u is None
 
-          In [4]: %timeit -r 4 u == None
-          1000000 loops, best of 4: 242 ns per loop
+          In [4]: res = %timeit -o -a u == None
 
-          In [5]: import time
+          In [5]: res.repeat, res.best, res.confidence_interval()
 
-          In [6]: %timeit -n1 time.sleep(2)
+          In [6]: import time
+
+          In [7]: %timeit -n1 time.sleep(2)
           1 loops, best of 3: 2 s per loop
+          mean 2 s +- 0.0001 s (std. dev.), median 2 s, 95th percentile 2 s
           
 
         The times reported by %timeit will be slightly higher than those
@@ -1786,33 +1848,8 @@ Currently the magic system has the following functions:\n"""
         those from %timeit."""
 
         import timeit
-        import math
-
-        # XXX: Unfortunately the unicode 'micro' symbol can cause problems in
-        # certain terminals.  Until we figure out a robust way of
-        # auto-detecting if the terminal can deal with it, use plain 'us' for
-        # microseconds.  I am really NOT happy about disabling the proper
-        # 'micro' prefix, but crashing is worse... If anyone knows what the
-        # right solution for this is, I'm all ears...
-        #
-        # Note: using
-        #
-        # s = u'\xb5'
-        # s.encode(sys.getdefaultencoding())
-        #
-        # is not sufficient, as I've seen terminals where that fails but
-        # print s
-        #
-        # succeeds
-        #
-        # See bug: https://bugs.launchpad.net/ipython/+bug/348466
-        
-        #units = [u"s", u"ms",u'\xb5',"ns"]
-        units = [u"s", u"ms",u'us',"ns"]
-        
-        scaling = [1, 1e3, 1e6, 1e9]
-
-        opts, stmt = self.parse_options(parameter_s,'n:r:tcp:',
+
+        opts, stmt = self.parse_options(parameter_s,'n:r:tcp:w:ae:gqo',
                                         posix=False)
         if stmt == "":
             return
@@ -1820,6 +1857,9 @@ Currently the magic system has the following functions:\n"""
         number = int(getattr(opts, "n", 0))
         repeat = int(getattr(opts, "r", timeit.default_repeat))
         precision = int(getattr(opts, "p", 3))
+        warmup = int(getattr(opts, "w", 0))
+        adaptive = hasattr(opts, "a") or hasattr(opts, "e")
+        rel_precision = float(getattr(opts, "e", 1.0)) / 100.0
         if hasattr(opts, "t"):
             timefunc = time.time
         if hasattr(opts, "c"):
@@ -1830,8 +1870,12 @@ Currently the magic system has the following functions:\n"""
         # but is there a better way to achieve that the code stmt has access
         # to the shell namespace?
 
+        # Timer.timeit disables the garbage collector around inner(), this
+        # turns it back on from within.
+        setup = "import gc; gc.enable()" if hasattr(opts, "g") else "pass"
+        # Python 2.7.7 and later expect an 'init' key in the template.
         src = timeit.template % {'stmt': timeit.reindent(stmt, 8),
-                                 'setup': "pass"}
+                                 'setup': setup, 'init': ''}
         # Track compilation time so it can be reported if too long
         # Minimum time above which compilation time will be reported
         tc_min = 0.1
@@ -1851,21 +1895,28 @@ Currently the magic system has the following functions:\n"""
                 if timer.timeit(number) >= 0.2:
                     break
                 number *= 10
-        
-        best = min(timer.repeat(repeat, number)) / number
 
-        if best > 0.0 and best < 1000.0:
-            order = min(-int(math.floor(math.log10(best)) // 3), 3)
-        elif best >= 1000.0:
-            order = 0
-        else:
-            order = 3
-        print u"%d loops, best of %d: %.*g %s per loop" % (number, repeat,
-                                                          precision,
-                                                          best * scaling[order],
-                                                          units[order])
-        if tc > tc_min:
-            print "Compiler time: %.2f s" % tc
+        for i in range(warmup):
+            timer.timeit(number)
+
+        all_runs = timer.repeat(repeat, number)
+        if adaptive:
+            max_runs, deadline = 1000, time.time() + 10.0
+            while len(all_runs) < max_runs and time.time() < deadline:
+                result = TimeitResult(number, all_runs)
+                lo, hi = result.confidence_interval()
+                if result.repeat > 1 and \
+                       (hi - lo) / 2 <= rel_precision * result.mean:
+                    break
+                all_runs.append(timer.timeit(number))
+        result = TimeitResult(number, all_runs, tc, precision)
+
+        if not hasattr(opts, "q"):
+            print result.summary()
+            if tc > tc_min:
+                print "Compiler time: %.2f s" % tc
+        if hasattr(opts, "o"):
+            return result
 
     @testdec.skip_doctest
     @needs_local_scope
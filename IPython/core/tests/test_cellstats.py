@@ -0,0 +1,105 @@
+"""Tests for the per cell instrumentation.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010 The IPython Development Team.
+#
+#  Distributed under the terms of the BSD License.
+#
+#  The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+# stdlib
+import sys
+from cStringIO import StringIO
+
+# third party
+import nose.tools as nt
+
+# our own packages
+from IPython.core.cellstats import stats_fields
+from IPython.core.history import HistoryManager
+
+#-----------------------------------------------------------------------------
+# Test functions
+#-----------------------------------------------------------------------------
+
+def with_stats(func):
+    """Run func with cell statistics on and a :memory: history database."""
+    def wrapper():
+        ip = get_ipython()
+        hist_manager_ori = ip.history_manager
+        ip.history_manager = HistoryManager(shell=ip, hist_file=':memory:')
+        ip.cell_stats.enabled = True
+        try:
+            func(ip)
+        finally:
+            ip.cell_stats.enabled = False
+            ip.history_manager = hist_manager_ori
+    wrapper.__name__ = func.__name__
+    return wrapper
+
+
+@with_stats
+def test_run_cell_records_stats(ip):
+    count = ip.execution_count
+    ip.run_cell('x = sum(range(100000))\n')
+    ip.run_cell('x\n')
+    stats = ip.cell_stats.last
+    nt.assert_equal(sorted(stats), sorted(stats_fields))
+    nt.assert_true(stats['display'] > 0)
+    rows = list(ip.history_manager.get_stats())
+    nt.assert_equal(sorted(row[1] for row in rows), [count, count+1])
+    nt.assert_equal(rows[0][2], 'x = sum(range(100000))')
+    nt.assert_true(rows[0][3]['wall'] >= rows[1][3]['wall'])
+    nt.assert_true(rows[0][3]['compile'] > 0)
+
+
+@with_stats
+def test_blank_and_nested_cells(ip):
+    ip.run_cell('pass\n')
+    last = ip.cell_stats.last
+    ip.run_cell('\n')
+    nt.assert_true(ip.cell_stats.last is last)
+    nt.assert_equal(len(list(ip.history_manager.get_stats())), 1)
+    # As in the kernel, an outer begin/end pair takes over the one of
+    # run_cell.
+    ip.cell_stats.begin()
+    ip.run_cell('pass\n')
+    nt.assert_true(ip.cell_stats.last is last)
+    ip.cell_stats.add('iopub_bytes', 10)
+    nt.assert_equal(ip.cell_stats.end()['iopub_bytes'], 10)
+    nt.assert_equal(len(list(ip.history_manager.get_stats())), 2)
+
+
+@with_stats
+def test_get_stats_order(ip):
+    hm = ip.history_manager
+    for line, wall in enumerate([0.5, 2.0, 1.0], start=1):
+        hm.store_inputs(line, 'cell%i' % line)
+        stats = dict.fromkeys(stats_fields, 0)
+        stats['wall'] = wall
+        stats['cpu'] = 3.0 - wall
+        hm.store_stats(line, stats)
+    nt.assert_equal([row[1] for row in hm.get_stats()], [2, 3, 1])
+    nt.assert_equal([row[1] for row in hm.get_stats(order='cpu', n=2)],
+                    [1, 3])
+    nt.assert_raises(ValueError, list, hm.get_stats(order='source'))
+
+
+@with_stats
+def test_stats_magic(ip):
+    ip.run_cell('y = 1\n')
+    out = StringIO()
+    save, sys.stdout = sys.stdout, out
+    try:
+        ip.magic('stats -n 1')
+    finally:
+        sys.stdout = save
+    nt.assert_true('y = 1' in out.getvalue())
+    ip.magic('stats off')
+    nt.assert_false(ip.cell_stats.enabled)
+    ip.magic('stats on')
+    nt.assert_true(ip.cell_stats.enabled)
@@ -15,7 +15,8 @@ import nose.tools as nt
 
 # our own packages
 from IPython.utils.tempdir import TemporaryDirectory
-from IPython.core.history import HistoryManager, extract_hist_ranges
+from IPython.core.history import (HistoryManager, extract_hist_ranges,
+                                  prefix_pattern)
 
 def setUp():
     nt.assert_equal(sys.getdefaultencoding(), "ascii")
@@ -89,6 +90,49 @@ def test_history():
             ip.history_manager = hist_manager_ori
 
 
+def test_history_paging():
+    ip = get_ipython()
+    hist_manager_ori = ip.history_manager
+    try:
+        hm = ip.history_manager = HistoryManager(shell=ip, hist_file=':memory:')
+        cmds = ['a=1', 'b=2', 'a=1', 'a[0]*2', 'c=3', 'a=1']
+        for i, cmd in enumerate(cmds, start=1):
+            hm.store_inputs(i, cmd)
+        hm.reset()
+        hm.store_inputs(1, 'a=2')
+
+        # Page backwards through the history.
+        page = list(hm.get_tail(3, include_latest=True))
+        nt.assert_equal(page, [(1, 5, 'c=3'), (1, 6, 'a=1'), (2, 1, 'a=2')])
+        page = list(hm.get_tail(3, before=page[0][:2]))
+        nt.assert_equal(page, [(1, 2, 'b=2'), (1, 3, 'a=1'), (1, 4, 'a[0]*2')])
+        page = list(hm.get_tail(3, before=page[0][:2]))
+        nt.assert_equal(page, [(1, 1, 'a=1')])
+
+        # Only the latest occurrence of each input.
+        page = list(hm.get_tail(3, include_latest=True, unique=True))
+        nt.assert_equal(page, [(1, 5, 'c=3'), (1, 6, 'a=1'), (2, 1, 'a=2')])
+        page = list(hm.get_tail(3, unique=True, before=(1, 5), output=True))
+        nt.assert_equal(page, [(1, 2, ('b=2', None)), (1, 3, ('a=1', None)),
+                               (1, 4, ('a[0]*2', None))])
+
+        # Prefix searches.
+        page = list(hm.search(prefix_pattern('a['), n=10))
+        nt.assert_equal(page, [(1, 4, 'a[0]*2')])
+        page = list(hm.search(prefix_pattern('a='), n=2, unique=True))
+        nt.assert_equal(page, [(1, 6, 'a=1'), (2, 1, 'a=2')])
+        page = list(hm.search(prefix_pattern('a='), n=2, before=(1, 6)))
+        nt.assert_equal(page, [(1, 1, 'a=1'), (1, 3, 'a=1')])
+    finally:
+        ip.history_manager = hist_manager_ori
+
+
+def test_prefix_pattern():
+    nt.assert_equal(prefix_pattern(''), '*')
+    nt.assert_equal(prefix_pattern('ab'), 'ab*')
+    nt.assert_equal(prefix_pattern('a[0]*?'), 'a[[]0][*][?]*')
+
+
 def test_extract_hist_ranges():
     instr = "1 2/3 ~4/5-6 ~4/7-~4/9 ~9/2-~7/5"
     expected = [(0, 1, 2),  # 0 == current session
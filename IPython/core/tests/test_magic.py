@@ -269,6 +269,56 @@ def test_time():
     _ip.magic('time None')
 
 
+def test_timeit_result():
+    res = _ip.magic('timeit -q -o -n1 -r3 None')
+    nt.assert_equal(res.loops, 1)
+    nt.assert_equal(res.repeat, 3)
+    nt.assert_true(res.best <= res.median <= res.worst)
+
+
+def test_timeit_adaptive():
+    res = _ip.magic('timeit -q -o -n10 -r2 -w1 -g -e50 None')
+    nt.assert_true(res.repeat >= 2)
+    lo, hi = res.confidence_interval()
+    nt.assert_true(lo <= res.mean <= hi)
+
+
+def test_timeit_quiet():
+    out = StringIO()
+    save, sys.stdout = sys.stdout, out
+    try:
+        nt.assert_equal(_ip.magic('timeit -q -n1 -r1 None'), None)
+    finally:
+        sys.stdout = save
+    nt.assert_equal(out.getvalue(), '')
+
+
+def prun_quietly(arg):
+    """Run %prun without going through curses to page the report."""
+    term = os.environ.get('TERM')
+    os.environ['TERM'] = 'dumb'
+    save, sys.stdout = sys.stdout, StringIO()
+    try:
+        return _ip.magic('prun ' + arg)
+    finally:
+        sys.stdout = save
+        if term is None:
+            del os.environ['TERM']
+        else:
+            os.environ['TERM'] = term
+
+
+def test_prun_line_profile():
+    _ip.run_cell("def _prun_f(n):\n    return sum(range(n))\n")
+    stats = prun_quietly('-r -L _prun_f _prun_f(10)')
+    nt.assert_equal([key[2] for key in stats.timings], ['_prun_f'])
+
+
+def test_prun_sample_profile():
+    stats = prun_quietly('-r -S -I 0.5 sum(range(10))')
+    nt.assert_equal(stats.interval, 0.0005)
+
+
 def doctest_time():
     """
     In [10]: %time None
@@ -396,13 +446,18 @@ def doctest_who():
     beta
     
     In [6]: %whos
-    Variable   Type    Data/Info
-    ----------------------------
-    alpha      int     123
-    beta       str     beta
+    Variable   Type   Size   Data/Info
+    ----------------------------------
+    alpha      int    24 B   123
+    beta       str    41 B   beta
     
     In [7]: %who_ls
     Out[7]: ['alpha', 'beta']
+
+    In [8]: %whos -s size -n 1
+    Variable   Type   Size   Data/Info
+    ----------------------------------
+    beta       str    41 B   beta
     """
 
 def doctest_precision():
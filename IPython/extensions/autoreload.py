@@ -14,86 +14,198 @@ for documentation.
 # This IPython module is written by Pauli Virtanen, based on the autoreload
 # code by Thomas Heller.
 
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2008-2011  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
 #------------------------------------------------------------------------------
 # Autoreload functionality
 #------------------------------------------------------------------------------
 
-import time, os, threading, sys, types, imp, inspect, traceback, atexit
+import os, sys, types, traceback
 import weakref
 
-def _get_compiled_ext():
-    """Official way to get the extension of compiled files (.pyc or .pyo)"""
-    for ext, mode, typ in imp.get_suffixes():
-        if typ == imp.PY_COMPILED:
-            return ext
-
-PY_COMPILED_EXT = _get_compiled_ext()
+from IPython.core.error import TryNext
 
-class ModuleReloader(object):
-    failed = {}
-    """Modules that failed to reload: {module: mtime-on-failed-reload, ...}"""
+def source_file(module):
+    """Return the .py file of a module, or None if it can't be reloaded."""
+    filename = getattr(module, '__file__', None)
+    if not filename or module.__name__ == '__main__':
+        # we cannot reload(__main__)
+        return None
+    path, ext = os.path.splitext(filename)
+    if ext.lower() in ('.pyc', '.pyo'):
+        return path + '.py'
+    elif ext.lower() == '.py':
+        return filename
+    # C extension modules cannot be reloaded
+    return None
+
+
+def module_dependencies(module):
+    """Return the names of the modules a module refers to.
+
+    These are the modules bound in its namespace (``import xxx``) and the
+    modules defining the functions and classes bound in it (``from xxx import
+    foo``).  Only the namespace is looked at, which is much cheaper than
+    parsing the source.
+    """
+    deps = set()
+    for obj in module.__dict__.values():
+        try:
+            if isinstance(obj, types.ModuleType):
+                name = obj.__name__
+            else:
+                name = getattr(obj, '__module__', None)
+        except Exception:
+            # Objects with a broken __getattr__
+            continue
+        if isinstance(name, str) and name != module.__name__:
+            deps.add(name)
+    return deps
+
+
+def reload_order(changed, dependencies):
+    """Return the modules to reload when the modules in changed were edited.
+
+    Parameters
+    ----------
+    changed : list of str
+        The names of the modules whose source changed.
+    dependencies : dict
+        Maps module names to the set of names of the modules they depend on.
+
+    Returns
+    -------
+    The changed modules and the modules depending on them, directly or not,
+    sorted so that each module comes after the modules it depends on (cycles
+    are broken arbitrarily).
+    """
+    importers = {}
+    for name, deps in dependencies.iteritems():
+        for dep in deps:
+            importers.setdefault(dep, set()).add(name)
+
+    # All the modules affected by the change
+    affected = set()
+    todo = list(changed)
+    while todo:
+        name = todo.pop()
+        if name in affected:
+            continue
+        affected.add(name)
+        todo.extend(importers.get(name, ()))
+
+    # Topological sort, dependencies first
+    order = []
+    visited = set()
+    def visit(name):
+        if name in visited:
+            return
+        visited.add(name)
+        for dep in sorted(dependencies.get(name, ())):
+            if dep in affected:
+                visit(dep)
+        order.append(name)
+    for name in sorted(affected):
+        visit(name)
+    return order
 
-    modules = {}
-    """Modules specially marked as autoreloadable."""
 
-    skip_modules = {}
-    """Modules specially marked as not autoreloadable."""
+class ModuleReloader(object):
+    enabled = False
+    """Whether this reloader is enabled"""
 
     check_all = True
     """Autoreload all modules, not just those listed in 'modules'"""
 
-    old_objects = {}
-    """(module-name, name) -> weakref, for replacing old code objects"""
+    def __init__(self):
+        # Modules specially marked as autoreloadable.
+        self.modules = {}
+        # Modules specially marked as not autoreloadable.
+        self.skip_modules = {}
+        # (module-name, name) -> weakref, for replacing old code objects
+        self.old_objects = {}
+        # Module name -> mtime of its source when it was last (re)loaded
+        self.modules_mtimes = {}
+
+    def _source_mtime(self, module):
+        filename = source_file(module)
+        if filename is None:
+            return None
+        try:
+            return os.stat(filename).st_mtime
+        except OSError:
+            return None
 
-    def check(self, check_all=False):
-        """Check whether some modules need to be reloaded."""
+    def changed_modules(self, check_all=False):
+        """Return the names of the modules edited since they were loaded.
 
+        Modules seen for the first time are taken to be up to date.
+        """
         if check_all or self.check_all:
             modules = sys.modules.keys()
         else:
             modules = self.modules.keys()
 
+        changed = []
         for modname in modules:
-            m = sys.modules.get(modname, None)
-
             if modname in self.skip_modules:
                 continue
-
-            if not hasattr(m, '__file__'):
+            m = sys.modules.get(modname, None)
+            if m is None:
                 continue
-
-            if m.__name__ == '__main__':
-                # we cannot reload(__main__)
+            mtime = self._source_mtime(m)
+            if mtime is None:
                 continue
-
-            filename = m.__file__
-            dirname = os.path.dirname(filename)
-            path, ext = os.path.splitext(filename)
-
-            if ext.lower() == '.py':
-                ext = PY_COMPILED_EXT
-                filename = os.path.join(dirname, path + PY_COMPILED_EXT)
-
-            if ext != PY_COMPILED_EXT:
+            if mtime > self.modules_mtimes.setdefault(modname, mtime):
+                changed.append(modname)
+        return changed
+
+    def dependencies(self):
+        """Return the import graph of the reloadable modules.
+
+        A dict mapping each module name to the set of the names of the modules
+        it refers to, see :func:`module_dependencies`.
+        """
+        graph = {}
+        for modname, m in sys.modules.items():
+            if m is None or modname in self.skip_modules or \
+                    source_file(m) is None:
                 continue
+            graph[modname] = module_dependencies(m)
+        return graph
 
-            try:
-                pymtime = os.stat(filename[:-1]).st_mtime
-                if pymtime <= os.stat(filename).st_mtime:
-                    continue
-                if self.failed.get(filename[:-1], None) == pymtime:
-                    continue
-            except OSError:
+    def check(self, check_all=False):
+        """Reload the modules that changed and the modules importing them.
+
+        Returns the names of the modules reloaded, in the order they were
+        reloaded.
+        """
+        changed = self.changed_modules(check_all)
+        if not changed:
+            return []
+
+        graph = self.dependencies()
+        order = [modname for modname in reload_order(changed, graph)
+                 if modname in graph]
+        for modname in order:
+            m = sys.modules.get(modname, None)
+            if m is None:
                 continue
-
+            mtime = self._source_mtime(m)
             try:
                 superreload(m, reload, self.old_objects)
-                if filename[:-1] in self.failed:
-                    del self.failed[filename[:-1]]
             except:
                 print >> sys.stderr, "[autoreload of %s failed: %s]" % (
                         modname, traceback.format_exc(1))
-                self.failed[filename[:-1]] = pymtime
+            # Don't retry a failed reload before the module is edited again.
+            if mtime is not None:
+                self.modules_mtimes[modname] = mtime
+        return order
 
 #------------------------------------------------------------------------------
 # superreload
@@ -131,6 +243,15 @@ def update_class(old, new):
         except (AttributeError, TypeError):
             pass # skip non-writable attributes
 
+    # new attributes, so that existing instances get the new methods too
+    for key in new.__dict__.keys():
+        if key in old.__dict__ or key in ('__dict__', '__weakref__'):
+            continue
+        try:
+            setattr(old, key, new.__dict__[key])
+        except (AttributeError, TypeError):
+            pass
+
 def update_property(old, new):
     """Replace get/set/del functions of a property"""
     update_generic(old.fdel, new.fdel)
@@ -224,31 +345,27 @@ reloader = ModuleReloader()
 #------------------------------------------------------------------------------
 # IPython connectivity
 #------------------------------------------------------------------------------
-from IPython.core import ipapi
-from IPython.core.error import TryNext
 
-ip = ipapi.get()
-
-autoreload_enabled = False
-
-def runcode_hook(self):
-    if not autoreload_enabled:
-        raise TryNext
-    try:
-        reloader.check()
-    except:
-        pass
+def pre_run_code_hook(self):
+    if reloader.enabled:
+        try:
+            reloader.check()
+        except:
+            pass
+    # let the other hooks run
+    raise TryNext
 
-def enable_autoreload():
-    global autoreload_enabled
-    autoreload_enabled = True
+def post_execute():
+    """Note the modules imported by the code just run.
 
-def disable_autoreload():
-    global autoreload_enabled
-    autoreload_enabled = False
+    Otherwise a module imported by a cell and edited before the next one
+    would first be seen after the edit, and not be reloaded.
+    """
+    if reloader.enabled:
+        reloader.changed_modules()
 
-def autoreload_f(self, parameter_s=''):
-    r""" %autoreload => Reload modules automatically
+def magic_autoreload(self, parameter_s=''):
+    r"""%autoreload => Reload modules automatically
 
     %autoreload
     Reload all modules (except those excluded by %aimport) automatically now.
@@ -264,6 +381,11 @@ def autoreload_f(self, parameter_s=''):
     Reload all modules (except those excluded by %aimport) every time
     before executing the Python code typed.
 
+    Only the modules whose source file changed since they were loaded are
+    reloaded, followed by the modules that import them (directly or not), in
+    dependency order. The cost of checking is one stat() call per module,
+    so it is cheap even with many modules imported.
+
     Reloading Python modules in a reliable way is in general
     difficult, and unexpected things may occur. %autoreload tries to
     work around common pitfalls by replacing function code objects and
@@ -286,6 +408,9 @@ def autoreload_f(self, parameter_s=''):
     - Functions that are removed (eg. via monkey-patching) from a module
       before it is reloaded are not upgraded.
 
+    - Dependencies are found from the namespace of modules: a module using
+      'import pkg.sub' is only seen to depend on 'pkg'.
+
     - C extension modules cannot be reloaded, and so cannot be
       autoreloaded.
 
@@ -293,15 +418,15 @@ def autoreload_f(self, parameter_s=''):
     if parameter_s == '':
         reloader.check(True)
     elif parameter_s == '0':
-        disable_autoreload()
+        reloader.enabled = False
     elif parameter_s == '1':
         reloader.check_all = False
-        enable_autoreload()
+        reloader.enabled = True
     elif parameter_s == '2':
         reloader.check_all = True
-        enable_autoreload()
+        reloader.enabled = True
 
-def aimport_f(self, parameter_s=''):
+def magic_aimport(self, parameter_s=''):
     """%aimport => Import modules for automatic reloading.
 
     %aimport
@@ -322,7 +447,7 @@ def aimport_f(self, parameter_s=''):
         to_skip = reloader.skip_modules.keys()
         to_skip.sort()
         if reloader.check_all:
-            print "Modules to reload:\nall-expect-skipped"
+            print "Modules to reload:\nall-except-skipped"
         else:
             print "Modules to reload:\n%s" % ' '.join(to_reload)
         print "\nModules to skip:\n%s" % ' '.join(to_skip)
@@ -340,11 +465,17 @@ def aimport_f(self, parameter_s=''):
         __import__(modname)
         basename = modname.split('.')[0]
         mod = sys.modules[basename]
-        ip.push({basename: mod})
+        self.push({basename: mod})
+
+_loaded = False
 
-def init():
-    ip.define_magic('autoreload', autoreload_f)
-    ip.define_magic('aimport', aimport_f)
-    ip.set_hook('pre_runcode_hook', runcode_hook)
 
-init()
+def load_ipython_extension(ip):
+    """Load the extension in IPython."""
+    global _loaded
+    if not _loaded:
+        ip.define_magic('autoreload', magic_autoreload)
+        ip.define_magic('aimport', magic_aimport)
+        ip.set_hook('pre_run_code_hook', pre_run_code_hook)
+        ip.register_post_execute(post_execute)
+        _loaded = True
@@ -0,0 +1,101 @@
+"""Tests for the autoreload extension.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2011  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import nose.tools as nt
+
+from IPython.extensions.autoreload import ModuleReloader, reload_order
+
+#-----------------------------------------------------------------------------
+# Test functions
+#-----------------------------------------------------------------------------
+
+class Fixture(object):
+    """Write modules in a temporary directory on sys.path."""
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        sys.path.insert(0, self.test_dir)
+        self.reloader = ModuleReloader()
+        self.modules = []
+
+    def tearDown(self):
+        sys.path.remove(self.test_dir)
+        shutil.rmtree(self.test_dir)
+        for name in self.modules:
+            sys.modules.pop(name, None)
+
+    def write_module(self, name, code):
+        if name not in self.modules:
+            self.modules.append(name)
+        filename = os.path.join(self.test_dir, name + '.py')
+        f = open(filename, 'w')
+        f.write(code)
+        f.close()
+        if name in sys.modules:
+            # Make the change visible within the mtime resolution.
+            mtime = time.time() + 100
+            os.utime(filename, (mtime, mtime))
+
+
+class TestModuleReloader(Fixture):
+
+    def test_reload_changed_and_dependents(self):
+        self.write_module('ar_base', 'x = 1\ndef f():\n    return 1\n')
+        self.write_module('ar_user', 'from ar_base import f, x\n'
+                          'def g():\n    return f() + x\n')
+        self.write_module('ar_other', 'y = 1\n')
+        import ar_base, ar_user, ar_other
+        nt.assert_equal(self.reloader.check(), [])
+        f = ar_base.f
+
+        self.write_module('ar_base', 'x = 10\ndef f():\n    return 2\n')
+        nt.assert_equal(self.reloader.check(), ['ar_base', 'ar_user'])
+        # Old references see the new code
+        nt.assert_equal(f(), 2)
+        nt.assert_equal(ar_user.g(), 12)
+        nt.assert_equal(self.reloader.check(), [])
+
+    def test_old_instances_upgraded(self):
+        self.write_module('ar_cls', 'class A(object):\n'
+                          '    def f(self):\n        return 1\n')
+        import ar_cls
+        self.reloader.check()
+        a = ar_cls.A()
+        self.write_module('ar_cls', 'class A(object):\n'
+                          '    def f(self):\n        return 2\n'
+                          '    def g(self):\n        return 3\n')
+        nt.assert_equal(self.reloader.check(), ['ar_cls'])
+        nt.assert_equal(a.f(), 2)
+        nt.assert_equal(a.g(), 3)
+
+    def test_skip_modules(self):
+        self.write_module('ar_skip', 'x = 1\n')
+        import ar_skip
+        self.reloader.skip_modules['ar_skip'] = True
+        self.reloader.check()
+        self.write_module('ar_skip', 'x = 2\n')
+        nt.assert_equal(self.reloader.check(), [])
+        nt.assert_equal(ar_skip.x, 1)
+
+
+def test_reload_order():
+    deps = {'a': set(), 'b': set(['a']), 'c': set(['b', 'a']),
+            'd': set(['os']), 'e': set(['c'])}
+    nt.assert_equal(reload_order(['a'], deps), ['a', 'b', 'c', 'e'])
+    nt.assert_equal(reload_order(['c', 'b'], deps), ['b', 'c', 'e'])
+    nt.assert_equal(reload_order(['d'], deps), ['d'])
@@ -34,6 +34,28 @@ ANSI_PATTERN = re.compile('\x01?\x1b(%s|%s)\x02?' % \
                               (CSI_SUBPATTERN, OSC_SUBPATTERN))
 SPECIAL_PATTERN = re.compile('([\f])')
 
+# SGR codes which simply set attributes, mapped to the (attribute, value) pairs
+# they set. Codes 0, 1, 38 and 48 are handled separately.
+SGR_ATTRIBUTES = {
+    2  : (('intensity', 0),),
+    3  : (('italic', True),),
+    4  : (('underline', True),),
+    22 : (('intensity', 0), ('bold', False)),
+    23 : (('italic', False),),
+    24 : (('underline', False),),
+    39 : (('foreground_color', None),),
+    49 : (('background_color', None),),
+    }
+for i in xrange(8):
+    SGR_ATTRIBUTES[30 + i] = (('foreground_color', i),)
+    SGR_ATTRIBUTES[40 + i] = (('background_color', i),)
+del i
+
+# Parsed CSI parameters, by parameter string. The same few codes are used over
+# and over, so this saves most of the parsing.
+_csi_params = {}
+_csi_params_max = 1000
+
 #-----------------------------------------------------------------------------
 # Classes
 #-----------------------------------------------------------------------------
@@ -74,34 +96,46 @@ class AnsiCodeProcessor(object):
         """ Yields substrings for which the same escape code applies.
         """
         self.actions = []
-        start = 0
 
+        # Fast path: most text has neither escape codes nor special characters.
+        if '\x1b' not in string and '\f' not in string:
+            if string:
+                yield string
+            return
+
+        start = 0
         for match in ANSI_PATTERN.finditer(string):
-            raw = string[start:match.start()]
-            substring = SPECIAL_PATTERN.sub(self._replace_special, raw)
+            substring = string[start:match.start()]
+            if '\f' in substring:
+                substring = SPECIAL_PATTERN.sub(self._replace_special, substring)
             if substring or self.actions:
                 yield substring
             start = match.end()
 
             self.actions = []
-            groups = filter(lambda x: x is not None, match.groups())
-            params = [ param for param in groups[1].split(';') if param ]
-            if groups[0].startswith('['):
+            params, command, osc_params = match.group(2, 3, 4)
+            if command is not None:
                 # Case 1: CSI code.
-                try:
-                    params = map(int, params)
-                except ValueError:
-                    # Silently discard badly formed codes.
-                    pass
-                else:
-                    self.set_csi_code(groups[2], params)
+                parsed = _csi_params.get(params)
+                if parsed is None:
+                    try:
+                        parsed = tuple([ int(param) for param
+                                         in params.split(';') if param ])
+                    except ValueError:
+                        # Silently discard badly formed codes.
+                        continue
+                    if len(_csi_params) < _csi_params_max:
+                        _csi_params[params] = parsed
+                self.set_csi_code(command, parsed)
 
-            elif groups[0].startswith(']'):
+            else:
                 # Case 2: OSC code.
-                self.set_osc_code(params)
+                self.set_osc_code([ param for param in osc_params.split(';')
+                                    if param ])
 
-        raw = string[start:]
-        substring = SPECIAL_PATTERN.sub(self._replace_special, raw)
+        substring = string[start:]
+        if '\f' in substring:
+            substring = SPECIAL_PATTERN.sub(self._replace_special, substring)
         if substring or self.actions:
             yield substring
 
@@ -173,50 +207,28 @@ class AnsiCodeProcessor(object):
             sequence will have one element per command, although certain
             xterm-specific commands requires multiple elements.
         """
-        # Always consume the first parameter.
-        if not params:
-            return
-        code = params.pop(0)
-
-        if code == 0:
-            self.reset_sgr()
-        elif code == 1:
-            if self.bold_text_enabled:
-                self.bold = True
-            else:
-                self.intensity = 1
-        elif code == 2:
-            self.intensity = 0
-        elif code == 3:
-            self.italic = True
-        elif code == 4:
-            self.underline = True
-        elif code == 22:
-            self.intensity = 0
-            self.bold = False
-        elif code == 23:
-            self.italic = False
-        elif code == 24:
-            self.underline = False
-        elif code >= 30 and code <= 37:
-            self.foreground_color = code - 30
-        elif code == 38 and params and params.pop(0) == 5: 
-            # xterm-specific: 256 color support.
-            if params:
-                self.foreground_color = params.pop(0)
-        elif code == 39:
-            self.foreground_color = None
-        elif code >= 40 and code <= 47:
-            self.background_color = code - 40
-        elif code == 48 and params and params.pop(0) == 5:
-            # xterm-specific: 256 color support.
-            if params:
-                self.background_color = params.pop(0)
-        elif code == 49:
-            self.background_color = None
-
-        # Recurse with unconsumed parameters.
-        self.set_sgr_code(params)
+        params = iter(params)
+        for code in params:
+            attributes = SGR_ATTRIBUTES.get(code)
+            if attributes is not None:
+                for name, value in attributes:
+                    setattr(self, name, value)
+            elif code == 0:
+                self.reset_sgr()
+            elif code == 1:
+                if self.bold_text_enabled:
+                    self.bold = True
+                else:
+                    self.intensity = 1
+            elif code == 38 or code == 48:
+                # xterm-specific: 256 color support.
+                if next(params, None) == 5:
+                    color = next(params, None)
+                    if color is not None:
+                        if code == 38:
+                            self.foreground_color = color
+                        else:
+                            self.background_color = color
 
     #---------------------------------------------------------------------------
     # Protected interface
@@ -265,6 +277,12 @@ class QtAnsiCodeProcessor(AnsiCodeProcessor):
     # Set the default color map for super class.
     default_color_map = darkbg_color_map.copy()
 
+    def __init__(self):
+        # Formats for each combination of style attributes. They must be
+        # cleared when the color map changes.
+        self._formats = {}
+        super(QtAnsiCodeProcessor, self).__init__()
+
     def get_color(self, color, intensity=0):
         """ Returns a QColor for a given color code, or None if one cannot be
             constructed.
@@ -291,6 +309,25 @@ class QtAnsiCodeProcessor(AnsiCodeProcessor):
     
     def get_format(self):
         """ Returns a QTextCharFormat that encodes the current style attributes.
+
+        The formats are cached and shared, they must not be modified.
+        """
+        key = (self.foreground_color, self.background_color, self.intensity,
+               self.bold, self.italic, self.underline)
+        format = self._formats.get(key)
+        if format is None:
+            format = self._formats[key] = self._make_format()
+        return format
+
+    def set_osc_code(self, params):
+        """ Reimplemented to clear the cached formats, as the color map may
+            change.
+        """
+        super(QtAnsiCodeProcessor, self).set_osc_code(params)
+        self._formats = {}
+
+    def _make_format(self):
+        """ Returns a new QTextCharFormat for the current style attributes.
         """
         format = QtGui.QTextCharFormat()
 
@@ -332,3 +369,4 @@ class QtAnsiCodeProcessor(AnsiCodeProcessor):
 
         # Update the current color map with the new defaults.
         self.color_map.update(self.default_color_map)
+        self._formats = {}
@@ -61,6 +61,12 @@ class ConsoleWidget(Configurable, QtGui.QWidget):
     # non-positive number disables text truncation (not recommended).
     buffer_size = Int(500, config=True)
 
+    # The maximum number of times per second that buffered output (see
+    # '_append_plain_text_buffered') is written to the console. Output arriving
+    # in between is written at once, which is much faster for programs that
+    # print many small chunks. A non-positive number disables buffering.
+    output_flush_rate = Int(30, config=True)
+
     # Whether to use a list widget or plain text output for tab completion.
     gui_completion = Bool(False, config=True)
 
@@ -173,6 +179,7 @@ class ConsoleWidget(Configurable, QtGui.QWidget):
         self._filter_drag = False
         self._filter_resize = False
         self._html_exporter = HtmlExporter(self._control)
+        self._pending_text = []
         self._prompt = ''
         self._prompt_html = None
         self._prompt_pos = 0
@@ -182,6 +189,11 @@ class ConsoleWidget(Configurable, QtGui.QWidget):
         self._tab_width = 8
         self._text_completing_pos = 0
 
+        # Timer for writing the buffered output.
+        self._flush_timer = QtCore.QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self._flush_pending_text)
+
         # Set a monospaced font.
         self.reset_font()
 
@@ -693,6 +705,18 @@ class ConsoleWidget(Configurable, QtGui.QWidget):
         cursor = self._get_end_cursor()
         self._insert_plain_text(cursor, text)
 
+    def _append_plain_text_buffered(self, text):
+        """ Appends plain text at the end of the console buffer like
+            _append_plain_text, but the text is buffered and written at most
+            'output_flush_rate' times per second. Anything else written to the
+            console, or asking for its end, writes the buffered text first.
+        """
+        self._pending_text.append(text)
+        if self.output_flush_rate <= 0:
+            self._flush_pending_text()
+        elif not self._flush_timer.isActive():
+            self._flush_timer.start(1000 // self.output_flush_rate)
+
     def _append_plain_text_keeping_prompt(self, text):
         """ Writes 'text' after the current prompt, then restores the old prompt
             with its old input buffer.
@@ -1278,9 +1302,37 @@ class ConsoleWidget(Configurable, QtGui.QWidget):
         """
         return self._control.textCursor()
                 
+    def _flush_pending_text(self):
+        """ Writes the text buffered by _append_plain_text_buffered, in a single
+            edit block.
+        """
+        self._flush_timer.stop()
+        text = ''.join(self._pending_text)
+        self._pending_text = []
+        if not text:
+            return
+
+        # While executing, only the last 'buffer_size' lines will survive
+        # truncation, so don't lay out the others. Their ANSI codes are still
+        # processed to keep the current format right.
+        if self._executing and self.buffer_size > 0:
+            lines = text.split('\n')
+            if len(lines) > self.buffer_size:
+                if self.ansi_codes:
+                    dropped = '\n'.join(lines[:-self.buffer_size])
+                    for substring in self._ansi_processor.split_string(dropped):
+                        pass
+                text = '\n'.join(lines[-self.buffer_size:])
+
+        cursor = self._get_end_cursor()
+        self._insert_plain_text(cursor, text)
+        self._control.moveCursor(QtGui.QTextCursor.End)
+
     def _get_end_cursor(self):
         """ Convenience method that returns a cursor for the last character.
         """
+        if self._pending_text:
+            self._flush_pending_text()
         cursor = self._control.textCursor()
         cursor.movePosition(QtGui.QTextCursor.End)
         return cursor
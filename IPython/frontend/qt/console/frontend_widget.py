@@ -367,9 +367,9 @@ class FrontendWidget(HistoryConsoleWidget, BaseFrontendMixin):
             # to spaces so that output looks as expected regardless of this
             # widget's tab width.
             text = msg['content']['data'].expandtabs(8)
-            
-            self._append_plain_text(text)
-            self._control.moveCursor(QtGui.QTextCursor.End)
+
+            # Buffered, so that many small messages are written at once.
+            self._append_plain_text_buffered(text)
 
     def _handle_shutdown_reply(self, msg):
         """ Handle shutdown signal, only if from other console.
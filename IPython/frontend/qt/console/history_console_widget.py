@@ -2,13 +2,40 @@
 from IPython.external.qt import QtGui
 
 # Local imports
+from IPython.utils.traitlets import Int
 from console_widget import ConsoleWidget
 
 
+class _HistoryItems(object):
+    """ A list of history items, oldest first, which may be extended with
+        older items fetched from the kernel.
+    """
+
+    def __init__(self, prefix='', items=()):
+        # The prefix of all the items, for a prefix search.
+        self.prefix = prefix
+        self.items = list(items)
+        # The position (session, line) of the oldest item fetched.
+        self.edge = None
+        # Whether there are no older items to fetch.
+        self.complete = False
+        # Whether older items have been requested.
+        self.pending = False
+        # The items, for lists which keep a single copy of each item.
+        self.seen = None
+
+
 class HistoryConsoleWidget(ConsoleWidget):
     """ A ConsoleWidget that keeps a history of the commands that have been
         executed and provides a readline-esque interface to this history.
+
+        The history can be loaded lazily: older items are requested with
+        _request_history() as the user moves back through the history, and a
+        prefix search only goes through the items with this prefix.
     """
+
+    # The number of history items fetched at once.
+    history_page_size = Int(200, config=True)
     
     #---------------------------------------------------------------------------
     # 'object' interface
@@ -18,9 +45,12 @@ class HistoryConsoleWidget(ConsoleWidget):
         super(HistoryConsoleWidget, self).__init__(*args, **kw)
 
         # HistoryConsoleWidget protected variables.
-        self._history = []
+        self._history = _HistoryItems()
         self._history_index = 0
         self._history_prefix = ''
+        # The list the history index refers to: the history or the matches
+        # of a prefix search.
+        self._history_items = self._history
 
     #---------------------------------------------------------------------------
     # 'ConsoleWidget' public interface
@@ -39,11 +69,12 @@ class HistoryConsoleWidget(ConsoleWidget):
             # Save the command unless it was an empty string or was identical 
             # to the previous command.
             history = history.rstrip()
-            if history and (not self._history or self._history[-1] != history):
-                self._history.append(history)
+            items = self._history.items
+            if history and (not items or items[-1] != history):
+                items.append(history)
 
             # Move the history index to the most recent item.
-            self._history_index = len(self._history)
+            self._set_history_prefix('')
 
         return executed
 
@@ -61,10 +92,9 @@ class HistoryConsoleWidget(ConsoleWidget):
             # Set a search prefix based on the cursor position.
             col = self._get_input_buffer_cursor_column()
             input_buffer = self.input_buffer
-            if self._history_index == len(self._history) or \
+            if self._history_index == len(self._history_items.items) or \
                     (self._history_prefix and col != len(self._history_prefix)):
-                self._history_index = len(self._history)
-                self._history_prefix = input_buffer[:col]
+                self._set_history_prefix(input_buffer[:col])
 
             # Perform the search.
             self.history_previous(self._history_prefix)
@@ -120,18 +150,15 @@ class HistoryConsoleWidget(ConsoleWidget):
         prefix : str, optional
             If specified, search for an item with this prefix.
         """
-        index = self._history_index
-        while index > 0:
-            index -= 1
-            history = self._history[index]
-            if history.startswith(prefix):
-                break
-        else:
-            history = None
-        
-        if history is not None:
-            self._history_index = index
-            self.input_buffer = history
+        if prefix != self._history_prefix:
+            self._set_history_prefix(prefix)
+        if self._history_index > 0:
+            self._history_index -= 1
+            self.input_buffer = self._history_items.items[self._history_index]
+
+        # Fetch older items before the user gets to them.
+        if self._history_index <= self.history_page_size // 4:
+            self._fetch_history(self._history_items)
 
     def history_next(self, prefix=''):
         """ Set the input buffer to a subsequent item in the history, or to the
@@ -142,22 +169,109 @@ class HistoryConsoleWidget(ConsoleWidget):
         prefix : str, optional
             If specified, search for an item with this prefix.
         """
-        while self._history_index < len(self._history) - 1:
+        if prefix != self._history_prefix:
+            self._set_history_prefix(prefix)
+        items = self._history_items.items
+        if self._history_index < len(items) - 1:
             self._history_index += 1
-            history = self._history[self._history_index]
-            if history.startswith(prefix):
-                break
+            history = items[self._history_index]
         else:
-            self._history_index = len(self._history)
+            self._history_index = len(items)
             history = prefix
         self.input_buffer = history
 
+    #---------------------------------------------------------------------------
+    # 'HistoryConsoleWidget' abstract interface
+    #---------------------------------------------------------------------------
+
+    def _request_history(self, prefix, before, n):
+        """ Request the n latest history items with the given prefix (all the
+            items if it is empty) which are older than the item at position
+            'before', a (session, line) tuple, or None for the latest items.
+
+            The items should be passed to _add_history() when received. By
+            default, there is no history beyond the executed commands.
+        """
+        self._add_history(prefix, [])
+
     #---------------------------------------------------------------------------
     # 'HistoryConsoleWidget' protected interface
     #---------------------------------------------------------------------------
 
+    def _add_history(self, prefix, entries):
+        """ Add history items older than the ones loaded, as requested by
+            _request_history(). entries is a list of (session, line, source)
+            tuples, oldest first.
+        """
+        if not prefix:
+            items = self._history
+        elif prefix == self._history_items.prefix and \
+                self._history_items is not self._history:
+            items = self._history_items
+        else:
+            # The prefix search has been abandoned.
+            return
+        items.pending = False
+        if len(entries) < self.history_page_size:
+            items.complete = True
+        if entries:
+            items.edge = tuple(entries[0][:2])
+
+        new_items = []
+        for _, _, source in entries:
+            source = source.rstrip()
+            if not source:
+                continue
+            if items.seen is not None:
+                if source in items.seen:
+                    continue
+                items.seen.add(source)
+            elif new_items and new_items[-1] == source:
+                continue
+            new_items.append(source)
+        if items.seen is None and new_items and items.items and \
+                new_items[-1] == items.items[0]:
+            new_items.pop()
+
+        items.items[:0] = new_items
+        if items is self._history_items:
+            self._history_index += len(new_items)
+
+    def _fetch_history(self, items):
+        """ Request the items older than those of a history list, unless they
+            are already requested or there are none.
+        """
+        if not (items.complete or items.pending):
+            items.pending = True
+            self._request_history(items.prefix, items.edge,
+                                  self.history_page_size)
+
     def _set_history(self, history):
         """ Replace the current history with a sequence of history items.
         """
-        self._history = list(history)
-        self._history_index = len(self._history)
+        self._history = _HistoryItems(items=history)
+        self._history.complete = True
+        self._set_history_prefix('')
+
+    def _set_history_prefix(self, prefix):
+        """ Start a new search through the history, for items with the given
+            prefix, from the most recent item.
+        """
+        self._history_prefix = prefix
+        if prefix:
+            # The matches already loaded, the latest of each first.
+            matches = []
+            seen = set()
+            for item in reversed(self._history.items):
+                if item.startswith(prefix) and item not in seen:
+                    seen.add(item)
+                    matches.append(item)
+            matches.reverse()
+            items = _HistoryItems(prefix, matches)
+            items.seen = seen
+            items.edge = self._history.edge
+            items.complete = self._history.complete
+            self._history_items = items
+        else:
+            self._history_items = self._history
+        self._history_index = len(self._history_items.items)
@@ -18,6 +18,7 @@ from IPython.external.qt import QtCore, QtGui
 # Local imports
 from IPython.core.inputsplitter import IPythonInputSplitter, \
     transform_ipy_prompt
+from IPython.core.history import prefix_pattern
 from IPython.core.usage import default_gui_banner
 from IPython.utils.traitlets import Bool, Str, Unicode
 from frontend_widget import FrontendWidget
@@ -108,6 +109,8 @@ class IPythonWidget(FrontendWidget):
             self._payload_source_loadpy : self._handle_payload_loadpy }
         self._previous_prompt_obj = None
         self._keep_kernel_on_exit = None
+        # Maps the msg_id of history requests to their search prefix.
+        self._history_requests = {}
 
         # Initialize widget styling.
         if self.style_sheet:
@@ -158,6 +161,15 @@ class IPythonWidget(FrontendWidget):
             else:
                 super(IPythonWidget, self)._handle_execute_reply(msg)
 
+    def _handle_history_reply(self, msg):
+        """ Implemented to handle history replies, which are only supported
+            by the IPython kernel.
+        """
+        prefix = self._history_requests.pop(msg['parent_header']['msg_id'],
+                                            None)
+        if prefix is not None:
+            self._add_history(prefix, msg['content']['history'])
+
     def _handle_history_tail_reply(self, msg):
         """ Implemented to handle history tail replies, which are only supported
             by the IPython kernel.
@@ -210,7 +222,7 @@ class IPythonWidget(FrontendWidget):
         """ Reimplemented to make a history request.
         """
         super(IPythonWidget, self)._started_channels()
-        self.kernel_manager.xreq_channel.history_tail(1000)
+        self._fetch_history(self._history)
 
     #---------------------------------------------------------------------------
     # 'ConsoleWidget' public interface
@@ -235,6 +247,23 @@ class IPythonWidget(FrontendWidget):
         """
         self.execute('%%run %s' % path, hidden=hidden)
 
+    #---------------------------------------------------------------------------
+    # 'HistoryConsoleWidget' abstract interface
+    #---------------------------------------------------------------------------
+
+    def _request_history(self, prefix, before, n):
+        """ Implemented to page through the history database of the kernel.
+            Prefix searches are a GLOB search of the kernel, which scans the
+            history backwards from 'before'.
+        """
+        xreq = self.kernel_manager.xreq_channel
+        if prefix:
+            msg_id = xreq.history('search', pattern=prefix_pattern(prefix),
+                                  n=n, unique=True, before=before)
+        else:
+            msg_id = xreq.history('tail', n=n, before=before)
+        self._history_requests[msg_id] = prefix
+
     #---------------------------------------------------------------------------
     # 'FrontendWidget' protected interface
     #---------------------------------------------------------------------------
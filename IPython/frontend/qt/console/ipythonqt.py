@@ -152,6 +152,8 @@ def main():
                         help='set the REP channel port [default random]')
     kgroup.add_argument('--hb', type=int, metavar='PORT', default=0,
                         help='set the heartbeat port [default random]')
+    kgroup.add_argument('--control', type=int, metavar='PORT', default=0,
+                        help='set the control channel port [default random]')
 
     egroup = kgroup.add_mutually_exclusive_group()
     egroup.add_argument('--pure', action='store_true', help = \
@@ -208,7 +210,8 @@ def main():
     kernel_manager = QtKernelManager(xreq_address=(args.ip, args.xreq),
                                      sub_address=(args.ip, args.sub),
                                      rep_address=(args.ip, args.rep),
-                                     hb_address=(args.ip, args.hb))
+                                     hb_address=(args.ip, args.hb),
+                                     control_address=(args.ip, args.control))
     if not args.existing:
         # if not args.ip in LOCAL_IPS+ALL_ALIAS:
         #     raise ValueError("Must bind a local ip, such as: %s"%LOCAL_IPS)
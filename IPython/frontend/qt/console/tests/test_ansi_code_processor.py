@@ -51,6 +51,19 @@ class TestAnsiCodeProcessor(unittest.TestCase):
                 self.fail('Too many substrings.')
         self.assertEquals(i, 2, 'Too few substrings.')
 
+    def test_colors_combined(self):
+        """ Are several SGR codes in one sequence all applied?
+        """
+        string = '\x1b[1;34;42mbold\x1b[22;39mplain\x1b[5;xmbad'
+        substrings = []
+        for substring in self.processor.split_string(string):
+            substrings.append((substring, self.processor.intensity,
+                               self.processor.foreground_color,
+                               self.processor.background_color))
+        self.assertEquals(substrings, [('bold', 1, 4, 2),
+                                       ('plain', 0, None, 2),
+                                       ('bad', 0, None, 2)])
+
     def test_colors_xterm(self):
         """ Do xterm-specific control sequences for colors work?
         """
@@ -90,6 +103,14 @@ class TestAnsiCodeProcessor(unittest.TestCase):
                 self.fail('Too many substrings.')
         self.assertEquals(i, 1, 'Too few substrings.')
 
+    def test_plain(self):
+        """ Is text without codes passed through unchanged?
+        """
+        string = 'no codes here\n'
+        self.assertEquals(list(self.processor.split_string(string)), [string])
+        self.assertEquals(self.processor.actions, [])
+        self.assertEquals(list(self.processor.split_string('')), [])
+
     def test_specials(self):
         """ Are special characters processed correctly?
         """
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Grow and shrink the set of engines of a cluster with its task queue.
+"""
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2008-2009  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+import time
+
+from twisted.internet.task import LoopingCall
+from twisted.python import log
+
+from IPython.config.configurable import Configurable
+from IPython.utils.traitlets import Int, Float
+from IPython.kernel.twistedutil import gatherBoth
+
+#-----------------------------------------------------------------------------
+# The autoscaler
+#-----------------------------------------------------------------------------
+
+
+class Autoscaler(Configurable):
+    """Add and retire engines depending on the state of the task queue.
+
+    Every ``interval`` seconds the autoscaler asks the task controller for its
+    :meth:`queue_status`.  Engines are added, using new instances of an
+    engine set launcher class, when the number of scheduled tasks per engine
+    goes above ``queue_threshold`` or when the oldest scheduled task has
+    waited more than ``wait_threshold`` seconds.  Engines that have been
+    idle for ``idle_timeout`` seconds while no tasks are scheduled are
+    killed.  The number of engines is kept between ``min_engines`` and
+    ``max_engines``.
+
+    Only the engines started by the autoscaler are ever retired, and only if
+    their multiengine queue is empty, as the task controller doesn't know
+    about multiengine work.
+    """
+
+    # The bounds on the number of engines.
+    min_engines = Int(1, config=True)
+    max_engines = Int(8, config=True)
+    # Add engines when there are more than this many scheduled tasks per
+    # engine.
+    queue_threshold = Float(1.0, config=True)
+    # Add engines when a task has waited longer than this, in seconds.
+    wait_threshold = Float(10.0, config=True)
+    # Retire engines that have been idle for this long, in seconds.
+    idle_timeout = Float(60.0, config=True)
+    # The maximum number of engines to add at once.
+    step = Int(4, config=True)
+    # The time between two looks at the task queue, in seconds.
+    interval = Float(1.0, config=True)
+    # How long engines we started get to register before we start more.
+    start_timeout = Float(60.0, config=True)
+
+    def __init__(self, task_client=None, multiengine_client=None,
+                 launcher_class=None, cluster_dir=u'', work_dir=u'',
+                 config=None):
+        super(Autoscaler, self).__init__(config=config)
+        self.task_client = task_client
+        self.multiengine_client = multiengine_client
+        self.launcher_class = launcher_class
+        self.cluster_dir = cluster_dir
+        self.work_dir = work_dir
+        self.launchers = []
+        self.idle_since = {}
+        # The ids of the engines we have started, and the number of those
+        # that have not registered yet.
+        self.owned = set()
+        self.unclaimed = 0
+        # The ids of the engines at the previous look, None before the first.
+        self.known = None
+        self.expected = 0
+        self.last_start = None
+        self.loop = None
+
+    def start(self):
+        """Start watching the task queue."""
+        log.msg('Starting Autoscaler: %i to %i engines' %
+                (self.min_engines, self.max_engines))
+        self.loop = LoopingCall(self.check)
+        self.loop.start(self.interval, now=False)
+
+    def stop(self):
+        """Stop watching and stop the engines we have started."""
+        if self.loop is not None and self.loop.running:
+            self.loop.stop()
+        dlist = [el.stop() for el in self.launchers if el.running]
+        return gatherBoth(dlist, consumeErrors=True)
+
+    def check(self):
+        """Look at the task queue and act on it."""
+        d = self.task_client.queue_status(True)
+        d.addCallback(self.update)
+        d.addErrback(self.log_err)
+        return d
+
+    def log_err(self, f):
+        log.msg('Autoscaler error: %s' % f.getErrorMessage())
+        return None
+
+    def update(self, status):
+        n, retire = self.decide(status, time.time())
+        dlist = []
+        if n:
+            dlist.append(self.start_engines(n))
+        if retire:
+            dlist.append(self.retire_engines(retire))
+        return gatherBoth(dlist, consumeErrors=True)
+
+    def decide(self, status, now):
+        """Decide what to do for a verbose queue status.
+
+        Returns the number of engines to start and the list of ids of the
+        engines to retire.
+        """
+        engines = status['engines']
+        idle = status['idle']
+        nscheduled = len(status['scheduled'])
+        n = len(engines)
+
+        # The engines which registered since the previous look are ours if
+        # we are waiting for some.
+        if self.known is not None and self.unclaimed:
+            new = sorted(set(engines) - self.known)[:self.unclaimed]
+            self.owned.update(new)
+            self.unclaimed -= len(new)
+        self.known = set(engines)
+        self.owned &= self.known
+
+        # Keep track of how long each engine has been idle.
+        for id in self.idle_since.keys():
+            if id not in idle:
+                del self.idle_since[id]
+        for id in idle:
+            self.idle_since.setdefault(id, now)
+
+        # Count the engines we have started that have not registered yet,
+        # unless they are taking too long.
+        starting = self.last_start is not None and \
+            now - self.last_start < self.start_timeout
+        if starting and n < self.expected:
+            expected = self.expected
+        else:
+            expected = n
+
+        nstart = 0
+        if expected < self.min_engines:
+            nstart = self.min_engines - expected
+        elif expected < self.max_engines and nscheduled and \
+                (nscheduled > self.queue_threshold*max(expected, 1) or
+                 status['wait'] > self.wait_threshold):
+            nstart = min(self.step, self.max_engines - expected)
+        if nstart:
+            self.expected = expected + nstart
+            self.unclaimed += nstart
+            self.last_start = now
+            return nstart, []
+
+        retire = []
+        if not nscheduled and n > self.min_engines:
+            for id in sorted(self.idle_since):
+                if id in self.owned and \
+                        now - self.idle_since[id] >= self.idle_timeout:
+                    retire.append(id)
+            retire = retire[:n-self.min_engines]
+            for id in retire:
+                del self.idle_since[id]
+        self.expected = expected - len(retire)
+        return 0, retire
+
+    def start_engines(self, n):
+        """Start n more engines using a new launcher."""
+        log.msg('Autoscaler: starting %i engines' % n)
+        el = self.launcher_class(work_dir=self.work_dir, config=self.config)
+        self.launchers.append(el)
+        return el.start(n, cluster_dir=self.cluster_dir)
+
+    def retire_engines(self, ids):
+        """Kill the engines with the given ids, unless they are busy.
+
+        The engines with multiengine commands queued or running are left
+        alone.
+        """
+        d = self.multiengine_client.queue_status(ids, True)
+        d.addCallback(self._kill_idle)
+        return d
+
+    def _kill_idle(self, statuses):
+        ids = [id for id, s in statuses
+               if not s['queue'] and s['pending'] == repr(None)]
+        if not ids:
+            return None
+        log.msg('Autoscaler: retiring idle engines %r' % ids)
+        return self.multiengine_client.kill(False, ids, True)
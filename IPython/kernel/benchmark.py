@@ -0,0 +1,257 @@
+# encoding: utf-8
+"""Performance benchmarks for a running IPython cluster.
+
+The functions in this module take blocking multiengine and task clients (the
+ones returned by :mod:`IPython.kernel.client`) and return plain dicts that can
+be dumped as JSON and compared across releases.  The main entry point is
+:func:`run_benchmarks`, which is what ``ipcluster benchmark`` calls::
+
+    ipcluster start -n 4 --daemon
+    ipcluster benchmark -o results.json
+
+All timings are wall clock and reported in milliseconds (latencies) or in
+units per second (throughputs).
+"""
+
+__docformat__ = "restructuredtext en"
+
+#-------------------------------------------------------------------------------
+#  Copyright (C) 2008  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# Imports
+#-------------------------------------------------------------------------------
+
+import cPickle as pickle
+import json
+import os
+import sys
+
+from IPython.utils.timing import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#-------------------------------------------------------------------------------
+# Helpers
+#-------------------------------------------------------------------------------
+
+def percentile(sorted_values, p):
+    """Return the p-th percentile (0-100) of an already sorted sequence.
+
+    Linear interpolation between the closest ranks is used, so that the 50th
+    percentile of an even length sequence is the mean of the middle values.
+    """
+    if not sorted_values:
+        raise ValueError("percentile of an empty sequence")
+    k = (len(sorted_values)-1)*(p/100.0)
+    lo = int(k)
+    hi = min(lo+1, len(sorted_values)-1)
+    return sorted_values[lo] + (sorted_values[hi]-sorted_values[lo])*(k-lo)
+
+
+def summarize(times):
+    """Summarize a list of durations in seconds as milliseconds.
+
+    Returns a dict with the count, min, mean, max and the 50th, 90th and 99th
+    percentiles.
+    """
+    values = sorted(1000.0*t for t in times)
+    return dict(
+        count=len(values),
+        min=values[0],
+        mean=sum(values)/len(values),
+        max=values[-1],
+        p50=percentile(values, 50),
+        p90=percentile(values, 90),
+        p99=percentile(values, 99),
+    )
+
+
+def time_calls(f, n, *args, **kwargs):
+    """Call f(*args, **kwargs) n times and return the list of durations."""
+    times = []
+    for i in xrange(n):
+        start = time.time()
+        f(*args, **kwargs)
+        times.append(time.time()-start)
+    return times
+
+
+def process_cpu_time(pid):
+    """Return the user+system CPU seconds used so far by process pid.
+
+    This reads ``/proc/<pid>/stat`` and thus only works on Linux.  None is
+    returned if the information is not available.
+    """
+    try:
+        with open('/proc/%i/stat' % pid) as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except (IOError, IndexError, TypeError):
+        return None
+    # Fields 14 and 15 of stat(5), counted after the ") " that ends comm.
+    ticks = int(fields[11]) + int(fields[12])
+    return float(ticks)/os.sysconf('SC_CLK_TCK')
+
+#-------------------------------------------------------------------------------
+# Benchmarks
+#-------------------------------------------------------------------------------
+
+def bench_latency(mec, n=100, size=1000):
+    """Latency of the basic multiengine operations, in milliseconds.
+
+    Each of execute, push, pull, scatter and gather is called `n` times on
+    all engines.  push and pull move a list of `size` floats, scatter and
+    gather a list of `size` floats per engine.  The number of operations
+    timed is returned under the ``'operations'`` key so callers can
+    normalize other measurements by it.  Each operation makes one or more
+    remote calls to the controller, and fans out to the engines, so this is
+    not a count of messages.
+    """
+    nengines = len(mec.get_ids())
+    data = [0.0]*size
+    seq = [0.0]*(size*nengines)
+    mec.push(dict(_bench_a=data))
+    mec.scatter('_bench_s', seq)
+    results = {}
+    results['execute'] = summarize(time_calls(mec.execute, n, 'pass'))
+    results['push'] = summarize(time_calls(mec.push, n, dict(_bench_a=data)))
+    results['pull'] = summarize(time_calls(mec.pull, n, '_bench_a'))
+    results['scatter'] = summarize(time_calls(mec.scatter, n, '_bench_s', seq))
+    results['gather'] = summarize(time_calls(mec.gather, n, '_bench_s'))
+    mec.execute('del _bench_a, _bench_s')
+    results['operations'] = 5*n
+    return results
+
+
+def _tiny_task(x):
+    return x
+
+
+def _medium_task(n):
+    s = 0
+    for i in xrange(n):
+        s += i*i
+    return s
+
+
+def bench_tasks(tc, n=200, medium_size=100000):
+    """Throughput of the task farming interface, in tasks per second.
+
+    `n` tiny tasks (the identity function) and `n` medium tasks (a pure
+    Python loop of `medium_size` iterations) are submitted at once and the
+    time until all of them have completed is measured.  The number of tasks
+    run is returned under the ``'operations'`` key.
+    """
+    from IPython.kernel.task import MapTask
+    results = {}
+    for name, f, arg in [('tiny', _tiny_task, 0),
+                         ('medium', _medium_task, medium_size)]:
+        start = time.time()
+        tids = [tc.run(MapTask(f, args=(arg,))) for i in xrange(n)]
+        tc.barrier(tids)
+        elapsed = time.time()-start
+        for tid in tids:
+            tc.get_task_result(tid, block=True)
+        results[name] = dict(tasks=n, seconds=elapsed, rate=n/elapsed)
+    results['operations'] = 2*n
+    return results
+
+
+def _serialization_samples(size):
+    samples = [
+        ('str', 'x'*(size*8)),
+        ('list_of_floats', [float(i) for i in xrange(size)]),
+        ('list_of_ints', range(size)),
+        ('dict_of_strs', dict(('k%i' % i, 'v%i' % i) for i in xrange(size//2))),
+        ('tuple_of_mixed', tuple((i, str(i), float(i)) for i in xrange(size//4))),
+    ]
+    if numpy is not None:
+        samples.append(('ndarray_float64', numpy.arange(size, dtype='float64')))
+    return samples
+
+
+def bench_serialization(size=100000, repeat=5):
+    """Pickle round trip throughput for common types, in MB per second.
+
+    This runs locally and measures what every push, pull and task pays on
+    both ends of the wire.  For each type the best of `repeat` round trips
+    (dumps followed by loads with the highest protocol) is reported.
+    """
+    results = {}
+    for name, obj in _serialization_samples(size):
+        best = None
+        for i in xrange(repeat):
+            start = time.time()
+            s = pickle.dumps(obj, 2)
+            pickle.loads(s)
+            elapsed = time.time()-start
+            if best is None or elapsed < best:
+                best = elapsed
+        nbytes = len(s)
+        results[name] = dict(
+            bytes=nbytes,
+            msec=1000.0*best,
+            mb_per_sec=(1e-6*nbytes/best) if best > 0 else None
+        )
+    return results
+
+
+def run_benchmarks(mec, tc=None, controller_pid=None, n=100, size=1000):
+    """Run all the benchmarks and return the results as a dict.
+
+    Parameters
+    ----------
+    mec : blocking multiengine client
+        Used for the latency benchmarks.
+    tc : blocking task client
+        Used for the task farm benchmarks, which are skipped if None.
+    controller_pid : int
+        The pid of the controller.  When given, and if it runs on this
+        host, the controller CPU time consumed per benchmark operation (a
+        latency benchmark call or a task) is reported.
+    n : int
+        The number of calls per latency benchmark.
+    size : int
+        The payload size used by the latency benchmarks.
+    """
+    import IPython
+    results = dict(
+        ipython_version=IPython.__version__,
+        python_version=sys.version.split()[0],
+        platform=sys.platform,
+        time=time.time(),
+        engines=len(mec.get_ids()),
+    )
+    cpu_start = process_cpu_time(controller_pid)
+    operations = 0
+    latency = bench_latency(mec, n, size)
+    operations += latency.pop('operations')
+    results['latency'] = latency
+    if tc is not None:
+        tasks = bench_tasks(tc, n=2*n)
+        operations += tasks.pop('operations')
+        results['tasks'] = tasks
+    cpu_stop = process_cpu_time(controller_pid)
+    if cpu_start is not None and cpu_stop is not None:
+        results['controller_cpu'] = dict(
+            seconds=cpu_stop-cpu_start,
+            operations=operations,
+            usec_per_operation=1e6*(cpu_stop-cpu_start)/operations
+        )
+    else:
+        results['controller_cpu'] = None
+    results['serialization'] = bench_serialization()
+    return results
+
+
+def dump_results(results, f):
+    """Write the results of :func:`run_benchmarks` to a file object as JSON."""
+    json.dump(results, f, indent=2, sort_keys=True)
+    f.write('\n')
@@ -140,8 +140,13 @@ class ControllerService(object, service.Service):
     implements(IControllerBase)
     name = 'ControllerService'
     
-    def __init__(self, maxEngines=511, saveIDs=False):
+    def __init__(self, maxEngines=511, saveIDs=False, pipeline=False,
+                 result_timeout=None):
         self.saveIDs = saveIDs
+        # Passed on to the QueuedEngine of each engine registered.
+        self.pipeline = pipeline
+        # Used by the SynchronousMultiEngine adapters of the controller.
+        self.result_timeout = result_timeout
         self.engines = {}
         self.availableIDs = range(maxEngines,-1,-1)   # [511,...,0]
         self._onRegister = []
@@ -238,6 +243,7 @@ class ControllerService(object, service.Service):
             getID = self.availableIDs.pop()
         remoteEngine.id = getID
         remoteEngine.service = self
+        remoteEngine.pipeline = self.pipeline
         self.engines[getID] = remoteEngine
 
         # Log the Engine Information for monitoring purposes
@@ -47,7 +47,9 @@ from IPython.kernel.pickleutil import (
     canSequence,
     uncan,
     uncanDict,
-    uncanSequence
+    uncanSequence,
+    CannedFunction,
+    FunctionCache
 )
 
 
@@ -82,11 +84,15 @@ class FCEngineReferenceFromService(Referenceable, object):
         
     implements(IFCEngine)
     
+    # The number of pushed functions to keep, see remote_push_function_digests
+    function_cache_size = 128
+    
     def __init__(self, service):
         assert IEngineBase.providedBy(service), \
             "IEngineBase is not provided by" + repr(service)
         self.service = service
         self.collectors = {}
+        self.function_cache = FunctionCache(self.function_cache_size)
     
     def remote_get_id(self):
         return self.service.id
@@ -139,13 +145,42 @@ class FCEngineReferenceFromService(Referenceable, object):
         except:
             return defer.fail(failure.Failure()).addErrback(packageFailure)
         else:
-            # The usage of globals() here is an attempt to bind any pickled functions
-            # to the globals of this module.  What we really want is to have it bound
-            # to the globals of the callers module.  This will require walking the 
-            # stack.  BG 10/3/07.
-            namespace = uncanDict(namespace, globals())
+            # Remember the functions by digest so they can be pushed again
+            # with remote_push_function_digests.
+            for k, v in namespace.iteritems():
+                digest = getattr(v, 'digest', None)
+                # The usage of globals() here is an attempt to bind any pickled functions
+                # to the globals of this module.  What we really want is to have it bound
+                # to the globals of the callers module.  This will require walking the 
+                # stack.  BG 10/3/07.
+                namespace[k] = uncan(v, globals())
+                if digest is not None:
+                    self.function_cache.add(digest, namespace[k])
             return self.service.push_function(namespace).addErrback(packageFailure)
     
+    def remote_push_function_digests(self, digests):
+        """Push functions that were already pushed, given only their digests.
+        
+        `digests` is a dict of names and code digests.  If all of the
+        functions are in the function cache they are pushed and an empty list
+        is returned.  Otherwise nothing is pushed and the names whose
+        functions are missing are returned, so the caller can push the
+        functions themselves with remote_push_function.
+        """
+        namespace = {}
+        missing = []
+        for k, digest in digests.iteritems():
+            f = self.function_cache.get(digest)
+            if f is None:
+                missing.append(k)
+            else:
+                namespace[k] = f
+        if missing:
+            return defer.succeed(missing)
+        d = self.service.push_function(namespace)
+        d.addCallback(lambda _: [])
+        return d.addErrback(packageFailure)
+    
     def remote_pull_function(self, keys):
         d = self.service.pull_function(keys)
         if len(keys)>1:
@@ -172,6 +207,28 @@ class FCEngineReferenceFromService(Referenceable, object):
     def remote_keys(self):
         return self.service.keys().addErrback(packageFailure)
     
+    def remote_run_batch(self, pCommands):
+        try:
+            commands = pickle.loads(pCommands)
+        except:
+            return defer.fail(failure.Failure()).addErrback(packageFailure)
+        else:
+            d = self.service.run_batch(commands)
+            d.addCallback(self._packageBatch)
+            d.addCallback(self._checkProperties)
+            d.addErrback(packageFailure)
+            return d
+    
+    def _packageBatch(self, results):
+        """Pickle the results of run_batch, packaging a trailing Failure."""
+        package = []
+        for r in results:
+            if isinstance(r, failure.Failure):
+                package.append((False, packageFailure(r)))
+            else:
+                package.append((True, r))
+        return pickle.dumps(package, 2)
+    
     #---------------------------------------------------------------------------
     # push/pull_serialized
     #---------------------------------------------------------------------------
@@ -248,11 +305,16 @@ class EngineFromReference(object):
     
     implements(IEngineBase)
     
+    # Push functions that the engine already has by their digest only
+    cache_functions = True
+    
     def __init__(self, reference):
         self.reference = reference
         self._id = None
         self._properties = StrictDict()
         self.currentCommand = None
+        # Digests of the functions pushed to this engine
+        self._pushed_digests = set()
     
     def callRemote(self, *args, **kwargs):
         try:
@@ -345,14 +407,37 @@ class EngineFromReference(object):
     #---------------------------------------------------------------------------
     
     def push_function(self, namespace):
+        namespace = canDict(namespace)
+        digests = {}
+        for k, v in namespace.iteritems():
+            if isinstance(v, CannedFunction):
+                digests[k] = v.digest
+        # If we have pushed these functions before, first try to push them by
+        # digest only.  The engine tells us if it no longer has them.
+        if self.cache_functions and namespace and \
+            len(digests) == len(namespace) and \
+            self._pushed_digests.issuperset(digests.itervalues()):
+            d = self.callRemote('push_function_digests', digests)
+            d.addCallback(self.checkReturnForFailure)
+            def push_missing(missing):
+                if missing:
+                    return self._push_canned_functions(namespace, digests)
+            d.addCallback(push_missing)
+            return d
+        return self._push_canned_functions(namespace, digests)
+    
+    def _push_canned_functions(self, namespace, digests):
         try:
-            package = pickle.dumps(canDict(namespace), 2)
+            package = pickle.dumps(namespace, 2)
         except:
             return defer.fail(failure.Failure())
         else:
             if isinstance(package, failure.Failure):
                 return defer.fail(package)
             else:
+                if len(self._pushed_digests) > 10000:
+                    self._pushed_digests.clear()
+                self._pushed_digests.update(digests.itervalues())
                 d = self.callRemote('push_function', package)
                 return d.addCallback(self.checkReturnForFailure)    
     
@@ -398,6 +483,27 @@ class EngineFromReference(object):
     def keys(self):
         return self.callRemote('keys').addCallback(self.checkReturnForFailure)
     
+    def run_batch(self, commands):
+        try:
+            package = pickle.dumps(commands, 2)
+        except:
+            return defer.fail(failure.Failure())
+        else:
+            d = self.callRemote('run_batch', package)
+            d.addCallback(self.syncProperties)
+            d.addCallback(self.checkReturnForFailure)
+            d.addCallback(self._unpackageBatch)
+            return d
+    
+    def _unpackageBatch(self, r):
+        results = []
+        for ok, value in pickle.loads(r):
+            if ok:
+                results.append(value)
+            else:
+                results.append(unpackageFailure(value))
+        return results
+    
     #---------------------------------------------------------------------------
     # Properties methods
     #---------------------------------------------------------------------------
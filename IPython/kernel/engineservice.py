@@ -41,6 +41,7 @@ __test__ = {}
 import copy
 import sys
 import cPickle as pickle
+from collections import deque
 
 from twisted.application import service
 from twisted.internet import defer, reactor
@@ -458,6 +459,44 @@ class EngineService(object, service.Service):
         d = self.executeAndRaise(msg, self._seedNamespace)
         return d
     
+    def run_batch(self, commands):
+        """Run a sequence of commands, stopping at the first failure.
+        
+        This lets a controller send several commands in a single round trip.
+        
+        :Parameters:
+            commands : list
+                A list of ``(method, args, kwargs)`` tuples.  Only the
+                methods listed in `batchable_methods` are allowed.
+        
+        :Returns: A deferred to a list with the result of each command that
+            was run.  If a command fails, its `Failure` is the last element
+            of the list and the remaining commands are not run.
+        """
+        results = []
+        
+        def run_next(i):
+            if i == len(commands):
+                return results
+            name, args, kwargs = commands[i]
+            if name not in batchable_methods:
+                d = defer.fail(AttributeError(
+                    "method can't be run in a batch: %r" % name))
+            else:
+                d = defer.maybeDeferred(getattr(self, name), *args, **kwargs)
+            return d.addCallbacks(save_result, save_failure,
+                                  callbackArgs=(i,))
+        
+        def save_result(result, i):
+            results.append(result)
+            return run_next(i+1)
+        
+        def save_failure(reason):
+            results.append(reason)
+            return results
+        
+        return defer.maybeDeferred(run_next, 0)
+    
     def kill(self):
         drop_engine(self.id)
         try:
@@ -559,6 +598,11 @@ class EngineService(object, service.Service):
             return packThemUp
 
 
+#: The methods that `QueuedEngine` may coalesce into a single ``run_batch``
+#: call to the underlying engine.
+batchable_methods = frozenset(['push', 'execute', 'pull'])
+
+
 def queue(methodToQueue):
     def queuedMethod(this, *args, **kwargs):
         name = methodToQueue.__name__
@@ -576,14 +620,23 @@ class QueuedEngine(object):
     mix-in intefaces.  The problem I have with this is adpatation is
     more difficult and complicated because there can be can multiple
     original and final Interfaces. 
+    
+    If `pipeline` is True and the engine has a ``run_batch`` method, runs of
+    consecutive queued push/execute/pull commands (up to `max_batch_size`)
+    are sent to the engine as a single ``run_batch`` call, which saves a
+    round trip per command for remote engines.
     """
     
     zi.implements(IEngineQueued)
     
-    def __init__(self, engine):
+    max_batch_size = 64
+    
+    def __init__(self, engine, pipeline=False):
         """Create a QueuedEngine object from an engine
         
         engine:       An implementor of IEngineCore and IEngineSerialized
+        pipeline:     whether to coalesce consecutive queued commands into
+                      one run_batch call.  Defaults to False.
         keepUpToDate: whether to update the remote status when the 
                       queue is empty.  Defaults to False.
         """
@@ -596,7 +649,8 @@ class QueuedEngine(object):
             
         self.engine = engine
         self.id = engine.id
-        self.queued = []
+        self.pipeline = pipeline
+        self.queued = deque()
         self.history = {}
         self.engineStatus = {}
         self.currentCommand = None
@@ -635,18 +689,39 @@ class QueuedEngine(object):
         f = getattr(self.engine, cmd.remoteMethod, None)
         if f:
             d = f(*cmd.args, **cmd.kwargs)
-            if cmd.remoteMethod is 'execute':
-                d.addCallback(self.saveResult)
-            d.addCallback(self.finishCommand)
+            if isinstance(cmd, CommandBatch):
+                d.addCallback(self.finishBatch)
+            else:
+                if cmd.remoteMethod is 'execute':
+                    d.addCallback(self.saveResult)
+                d.addCallback(self.finishCommand)
             d.addErrback(self.abortCommand)
         else:
             return defer.fail(AttributeError(cmd.remoteMethod))
     
+    def _nextBatch(self):
+        """Pop the run of batchable commands at the head of the queue."""
+        
+        batch = []
+        while self.queued and len(batch) < self.max_batch_size and \
+            self.queued[0].remoteMethod in batchable_methods:
+            batch.append(self.queued.popleft())
+        if len(batch) == 1:
+            self.queued.appendleft(batch[0])
+            return None
+        return batch or None
+    
     def _flushQueue(self):
         """Pop next command in queue and run it."""
         
-        if len(self.queued) > 0:
-            self.currentCommand = self.queued.pop(0)
+        if self.queued:
+            batch = None
+            if self.pipeline and hasattr(self.engine, 'run_batch'):
+                batch = self._nextBatch()
+            if batch is not None:
+                self.currentCommand = CommandBatch(batch)
+            else:
+                self.currentCommand = self.queued.popleft()
             self.runCurrentCommand()
     
     def saveResult(self, result):
@@ -686,6 +761,34 @@ class QueuedEngine(object):
         
         return None
     
+    def finishBatch(self, results):
+        """Finish the current `CommandBatch`.
+        
+        The results of the commands that ran are handed out in order.  If one
+        of them failed, the commands after it (which never ran) and the rest
+        of the queue are cleared just like in `abortCommand`.
+        """
+        
+        batch = self.currentCommand
+        failed = bool(results) and isinstance(results[-1], failure.Failure)
+        if failed:
+            results, reason = results[:-1], results[-1]
+        for cmd, result in zip(batch.commands, results):
+            if cmd.remoteMethod == 'execute':
+                self.saveResult(result)
+            cmd.handleResult(result)
+        batch.finished = True
+        if failed:
+            cmd = batch.commands[len(results)]
+            # Put back the commands that never ran so they are cleared too.
+            self.queued.extendleft(reversed(batch.commands[len(results)+1:]))
+            s = "%r %r %r" % (cmd.remoteMethod, cmd.args, cmd.kwargs)
+            self.clear_queue(msg=s)
+            cmd.handleError(reason)
+        else:
+            self._flushQueue()
+        return None
+    
     #---------------------------------------------------------------------------
     # IEngineCore methods
     #---------------------------------------------------------------------------
@@ -778,9 +881,13 @@ class QueuedEngine(object):
     def clear_queue(self, msg=''):
         """Clear the queue, but doesn't cancel the currently running commmand."""
         
-        for cmd in self.queued:
-            cmd.deferred.errback(failure.Failure(error.QueueCleared(msg)))
-        self.queued = []
+        # Swap the queue out first, so commands that the errbacks submit are
+        # not cleared along with the old ones.
+        cleared, self.queued = self.queued, deque()
+        if cleared:
+            reason = failure.Failure(error.QueueCleared(msg))
+            for cmd in cleared:
+                cmd.deferred.errback(reason)
         return defer.succeed(None)
     
     def queue_status(self):
@@ -849,6 +956,27 @@ class Command(object):
         
         self.deferred.errback(reason)
 
+class CommandBatch(Command):
+    """A sequence of commands that is sent to an engine as one ``run_batch``.
+    
+    The result of ``run_batch`` is dispatched to the individual commands by
+    `QueuedEngine.finishBatch`.
+    """
+    
+    def __init__(self, commands):
+        Command.__init__(self, 'run_batch', 
+            [(c.remoteMethod, c.args, c.kwargs) for c in commands])
+        self.commands = commands
+    
+    def __repr__(self):
+        return repr(self.commands)
+    
+    def handleError(self, reason):
+        """Relay a failure of the whole batch to every command in it."""
+        
+        for cmd in self.commands:
+            cmd.handleError(reason)
+
 class ThreadedEngineService(EngineService):
     """An EngineService subclass that defers execute commands to a separate 
     thread.
@@ -18,6 +18,7 @@ The ipcluster application.
 import logging
 import os
 import signal
+import sys
 
 if os.name=='posix':
     from twisted.scripts._twistd_unix import daemonize
@@ -28,6 +29,7 @@ from twisted.python import log, failure
 
 from IPython.external.argparse import ArgumentParser, SUPPRESS
 from IPython.utils.importstring import import_item
+from IPython.kernel.twistedutil import gatherBoth
 from IPython.kernel.clusterdir import (
     ApplicationWithClusterDir, ClusterDirConfigLoader,
     ClusterDirError, PIDFileError
@@ -184,6 +186,18 @@ class IPClusterAppConfigLoader(ClusterDirConfigLoader):
         paa('--no-daemon',
             dest='Global.daemonize', action='store_false',
             help="Dont't daemonize the ipcluster program.")
+        paa('--autoscale',
+            dest='Global.autoscale', action='store_true',
+            help='Add engines when tasks are waiting and retire idle engines, '
+            'see the Autoscaler section of ipcluster_config.py.')
+        paa('--min-engines',
+            type=int, dest='Autoscaler.min_engines',
+            help='The minimum number of engines when autoscaling.',
+            metavar='Autoscaler.min_engines')
+        paa('--max-engines',
+            type=int, dest='Autoscaler.max_engines',
+            help='The maximum number of engines when autoscaling.',
+            metavar='Autoscaler.max_engines')
 
         # The "stop" subcommand parser
         parser_stop = subparsers.add_parser(
@@ -206,6 +220,31 @@ class IPClusterAppConfigLoader(ClusterDirConfigLoader):
             help="The signal number to use in stopping the cluster (default=2).",
             metavar="Global.signal")
 
+        # The "benchmark" subcommand parser
+        parser_benchmark = subparsers.add_parser(
+            'benchmark',
+            parents=[parent_parser1, parent_parser2],
+            argument_default=SUPPRESS,
+            help="Benchmark a running cluster.",
+            description=
+            """Run performance benchmarks against a running ipython cluster,
+            found by its profile name or cluster directory. This measures
+            the latency of execute, push, pull, scatter and gather, the task
+            farming throughput, the serialization throughput and the CPU
+            used by the controller per message. The results are written as
+            JSON, to stdout or to the file given with '-o'.
+            """
+        )
+        paa = parser_benchmark.add_argument
+        paa('-o', '--output',
+            type=unicode, dest='Global.benchmark_output',
+            help='The file to write the JSON results to (default: stdout).',
+            metavar='Global.benchmark_output')
+        paa('--repeat',
+            type=int, dest='Global.benchmark_repeat',
+            help='The number of calls made per latency benchmark (default=100).',
+            metavar='Global.benchmark_repeat')
+
 
 #-----------------------------------------------------------------------------
 # Main application
@@ -233,6 +272,9 @@ class IPClusterApp(ApplicationWithClusterDir):
         self.default_config.Global.clean_logs = True
         self.default_config.Global.signal = 2
         self.default_config.Global.daemonize = False
+        self.default_config.Global.autoscale = False
+        self.default_config.Global.benchmark_output = u''
+        self.default_config.Global.benchmark_repeat = 100
 
     def find_resources(self):
         subcommand = self.command_line_config.Global.subcommand
@@ -254,6 +296,8 @@ class IPClusterApp(ApplicationWithClusterDir):
                     "'ipcluster create -h' or 'ipcluster list -h' for more "
                     "information about creating and listing cluster dirs."
                 )
+        elif subcommand=='benchmark':
+            super(IPClusterApp, self).find_resources()
 
     def list_cluster_dirs(self):
         # Find the search paths
@@ -342,6 +386,9 @@ class IPClusterApp(ApplicationWithClusterDir):
         d = self.start_controller()
         d.addCallback(self.start_engines)
         d.addCallback(self.startup_message)
+        self.autoscaler = None
+        if config.Global.autoscale:
+            d.addCallback(self.start_autoscaler)
         # If the controller or engines fail to start, stop everything
         d.addErrback(self.stop_launchers)
         return d
@@ -367,6 +414,38 @@ class IPClusterApp(ApplicationWithClusterDir):
         )
         return d
 
+    def start_autoscaler(self, r=None):
+        from IPython.kernel.autoscaler import Autoscaler
+        from IPython.kernel.clientconnector import AsyncClientConnector
+        config = self.master_config
+        cc = AsyncClientConnector()
+        cluster_dir = config.Global.cluster_dir
+        d = gatherBoth([
+            cc.get_task_client(cluster_dir=cluster_dir),
+            cc.get_multiengine_client(cluster_dir=cluster_dir)
+        ], consumeErrors=True)
+        def _start(clients):
+            tc, mec = clients
+            self.autoscaler = Autoscaler(
+                task_client=tc, multiengine_client=mec,
+                launcher_class=import_item(config.Global.engine_launcher),
+                cluster_dir=cluster_dir, work_dir=self.cluster_dir,
+                config=config
+            )
+            self.autoscaler.start()
+        d.addCallback(_start)
+        # Without autoscaling the cluster is still usable.
+        d.addErrback(self.log_err)
+        return d
+
+    def stop_autoscaler(self, r=None):
+        if self.autoscaler is not None:
+            d = self.autoscaler.stop()
+            d.addErrback(self.log_err)
+            return d
+        else:
+            return defer.succeed(None)
+
     def stop_controller(self, r=None):
         # log.msg("In stop_controller")
         if self.controller_launcher.running:
@@ -399,6 +478,7 @@ class IPClusterApp(ApplicationWithClusterDir):
             # These return deferreds. We are not doing anything with them
             # but we are holding refs to them as a reminder that they 
             # do return deferreds.
+            d0 = self.stop_autoscaler()
             d1 = self.stop_engines()
             d2 = self.stop_controller()
             # Wait a few seconds to let things shut down.
@@ -430,6 +510,8 @@ class IPClusterApp(ApplicationWithClusterDir):
             self.start_app_start()
         elif subcmd=='stop':
             self.start_app_stop()
+        elif subcmd=='benchmark':
+            self.start_app_benchmark()
 
     def start_app_start(self):
         """Start the app for the start subcommand."""
@@ -487,6 +569,42 @@ class IPClusterApp(ApplicationWithClusterDir):
                 # old .pid files.
                 self.remove_pid_file()
 
+    def start_app_benchmark(self):
+        """Start the app for the benchmark subcommand."""
+        config = self.master_config
+        pid_file = os.path.join(self.pid_dir, u'ipcontroller.pid')
+        try:
+            with open(pid_file) as f:
+                controller_pid = int(f.read().strip())
+        except (IOError, ValueError):
+            self.log.warn(
+                'Could not read the controller pid file, the controller '
+                'CPU usage will not be reported.'
+            )
+            controller_pid = None
+
+        # The blocking clients need the reactor running in another thread.
+        from IPython.kernel.clientconnector import ClientConnector
+        from IPython.kernel.twistedutil import ReactorInThread
+        from IPython.kernel.benchmark import run_benchmarks, dump_results
+        rit = ReactorInThread()
+        rit.setDaemon(True)
+        rit.start()
+        cc = ClientConnector()
+        cluster_dir = config.Global.cluster_dir
+        mec = cc.get_multiengine_client(cluster_dir=cluster_dir)
+        tc = cc.get_task_client(cluster_dir=cluster_dir)
+        self.log.info('Benchmarking cluster with %i engines' % len(mec.get_ids()))
+        results = run_benchmarks(mec, tc, controller_pid,
+                                 n=config.Global.benchmark_repeat)
+        output = config.Global.benchmark_output
+        if output:
+            with open(output, 'w') as f:
+                dump_results(results, f)
+            self.log.info('Benchmark results written to: %s' % output)
+        else:
+            dump_results(results, sys.stdout)
+
 
 def launch_new_instance():
     """Create and run the IPython cluster."""
@@ -174,6 +174,16 @@ class IPControllerAppConfigLoader(ClusterDirConfigLoader):
         paa('--secure',
             action='store_true', dest='Global.secure',
             help='Turn off SSL encryption for all connections.')
+        paa('--pipeline',
+            action='store_true', dest='Global.pipeline',
+            help='Send consecutive push/execute/pull commands queued for an '
+            'engine in a single network call.')
+        paa('--result-timeout',
+            type=float, dest='Global.result_timeout',
+            help='Discard the results of block=False multiengine calls that '
+            'have not been collected this many seconds after they are ready '
+            '(default is to keep them until they are collected).',
+            metavar='Global.result_timeout')
 
 
 #-----------------------------------------------------------------------------
@@ -195,6 +205,8 @@ class IPControllerApp(ApplicationWithClusterDir):
         # as those are set in a component.
         self.default_config.Global.import_statements = []
         self.default_config.Global.clean_logs = True
+        self.default_config.Global.pipeline = False
+        self.default_config.Global.result_timeout = None
 
     def pre_construct(self):
         super(IPControllerApp, self).pre_construct()
@@ -221,7 +233,10 @@ class IPControllerApp(ApplicationWithClusterDir):
         # Create the service hierarchy
         self.main_service = service.MultiService()
         # The controller service
-        controller_service = controllerservice.ControllerService()
+        controller_service = controllerservice.ControllerService(
+            pipeline=self.master_config.Global.pipeline,
+            result_timeout=self.master_config.Global.result_timeout
+        )
         controller_service.setServiceParent(self.main_service)
         # The client tub and all its refereceables
         try:
@@ -15,8 +15,17 @@ The IPython controller application
 # Imports
 #-----------------------------------------------------------------------------
 
+import errno
+import json
 import os
+import random
+import signal
+import socket
 import sys
+import time
+
+# When the imports below started, for the startup timings of the engine.
+_imports_start = time.time()
 
 from twisted.application import service
 from twisted.internet import reactor
@@ -28,9 +37,14 @@ from IPython.kernel.clusterdir import (
 )
 from IPython.kernel.engineconnector import EngineConnector
 from IPython.kernel.engineservice import EngineService
-from IPython.kernel.fcutil import Tub
+from IPython.kernel.fcutil import Tub, find_furl
+from IPython.kernel.twistedutil import (
+    can_reset_reactor_after_fork, reset_reactor_after_fork
+)
 from IPython.utils.importstring import import_item
 
+_imports_stop = time.time()
+
 #-----------------------------------------------------------------------------
 # Module level variables
 #-----------------------------------------------------------------------------
@@ -91,6 +105,20 @@ class IPEngineAppConfigLoader(ClusterDirConfigLoader):
         paa('--log-to-file',
             action='store_true', dest='Global.log_to_file',
             help='Log to a file in the log directory (default is stdout)')
+        # Startup
+        paa('--fork',
+            type=int, dest='Global.fork',
+            help='Start this many engines by forking them from this process '
+            'once the engine modules are imported and the controller FURL '
+            'has been read. This process then waits for the engines to exit '
+            'and forwards INT and TERM signals to them (default is 0, which '
+            'means to run a single engine without forking).',
+            metavar='Global.fork')
+        paa('--report-socket',
+            type=unicode, dest='Global.report_socket',
+            help='A UNIX socket to send the startup timings of each engine '
+            'to, as a JSON line, once it has registered with the controller.',
+            metavar='Global.report_socket')
 
 
 #-----------------------------------------------------------------------------
@@ -130,6 +158,13 @@ class IPEngineApp(ApplicationWithClusterDir):
         self.default_config.Global.connect_delay = 0.1
         self.default_config.Global.connect_max_tries = 15
 
+        # Forking engines and reporting their startup
+        self.default_config.Global.fork = 0
+        self.default_config.Global.report_socket = u''
+        # How long forked engines get to exit after being signaled before
+        # they are killed.
+        self.default_config.Global.fork_kill_delay = 1
+
         # MPI related config attributes
         self.default_config.MPI.use = ''
         self.default_config.MPI.mpi4py = mpi4py_init
@@ -141,6 +176,7 @@ class IPEngineApp(ApplicationWithClusterDir):
     def pre_construct(self):
         super(IPEngineApp, self).pre_construct()
         self.find_cont_furl_file()
+        self.timings = dict(imports=_imports_stop-_imports_start)
 
     def find_cont_furl_file(self):
         """Set the furl file.
@@ -159,6 +195,11 @@ class IPEngineApp(ApplicationWithClusterDir):
             config.Global.furl_file = try_this
 
     def construct(self):
+        # This only returns in the forked engines when forking.
+        if self.master_config.Global.fork:
+            self.fork_engines()
+        construct_start = time.time()
+
         # This is the working dir by now.
         sys.path.insert(0, '')
 
@@ -185,9 +226,112 @@ class IPEngineApp(ApplicationWithClusterDir):
 
         log.msg("Using furl file: %s" % self.master_config.Global.furl_file)
 
+        self.timings['construct'] = time.time()-construct_start
         reactor.callWhenRunning(self.call_connect)
 
+    def wait_for_furl(self):
+        """Block until the controller FURL can be read and return it."""
+        config = self.master_config
+        delay = config.Global.connect_delay
+        for attempt in range(config.Global.connect_max_tries):
+            try:
+                return find_furl(config.Global.furl_file)
+            except:
+                time.sleep(delay)
+                delay = 1.5*delay
+        # Let the engines try themselves, which gives the usual error.
+        return config.Global.furl_file
+
+    def fork_engines(self):
+        """Fork Global.fork engines from this process and supervise them.
+
+        The engine modules are imported and the controller FURL is read once
+        here, so the engines only have to create their EngineService and
+        connect.  This returns in the engines, while this process waits for
+        them to exit and then exits.
+        """
+        config = self.master_config
+        if not hasattr(os, 'fork'):
+            self.log.critical('Forking engines is not supported on this '
+                              'platform, use ipengine without --fork.')
+            self.exit(1)
+        if not can_reset_reactor_after_fork():
+            self.log.critical('Forking engines is not supported with the %s, '
+                              'use ipengine without --fork.'
+                              % type(reactor).__name__)
+            self.exit(1)
+        start = time.time()
+        config.Global.furl_file = self.wait_for_furl()
+        self.timings['furl'] = time.time()-start
+        import_item(config.Global.shell_class)
+
+        start = time.time()
+        pids = []
+        for i in range(config.Global.fork):
+            pid = os.fork()
+            if pid == 0:
+                self.timings['fork'] = time.time()-start
+                reset_reactor_after_fork()
+                random.seed()
+                return
+            pids.append(pid)
+        self.log.info('Forked %i engines: %r' % (len(pids), pids))
+        self.supervise_engines(pids)
+        self.exit(0)
+
+    def supervise_engines(self, pids):
+        """Wait for the forked engines to exit, forwarding signals to them."""
+        engines = set(pids)
+
+        def kill_engines(signum, frame):
+            for pid in engines:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except OSError:
+                    pass
+
+        def forward_signal(signum, frame):
+            for pid in engines:
+                try:
+                    os.kill(pid, signum)
+                except OSError:
+                    pass
+            signal.signal(signal.SIGALRM, kill_engines)
+            signal.alarm(self.master_config.Global.fork_kill_delay)
+
+        signal.signal(signal.SIGINT, forward_signal)
+        signal.signal(signal.SIGTERM, forward_signal)
+        while engines:
+            try:
+                pid, status = os.waitpid(-1, 0)
+            except OSError, e:
+                if e.errno == errno.EINTR:
+                    continue
+                elif e.errno == errno.ECHILD:
+                    break
+                raise
+            engines.discard(pid)
+
+    def report_startup(self, engine_id):
+        """Log the startup timings and send them to Global.report_socket."""
+        self.timings['register'] = time.time()-self.connect_start
+        log.msg("Engine startup timings: %r" % self.timings)
+        path = self.master_config.Global.report_socket
+        if path:
+            report = dict(id=engine_id, pid=os.getpid(), timings=self.timings)
+            s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                try:
+                    s.connect(path)
+                    s.sendall(json.dumps(report)+'\n')
+                except socket.error, e:
+                    log.msg("Could not report startup to %s: %s" % (path, e))
+            finally:
+                s.close()
+        return engine_id
+
     def call_connect(self):
+        self.connect_start = time.time()
         d = self.engine_connector.connect_to_controller(
             self.engine_service, 
             self.master_config.Global.furl_file,
@@ -203,6 +347,7 @@ class IPEngineApp(ApplicationWithClusterDir):
             log.msg(f.getErrorMessage())
             reactor.callLater(0.1, reactor.stop)
 
+        d.addCallback(self.report_startup)
         d.addErrback(handle_error)
 
     def start_mpi(self):
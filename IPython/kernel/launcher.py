@@ -15,9 +15,13 @@ Facilities for launching IPython processes asynchronously.
 # Imports
 #-----------------------------------------------------------------------------
 
+import json
 import os
 import re
+import shutil
 import sys
+import tempfile
+import time
 
 from IPython.config.configurable import Configurable
 from IPython.external import Itpl
@@ -36,9 +40,10 @@ from IPython.kernel.winhpcjob import (
 
 from twisted.internet import reactor, defer
 from twisted.internet.defer import inlineCallbacks
-from twisted.internet.protocol import ProcessProtocol
+from twisted.internet.protocol import ProcessProtocol, ServerFactory
 from twisted.internet.utils import getProcessOutput
 from twisted.internet.error import ProcessDone, ProcessTerminated
+from twisted.protocols.basic import LineReceiver
 from twisted.python import log
 from twisted.python.failure import Failure
 
@@ -409,6 +414,114 @@ class LocalEngineSetLauncher(BaseLauncher):
         return dfinal
 
 
+class EngineReportProtocol(LineReceiver):
+    """Receive the JSON startup reports of forked engines."""
+
+    delimiter = '\n'
+
+    def lineReceived(self, line):
+        try:
+            report = json.loads(line)
+        except ValueError:
+            log.msg('Invalid engine startup report: %r' % line)
+        else:
+            self.factory.launcher.notify_registered(report)
+
+
+class EngineReportFactory(ServerFactory):
+
+    protocol = EngineReportProtocol
+
+    def __init__(self, launcher):
+        self.launcher = launcher
+
+
+class LocalForkEngineSetLauncher(LocalEngineLauncher):
+    """Launch a set of engines forked from a single ipengine process.
+
+    The ipengine process imports the engine modules and reads the controller
+    FURL once and then forks the engines, which is much faster than starting
+    a process per engine.  Each engine reports its startup timings over a
+    UNIX socket once it has registered with the controller.  This needs
+    :func:`os.fork`, so it does not work on Windows.
+    """
+
+    def __init__(self, work_dir=u'', config=None):
+        super(LocalForkEngineSetLauncher, self).__init__(
+            work_dir=work_dir, config=config
+        )
+        self.n = 0
+        self.reports = []
+        self.registered_deferreds = []
+        self.report_dir = None
+        self.report_port = None
+
+    def start(self, n, cluster_dir):
+        """Start n engines by cluster_dir."""
+        self.n = n
+        report_socket = self.listen_for_reports()
+        self.engine_args.extend(
+            ['--fork', str(n), '--report-socket', report_socket]
+        )
+        log.msg("Starting LocalForkEngineSetLauncher: %r" % self.args)
+        return super(LocalForkEngineSetLauncher, self).start(cluster_dir)
+
+    def listen_for_reports(self):
+        """Listen for engine startup reports and return the socket path."""
+        self.start_time = time.time()
+        self.report_dir = tempfile.mkdtemp(prefix='ipcluster-')
+        report_socket = os.path.join(self.report_dir, 'engines.sock')
+        self.report_port = reactor.listenUNIX(
+            report_socket, EngineReportFactory(self)
+        )
+        return report_socket
+
+    def observe_registered(self):
+        """Get a deferred that will fire when all engines have registered.
+
+        The deferred fires with the list of the engine startup reports.
+        """
+        if self.n and len(self.reports) >= self.n:
+            return defer.succeed(self.reports)
+        else:
+            d = defer.Deferred()
+            self.registered_deferreds.append(d)
+            return d
+
+    def notify_registered(self, report):
+        """Called with the startup report of each engine."""
+        report['elapsed'] = time.time()-self.start_time
+        self.reports.append(report)
+        log.msg('Engine %r [pid=%r] registered after %.3f secs: %r' % (
+            report.get('id'), report.get('pid'), report['elapsed'],
+            report.get('timings')
+        ))
+        if len(self.reports) == self.n:
+            phases = {}
+            for r in self.reports:
+                for phase, t in r.get('timings', {}).items():
+                    phases[phase] = max(phases.get(phase, 0.0), t)
+            log.msg('All %i engines registered in %.3f secs, slowest '
+                    'phases: %r' % (self.n, report['elapsed'], phases))
+            for i in range(len(self.registered_deferreds)):
+                d = self.registered_deferreds.pop()
+                d.callback(self.reports)
+
+    def stop_listening_for_reports(self):
+        """Close the report socket and remove it, returning a deferred."""
+        port, report_dir = self.report_port, self.report_dir
+        self.report_port = self.report_dir = None
+        if port is None:
+            return defer.succeed(None)
+        d = defer.maybeDeferred(port.stopListening)
+        d.addBoth(lambda r: shutil.rmtree(report_dir, ignore_errors=True))
+        return d
+
+    def notify_stop(self, data):
+        self.stop_listening_for_reports()
+        return super(LocalForkEngineSetLauncher, self).notify_stop(data)
+
+
 #-----------------------------------------------------------------------------
 # MPIExec launchers
 #-----------------------------------------------------------------------------
@@ -21,8 +21,6 @@ __docformat__ = "restructuredtext en"
 
 import types
 
-from IPython.utils.data import flatten as utils_flatten
-
 #-------------------------------------------------------------------------------
 # Figure out which array packages are present and their array types
 #-------------------------------------------------------------------------------
@@ -37,7 +35,7 @@ else:
 try:
     import numpy
 except ImportError:
-    pass
+    numpy = None
 else:
     arrayModules.append({'module':numpy, 'type':numpy.ndarray})
 try:
@@ -48,8 +46,39 @@ else:
     arrayModules.append({'module':numarray,
         'type':numarray.numarraycore.NumArray})
 
+def _isArray(obj):
+    for m in arrayModules:
+        if isinstance(obj, m['type']):
+            return m
+    return None
+
+
 class Map:
-    """A class for partitioning a sequence using a map."""
+    """A class for partitioning a sequence using a map.
+    
+    The sequence is split into contiguous blocks whose sizes differ by at
+    most one.  Slicing a NumPy array gives views, so the partitions of an
+    array share its memory.
+    """
+    
+    def getSlices(self, n, q):
+        """Returns the (lo, hi) bounds of all q partitions of n elements."""
+        
+        remainder = n%q
+        basesize = n/q
+        slices = []
+        lo = 0
+        for p in range(q):
+            hi = lo + basesize + (p < remainder)
+            slices.append((lo, hi))
+            lo = hi
+        return slices
+    
+    def _bounds(self, n, p, q):
+        remainder = n%q
+        basesize = n/q
+        lo = p*basesize + min(p, remainder)
+        return lo, lo + basesize + (p < remainder)
             
     def getPartition(self, seq, p, q):
         """Returns the pth partition of q partitions of seq."""
@@ -58,64 +87,134 @@ class Map:
         if p<0 or p>=q:
           print "No partition exists."
           return
-          
-        remainder = len(seq)%q
-        basesize = len(seq)/q
-        hi = []
-        lo = []
-        for n in range(q):
-            if n < remainder:
-                lo.append(n * (basesize + 1))
-                hi.append(lo[-1] + basesize + 1)
-            else:
-                lo.append(n*basesize + remainder)
-                hi.append(lo[-1] + basesize)
-
         
-        result = seq[lo[p]:hi[p]]
-        return result
+        lo, hi = self._bounds(len(seq), p, q)
+        return seq[lo:hi]
+    
+    def getPartitions(self, seq, q):
+        """Returns all q partitions of seq, computing the bounds only once."""
+        
+        return [seq[lo:hi] for lo, hi in self.getSlices(len(seq), q)]
            
-    def joinPartitions(self, listOfPartitions):
-        return self.concatenate(listOfPartitions)
+    def joinPartitions(self, listOfPartitions, out=None):
+        """Join partitions back into a single sequence.
+        
+        For NumPy arrays the result is written into `out` if it is given,
+        otherwise into a newly allocated array.
+        """
+        return self.concatenate(listOfPartitions, out)
                     
-    def concatenate(self, listOfPartitions):
+    def concatenate(self, listOfPartitions, out=None):
         testObject = listOfPartitions[0]
         # First see if we have a known array type
-        for m in arrayModules:
-            #print m
-            if isinstance(testObject, m['type']):
-                return m['module'].concatenate(listOfPartitions)
+        m = _isArray(testObject)
+        if m is not None:
+            if m['module'] is numpy:
+                if out is None:
+                    out = _allocate(listOfPartitions)
+                lo = 0
+                for part in listOfPartitions:
+                    hi = lo + len(part)
+                    out[lo:hi] = part
+                    lo = hi
+                return out
+            return m['module'].concatenate(listOfPartitions)
         # Next try for Python sequence types
         if isinstance(testObject, (types.ListType, types.TupleType)):
-            return utils_flatten(listOfPartitions)
+            result = []
+            for part in listOfPartitions:
+                result.extend(part)
+            return result
         # If we have scalars, just return listOfPartitions
         return listOfPartitions
 
+
 class RoundRobinMap(Map):
-    """Partitions a sequence in a roun robin fashion.
+    """Partitions a sequence in a round robin fashion.
     
-    This currently does not work!
+    Element i goes to partition i%q.  For NumPy arrays the partitions are
+    strided views.
     """
 
     def getPartition(self, seq, p, q):
         return seq[p:len(seq):q]
-        #result = []
-        #for i in range(p,len(seq),q):
-        #    result.append(seq[i])
-        #return result
-
-    def joinPartitions(self, listOfPartitions):
-        #lengths = [len(x) for x in listOfPartitions]
-        #maxPartitionLength = len(listOfPartitions[0])
-        #numberOfPartitions = len(listOfPartitions)
-        #concat = self.concatenate(listOfPartitions)
-        #totalLength = len(concat)
-        #result = []
-        #for i in range(maxPartitionLength):
-        #    result.append(concat[i:totalLength:maxPartitionLength])
-        return self.concatenate(listOfPartitions)
-        
-dists = {'b':Map}
+    
+    def getPartitions(self, seq, q):
+        return [seq[p:len(seq):q] for p in range(q)]
 
+    def joinPartitions(self, listOfPartitions, out=None):
+        testObject = listOfPartitions[0]
+        q = len(listOfPartitions)
+        m = _isArray(testObject)
+        if m is not None and m['module'] is numpy:
+            if out is None:
+                out = _allocate(listOfPartitions)
+            for p, part in enumerate(listOfPartitions):
+                out[p::q] = part
+            return out
+        if m is not None or \
+            isinstance(testObject, (types.ListType, types.TupleType)):
+            result = [None]*sum(len(part) for part in listOfPartitions)
+            for p, part in enumerate(listOfPartitions):
+                result[p::q] = list(part)
+            return result
+        return listOfPartitions
+
+
+class WeightedMap(Map):
+    """Partitions a sequence into contiguous blocks of weighted sizes.
+    
+    This is useful when the engines run at different speeds.  The size of
+    partition p is proportional to ``weights[p]``, so the number of
+    partitions must match the number of weights::
+    
+        mec.scatter('a', seq, dist=WeightedMap([1, 1, 2, 4]))
+    """
+    
+    def __init__(self, weights):
+        if not weights or min(weights) < 0 or sum(weights) <= 0:
+            raise ValueError('weights must be non-negative with a positive sum')
+        self.weights = list(weights)
     
+    def getSlices(self, n, q):
+        if q != len(self.weights):
+            raise ValueError('expected %i partitions, got %i' % 
+                (len(self.weights), q))
+        total = float(sum(self.weights))
+        slices = []
+        lo = 0
+        cumulative = 0
+        for w in self.weights:
+            cumulative += w
+            hi = int(round(n*cumulative/total))
+            slices.append((lo, hi))
+            lo = hi
+        return slices
     
+    def _bounds(self, n, p, q):
+        return self.getSlices(n, q)[p]
+
+
+def _allocate(listOfPartitions):
+    """Allocate the NumPy array that will hold the joined partitions."""
+    length = sum(len(part) for part in listOfPartitions)
+    shape = (length,) + listOfPartitions[0].shape[1:]
+    dtype = numpy.find_common_type([part.dtype for part in listOfPartitions], [])
+    return numpy.empty(shape, dtype)
+
+
+def get_map(dist):
+    """Return a map object for `dist`.
+    
+    `dist` is either a key of `dists` or a `Map` instance, like a
+    `WeightedMap`.
+    """
+    if isinstance(dist, Map):
+        return dist
+    try:
+        return dists[dist]()
+    except KeyError:
+        raise ValueError('unknown distribution: %r' % (dist,))
+
+
+dists = {'b':Map, 'r':RoundRobinMap}
@@ -95,9 +95,9 @@ class MultiEngineMapper(object):
         :Parameters:
             multiengine : `IMultiEngine` implementer
                 The multiengine to use for running the map commands
-            dist : str
-                The type of decomposition to use.  Only block ('b') is
-                supported currently
+            dist : str or `IPython.kernel.map.Map`
+                The type of decomposition to use: block ('b'), round robin
+                ('r') or a `Map` instance like `WeightedMap`
             targets : (str, int, tuple of ints)
                 The engines to use in the map
             block : boolean
@@ -521,6 +521,9 @@ class ISynchronousMultiEngine(ISynchronousEngineMultiplexer):
     
     def clear_pending_deferreds():
         """"""
+    
+    def get_pending_deferred_stats():
+        """"""
 
 
 #-------------------------------------------------------------------------------
@@ -532,13 +535,20 @@ class SynchronousMultiEngine(PendingDeferredManager):
     
     Warning, this class uses a decorator that currently uses **kwargs.  
     Because of this block must be passed as a kwarg, not positionally.
+
+    Uncollected results expire after `result_timeout` seconds, which
+    defaults to the `result_timeout` of the controller adapted by
+    `multiengine`.
     """
     
     implements(ISynchronousMultiEngine)
     
-    def __init__(self, multiengine):
+    def __init__(self, multiengine, result_timeout=None):
         self.multiengine = multiengine
-        PendingDeferredManager.__init__(self)
+        if result_timeout is None:
+            controller = getattr(multiengine, 'controller', None)
+            result_timeout = getattr(controller, 'result_timeout', None)
+        PendingDeferredManager.__init__(self, result_timeout)
     
     #---------------------------------------------------------------------------
     # Decorated pending deferred methods
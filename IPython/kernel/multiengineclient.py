@@ -448,6 +448,19 @@ class FullBlockingMultiEngineClient(InteractiveMultiEngineClient):
     
     clear_pending_results = flush
     
+    def pending_result_stats(self):
+        """
+        Report how many pending results the controller is holding on to.
+        
+        This returns a dict with the number of results that are not yet ready
+        (``pending``), ready but not yet retrieved (``completed``), being
+        waited on (``waiting``), an approximation of the memory held by
+        the uncollected results in bytes (``result_bytes``) and the number of
+        results that were discarded because nobody retrieved them in time
+        (``expired``).
+        """
+        return self._bcft(self.smultiengine.get_pending_deferred_stats)
+    
     #---------------------------------------------------------------------------
     # IEngineMultiplexer related methods
     #---------------------------------------------------------------------------
@@ -721,6 +734,11 @@ class FullBlockingMultiEngineClient(InteractiveMultiEngineClient):
     def scatter(self, key, seq, dist='b', flatten=False, targets=None, block=None):
         """
         Partition a Python sequence and send the partitions to a set of engines.
+        
+        The partitioning is done according to `dist`, which is either the
+        name of a distribution in `IPython.kernel.map.dists` (block 'b' or
+        round robin 'r') or a `Map` instance, like a `WeightedMap` that gives
+        faster engines larger partitions.
         """
         targets, block = self._findTargetsAndBlock(targets, block)
         return self._blockFromThread(self.smultiengine.scatter, key, seq, 
@@ -729,6 +747,8 @@ class FullBlockingMultiEngineClient(InteractiveMultiEngineClient):
     def gather(self, key, dist='b', targets=None, block=None):
         """
         Gather a partitioned sequence on a set of engines as a single local seq.
+        
+        `dist` must be the same as the one used to scatter the sequence.
         """
         targets, block = self._findTargetsAndBlock(targets, block)
         return self._blockFromThread(self.smultiengine.gather, key, dist, 
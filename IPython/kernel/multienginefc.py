@@ -131,6 +131,10 @@ class FCSynchronousMultiEngineFromMultiEngine(Referenceable):
     def remote_clear_pending_deferreds(self):
         return defer.maybeDeferred(self.smultiengine.clear_pending_deferreds)
     
+    @packageResult
+    def remote_get_pending_deferred_stats(self):
+        return defer.maybeDeferred(self.smultiengine.get_pending_deferred_stats)
+    
     def _addDeferredIDCallback(self, did, callback, *args, **kwargs):
         self._deferredIDCallbacks[did] = (callback, args, kwargs)
         return did
@@ -342,6 +346,14 @@ class FCFullSynchronousMultiEngineClient(object):
         d2.addCallback(self.unpackage)
         return d2
     
+    def get_pending_deferred_stats(self):
+        
+        # Only the controller side is reported, our local pdm just holds
+        # the composite results of gather/scatter.
+        d = self.remote_reference.callRemote('get_pending_deferred_stats')
+        d.addCallback(self.unpackage)
+        return d
+    
     def _addDeferredIDCallback(self, did, callback, *args, **kwargs):
         self._deferredIDCallbacks[did] = (callback, args, kwargs)
         return did
@@ -497,13 +509,12 @@ class FCFullSynchronousMultiEngineClient(object):
         # difficult to get right though.
         def do_scatter(engines):
             nEngines = len(engines)
-            mapClass = Map.dists[dist]
-            mapObject = mapClass()
+            mapObject = Map.get_map(dist)
+            partitions = mapObject.getPartitions(seq, nEngines)
             d_list = []
             # Loop through and push to each engine in non-blocking mode.
             # This returns a set of deferreds to deferred_ids
-            for index, engineid in enumerate(engines):
-                partition = mapObject.getPartition(seq, index, nEngines)
+            for engineid, partition in zip(engines, partitions):
                 if flatten and len(partition) == 1:
                     d = self.push({key: partition[0]}, targets=engineid, block=False)
                 else:
@@ -562,9 +573,7 @@ class FCFullSynchronousMultiEngineClient(object):
         # deferred id that corresponds to the entire group.  This logic is extremely
         # difficult to get right though.
         def do_gather(engines):
-            nEngines = len(engines)
-            mapClass = Map.dists[dist]
-            mapObject = mapClass()
+            mapObject = Map.get_map(dist)
             d_list = []
             # Loop through and push to each engine in non-blocking mode.
             # This returns a set of deferreds to deferred_ids
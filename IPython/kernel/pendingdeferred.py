@@ -22,6 +22,10 @@ __docformat__ = "restructuredtext en"
 # Imports
 #-------------------------------------------------------------------------------
 
+import sys
+import time
+from collections import deque
+
 from twisted.internet import defer
 from twisted.python import failure
 
@@ -36,14 +40,39 @@ class PendingDeferredManager(object):
     calls `save_pending_deferred` passing that id and the deferred to
     be tracked.  To later retrieve it, the user calls
     `get_pending_deferred` passing the id.
+
+    All of the bookkeeping is done with sets and dicts, so saving, getting
+    and deleting a pending deferred are constant time operations regardless
+    of how many deferreds are being tracked.
+
+    Results that are never retrieved would otherwise be held forever.  If
+    `result_timeout` is given, results that have been ready for longer than
+    that many seconds without being collected are discarded.  Expiration is
+    done lazily (whenever a deferred is saved or retrieved) so no timers are
+    involved.
     """
     
-    def __init__(self):
-        """Manage pending deferreds."""
+    def __init__(self, result_timeout=None):
+        """Manage pending deferreds.
+
+        :Parameters:
+            result_timeout : float or None
+                The number of seconds an uncollected result is kept after it
+                becomes ready.  If None (the default), results never expire.
+        """
 
         self.results = {} # Populated when results are ready
-        self.deferred_ids = [] # List of deferred ids I am managing
+        self.deferred_ids = set() # Set of deferred ids I am managing
         self.deferreds_to_callback = {} # dict of lists of deferreds to callback
+        self.result_timeout = result_timeout
+        # Completion time of each ready result and a queue of (time, id)
+        # pairs in completion order, used to expire old results.
+        self._result_times = {}
+        self._expiry_queue = deque()
+        # Approximate size in bytes of each ready result.
+        self._result_sizes = {}
+        self._result_bytes = 0
+        self._expired_count = 0
         
     def get_deferred_id(self):
         return guid.generate()
@@ -54,6 +83,13 @@ class PendingDeferredManager(object):
     def _save_result(self, result, deferred_id):
         if self.quick_has_id(deferred_id):
             self.results[deferred_id] = result
+            size = _approximate_size(result)
+            self._result_sizes[deferred_id] = size
+            self._result_bytes += size
+            if self.result_timeout is not None:
+                now = time.time()
+                self._result_times[deferred_id] = now
+                self._expiry_queue.append((now, deferred_id))
             self._trigger_callbacks(deferred_id)
     
     def _trigger_callbacks(self, deferred_id):
@@ -79,9 +115,10 @@ class PendingDeferredManager(object):
         Only callbacks and errbacks applied to d before this method
         is called will be called no the final result.
         """
+        self.expire_results()
         if deferred_id is None:
             deferred_id = self.get_deferred_id()
-        self.deferred_ids.append(deferred_id)
+        self.deferred_ids.add(deferred_id)
         d.addBoth(self._save_result, deferred_id)
         return deferred_id
     
@@ -91,6 +128,14 @@ class PendingDeferredManager(object):
         except Exception:
             pass
     
+    def _forget(self, deferred_id):
+        """Drop every reference to deferred_id."""
+        self.deferred_ids.discard(deferred_id)
+        self._protected_del(deferred_id, self.deferreds_to_callback)
+        self._protected_del(deferred_id, self.results)
+        self._protected_del(deferred_id, self._result_times)
+        self._result_bytes -= self._result_sizes.pop(deferred_id, 0)
+    
     def delete_pending_deferred(self, deferred_id):
         """Remove a deferred I am tracking and add a null Errback.
         
@@ -104,25 +149,71 @@ class PendingDeferredManager(object):
             if d is not None:
                 d.errback(failure.Failure(error.AbortedPendingDeferredError("pending deferred has been deleted: %r"%deferred_id)))
             # Now delete all references to this deferred_id
-            ind = self.deferred_ids.index(deferred_id)
-            self._protected_del(ind, self.deferred_ids)
-            self._protected_del(deferred_id, self.deferreds_to_callback)
-            self._protected_del(deferred_id, self.results)            
+            self._forget(deferred_id)
         else:
             raise error.InvalidDeferredID('invalid deferred_id: %r' % deferred_id)
     
     def clear_pending_deferreds(self):
         """Remove all the deferreds I am tracking."""
-        for did in self.deferred_ids:
+        for did in list(self.deferred_ids):
             self.delete_pending_deferred(did)
+        self._expiry_queue.clear()
+    
+    def expire_results(self, now=None):
+        """Discard results that have not been collected in time.
+
+        Only results that are ready and that nobody is waiting on are
+        discarded.  This is a no-op if `result_timeout` is None.
+
+        :Returns: the number of results that were discarded.
+        """
+        if self.result_timeout is None:
+            return 0
+        if now is None:
+            now = time.time()
+        deadline = now - self.result_timeout
+        queue = self._expiry_queue
+        expired = 0
+        while queue and queue[0][0] <= deadline:
+            t, did = queue.popleft()
+            # Skip entries for results that were already collected.
+            if self._result_times.get(did) == t:
+                self._forget(did)
+                expired += 1
+        self._expired_count += expired
+        return expired
+    
+    def get_pending_deferred_stats(self):
+        """Return a dict describing what I am currently holding on to.
+
+        The keys are:
+
+        * ``pending``: deferreds whose result is not ready yet.
+        * ``completed``: results that are ready but not yet collected.
+        * ``waiting``: blocking requests waiting for a result.
+        * ``result_bytes``: an approximation of the memory held by the
+          uncollected results.
+        * ``expired``: the number of results discarded so far because of
+          `result_timeout`.
+        """
+        self.expire_results()
+        completed = len(self.results)
+        return dict(
+            pending=len(self.deferred_ids) - completed,
+            completed=completed,
+            waiting=len(self.deferreds_to_callback),
+            result_bytes=self._result_bytes,
+            expired=self._expired_count
+        )
         
     def _delete_and_pass_through(self, r, deferred_id):
         self.delete_pending_deferred(deferred_id)
         return r
         
     def get_pending_deferred(self, deferred_id, block):
+        self.expire_results()
         if not self.quick_has_id(deferred_id) or self.deferreds_to_callback.get(deferred_id) is not None:
-            return defer.fail(failure.Failure(error.InvalidDeferredID('invalid deferred_id: %r' + deferred_id)))
+            return defer.fail(failure.Failure(error.InvalidDeferredID('invalid deferred_id: %r' % deferred_id)))
         result = self.results.get(deferred_id)
         if result is not None:
             self.delete_pending_deferred(deferred_id)
@@ -138,6 +229,22 @@ class PendingDeferredManager(object):
             else:
                 return defer.fail(failure.Failure(error.ResultNotCompleted("result not completed: %r" % deferred_id)))
 
+
+def _approximate_size(obj):
+    """A cheap estimate of the memory used by a result, in bytes.
+
+    Results are typically lists or dicts of per engine values, so we look one
+    level into containers.  This is only meant for reporting purposes.
+    """
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, dict):
+        for k, v in obj.iteritems():
+            size += sys.getsizeof(k, 0) + sys.getsizeof(v, 0)
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            size += sys.getsizeof(item, 0)
+    return size
+
 def two_phase(wrapped_method):
     """Wrap methods that return a deferred into a two phase process.
     
@@ -15,8 +15,83 @@ __docformat__ = "restructuredtext en"
 # Imports
 #-------------------------------------------------------------------------------
 
+import marshal
 from types import FunctionType
 
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import new as sha1
+
+#-------------------------------------------------------------------------------
+# Code digests and the function cache
+#-------------------------------------------------------------------------------
+
+# Digests of recently canned code objects.  Code objects compare by value,
+# so canning the same function over and over only hashes it once.
+_digests = {}
+_max_digests = 1024
+
+def code_digest(code):
+    """Return a hex digest that identifies the content of a code object."""
+    try:
+        return _digests[code]
+    except KeyError:
+        pass
+    digest = sha1(marshal.dumps(code)).hexdigest()
+    if len(_digests) >= _max_digests:
+        _digests.clear()
+    _digests[code] = digest
+    return digest
+
+
+class FunctionCache(object):
+    """A least recently used cache of functions keyed by code digest.
+    
+    Engines use this to keep the functions that were pushed to them, so that
+    a function that is pushed again can be sent as just its digest.
+    """
+    
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._functions = {}
+        self._last_used = {}
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self):
+        return len(self._functions)
+    
+    def __contains__(self, digest):
+        return digest in self._functions
+    
+    def get(self, digest):
+        """Return the function for `digest` or None if it is not cached."""
+        f = self._functions.get(digest)
+        if f is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._clock += 1
+            self._last_used[digest] = self._clock
+        return f
+    
+    def add(self, digest, f):
+        """Cache `f` under `digest`, evicting the least recently used one."""
+        if digest not in self._functions and \
+            len(self._functions) >= self.maxsize:
+            oldest = min(self._last_used, key=self._last_used.get)
+            del self._functions[oldest]
+            del self._last_used[oldest]
+        self._clock += 1
+        self._functions[digest] = f
+        self._last_used[digest] = self._clock
+
+#-------------------------------------------------------------------------------
+# Canning
+#-------------------------------------------------------------------------------
+
 class CannedObject(object):
     pass
     
@@ -25,6 +100,7 @@ class CannedFunction(CannedObject):
     def __init__(self, f):
         self._checkType(f)    
         self.code = f.func_code
+        self.digest = code_digest(self.code)
     
     def _checkType(self, obj):
         assert isinstance(obj, FunctionType), "Not a function type"
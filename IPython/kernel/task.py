@@ -804,7 +804,10 @@ class ITaskController(cs.IControllerBase):
         Get a dictionary with the current state of the task queue.
         
         If verbose is True, then return lists of taskids, otherwise, 
-        return the number of tasks with each status.
+        return the number of tasks with each status.  The ``engines`` and
+        ``idle`` keys give the registered and the idle engines (lists of
+        ids if verbose) and ``wait`` the number of seconds the oldest
+        scheduled task has been waiting for an engine.
         """
     
     def clear():
@@ -883,6 +886,7 @@ class TaskController(cs.ControllerAdapterBase):
         """
         task.taskid = self.taskid
         task.start = time.localtime()
+        task.submitted = time.time()
         self.taskid += 1
         d = defer.Deferred()
         self.scheduler.add_task(task)
@@ -959,14 +963,29 @@ class TaskController(cs.ControllerAdapterBase):
                     else:
                         failed.append(k)
         scheduled = self.scheduler.taskids
+        idle = self.scheduler.workerids
+        engines = self.workers.keys()
         if verbose:
             result = dict(pending=pending, failed=failed, 
-                succeeded=succeeded, scheduled=scheduled)
+                succeeded=succeeded, scheduled=scheduled,
+                engines=engines, idle=idle)
         else:
             result = dict(pending=len(pending),failed=len(failed),
-                succeeded=len(succeeded),scheduled=len(scheduled))
+                succeeded=len(succeeded),scheduled=len(scheduled),
+                engines=len(engines), idle=len(idle))
+        result['wait'] = self._longestWait()
         return defer.succeed(result)
     
+    def _longestWait(self):
+        """How long the oldest scheduled task has been waiting, in seconds."""
+        now = time.time()
+        submitted = [getattr(t, 'submitted', now) for t in 
+            getattr(self.scheduler, 'tasks', [])]
+        if submitted:
+            return now - min(submitted)
+        else:
+            return 0.0
+    
     #---------------------------------------------------------------------------
     # Queue methods
     #---------------------------------------------------------------------------
@@ -148,7 +148,10 @@ class BlockingTaskClient(object):
                 the number of tasks with each status.
         
         :Returns:
-            A dict with the queue status.
+            A dict with the queue status.  Besides the task states, the
+            ``engines`` and ``idle`` keys give the registered and idle
+            engines and ``wait`` how long (in seconds) the oldest scheduled
+            task has been waiting.
         """
         return self._bcft(self.task_controller.queue_status, verbose)
     
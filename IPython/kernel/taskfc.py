@@ -273,7 +273,10 @@ class FCTaskClient(object):
                 the number of tasks with each status.
         
         :Returns:
-            A dict with the queue status.
+            A dict with the queue status.  Besides the task states, the
+            ``engines`` and ``idle`` keys give the registered and idle
+            engines and ``wait`` how long (in seconds) the oldest scheduled
+            task has been waiting.
         """
         d = self.remote_reference.callRemote('queue_status', verbose)
         d.addCallback(self.unpackage)
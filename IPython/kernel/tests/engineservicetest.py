@@ -316,6 +316,18 @@ class IEngineQueuedTestCase(object):
         d = self.assertDeferredEquals(result, True)
         return d
 
+    def testPipeline(self):
+        self.engine.pipeline = True
+        dList = [self.engine.push(dict(a=10)),
+                 self.engine.execute('b = a*2'),
+                 self.engine.pull('b'),
+                 self.engine.push(dict(c=5)),
+                 self.engine.pull(('b', 'c'))]
+        d = defer.gatherResults(dList)
+        d.addCallback(lambda r: self.assertEquals([r[2], r[4]], [20, [20, 5]]))
+        return d
+
+
 Parametric(IEngineQueuedTestCase)
 
 class IEnginePropertiesTestCase(object):
@@ -451,6 +451,22 @@ class ISynchronousMultiEngineTestCase(IMultiEngineBaseTestCase):
         d.addCallback(lambda r: self.assertEquals(r, 4*[[10,20]]))
         return d
 
+    def testPendingDeferredStats(self):
+        self.addEngine(2)
+        execute = self.multiengine.execute
+        stats = self.multiengine.get_pending_deferred_stats
+        d = execute('a=5', block=False)
+        d.addCallback(lambda did: self.multiengine.get_pending_deferred(did, True))
+        d.addCallback(lambda _: stats())
+        d.addCallback(lambda r: self.assertEquals(r['completed']+r['pending'], 0))
+        d.addCallback(lambda _: execute('b=10', block=False))
+        d.addCallback(lambda _: stats())
+        d.addCallback(lambda r: self.assertEquals(r['completed']+r['pending'], 1))
+        d.addCallback(lambda _: self.multiengine.clear_pending_deferreds())
+        d.addCallback(lambda _: stats())
+        d.addCallback(lambda r: self.assertEquals(r['completed']+r['pending'], 0))
+        return d
+
     def testPushPullFunction(self):
         self.addEngine(4)
         pushf = self.multiengine.push_function
@@ -712,6 +728,15 @@ class IMultiEngineCoordinatorTestCase(object):
             d.addCallback(lambda r: assert_array_equal(r, a))
             return d
 
+    def testScatterGatherRoundRobin(self):
+        self.addEngine(4)
+        d= self.multiengine.scatter('a', range(10), dist='r')
+        d.addCallback(lambda r: self.multiengine.pull('a'))
+        d.addCallback(lambda r: self.assertEquals(r, [[0,4,8],[1,5,9],[2,6],[3,7]]))
+        d.addCallback(lambda r: self.multiengine.gather('a', dist='r'))
+        d.addCallback(lambda r: self.assertEquals(r, range(10)))
+        return d
+
     def testMap(self):
         self.addEngine(4)
         def f(x):
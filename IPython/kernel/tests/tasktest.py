@@ -186,6 +186,26 @@ class ITaskControllerTestCase(TaskTestBase):
         d.addErrback(lambda f: self.assertRaises(IndexError, f.raiseException))
         return d
 
+    def test_queue_status(self):
+        d = self.tc.run(task.MapTask(lambda x: 2*x,(10,)))
+        d.addCallback(lambda _: self.tc.queue_status())
+        def check_waiting(status):
+            self.assertEquals(status['scheduled'], 1)
+            self.assertEquals(status['engines'], 0)
+            self.assertEquals(status['idle'], 0)
+            self.assert_(status['wait'] >= 0.0)
+        d.addCallback(check_waiting)
+        d.addCallback(lambda _: self.addEngine(1))
+        d.addCallback(lambda _: self.tc.get_task_result(0, block=True))
+        d.addCallback(lambda _: self.tc.queue_status(True))
+        def check_done(status):
+            self.assertEquals(status['scheduled'], [])
+            self.assertEquals(status['engines'], [self.engines[0].id])
+            self.assertEquals(status['idle'], [self.engines[0].id])
+            self.assertEquals(status['wait'], 0.0)
+        d.addCallback(check_done)
+        return d
+
     def get_traceback_frames(self, result):
         """Execute a failing string as a task and return stack frame strings.
 
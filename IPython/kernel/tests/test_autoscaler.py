@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2008  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+# Tell nose to skip this module
+__test__ = {}
+
+from twisted.internet import defer
+from twisted.trial import unittest
+
+from IPython.config.loader import Config
+from IPython.kernel.autoscaler import Autoscaler
+
+#-----------------------------------------------------------------------------
+# Tests
+#-----------------------------------------------------------------------------
+
+def status(engines, idle=(), scheduled=0, wait=0.0):
+    return dict(engines=list(engines), idle=list(idle),
+                scheduled=range(scheduled), wait=wait)
+
+
+class RecordingLauncher(object):
+    """An engine set launcher that records what it is asked to start."""
+
+    started = []
+
+    def __init__(self, work_dir=u'', config=None):
+        self.running = False
+
+    def start(self, n, cluster_dir):
+        self.started.append((n, cluster_dir))
+        self.running = True
+        return defer.succeed(None)
+
+
+class QueueStatus(object):
+    """A task client with a fixed queue status."""
+
+    def __init__(self, status):
+        self.status = status
+
+    def queue_status(self, verbose=False):
+        return defer.succeed(self.status)
+
+
+class MultiEngine(object):
+    """A multiengine client with fixed queues, recording the engines killed."""
+
+    def __init__(self, queues):
+        self.queues = queues
+        self.killed = []
+
+    def queue_status(self, targets='all', block=True):
+        return defer.succeed([(id, dict(queue=self.queues.get(id, []),
+                                        pending=repr(None)))
+                              for id in targets])
+
+    def kill(self, controller=False, targets='all', block=True):
+        self.killed.extend(targets)
+        return defer.succeed(None)
+
+
+class TestAutoscaler(unittest.TestCase):
+
+    def setUp(self):
+        c = Config()
+        c.Autoscaler.min_engines = 1
+        c.Autoscaler.max_engines = 6
+        c.Autoscaler.step = 4
+        c.Autoscaler.idle_timeout = 10.0
+        c.Autoscaler.wait_threshold = 5.0
+        c.Autoscaler.start_timeout = 30.0
+        self.scaler = Autoscaler(config=c)
+
+    def test_min_engines(self):
+        self.assertEquals(self.scaler.decide(status([]), 0.0), (1, []))
+        # The engine is still starting.
+        self.assertEquals(self.scaler.decide(status([]), 1.0), (0, []))
+
+    def test_scale_up(self):
+        s = self.scaler
+        self.assertEquals(s.decide(status([0], scheduled=1), 0.0), (0, []))
+        self.assertEquals(s.decide(status([0], scheduled=3), 1.0), (4, []))
+        # Don't start more while those are registering.
+        self.assertEquals(s.decide(status([0,1], scheduled=3), 2.0), (0, []))
+        # Only up to max_engines.
+        self.assertEquals(
+            s.decide(status(range(5), scheduled=20), 3.0), (1, [])
+        )
+        self.assertEquals(
+            s.decide(status(range(6), scheduled=20), 4.0), (0, [])
+        )
+
+    def test_wait_threshold(self):
+        s = self.scaler
+        self.assertEquals(s.decide(status([0], scheduled=1, wait=1.0), 0.0),
+                          (0, []))
+        self.assertEquals(s.decide(status([0], scheduled=1, wait=6.0), 1.0),
+                          (4, []))
+
+    def test_start_timeout(self):
+        s = self.scaler
+        self.assertEquals(s.decide(status([0], scheduled=5), 0.0), (4, []))
+        self.assertEquals(s.decide(status([0], scheduled=5), 10.0), (0, []))
+        # The engines never came, try again.
+        self.assertEquals(s.decide(status([0], scheduled=5), 40.0), (4, []))
+
+    def test_retire(self):
+        s = self.scaler
+        s.step = 2
+        # Engine 0 was there before, engines 1 and 2 are started here.
+        self.assertEquals(s.decide(status([0], scheduled=3), 0.0), (2, []))
+        self.assertEquals(s.decide(status([0,1,2], idle=[0,1,2]), 1.0),
+                          (0, []))
+        self.assertEquals(s.decide(status([0,1,2], idle=[0,2]), 5.0),
+                          (0, []))
+        # Engine 1 was busy in between, and engine 0 isn't ours.
+        self.assertEquals(s.decide(status([0,1,2], idle=[0,1,2]), 12.0),
+                          (0, [2]))
+        self.assertEquals(s.decide(status([0,1], idle=[0,1]), 30.0),
+                          (0, [1]))
+        self.assertEquals(s.decide(status([0], idle=[0]), 60.0), (0, []))
+
+    def test_no_retire_of_other_engines(self):
+        s = self.scaler
+        s.decide(status([0,1,2], idle=[0,1,2]), 0.0)
+        # Engines appearing while none was started aren't ours either.
+        self.assertEquals(
+            s.decide(status([0,1,2,3], idle=[0,1,2,3]), 20.0), (0, [])
+        )
+
+    def test_retire_only_empty_queues(self):
+        s = self.scaler
+        s.multiengine_client = MultiEngine({2: ['execute']})
+        d = s.retire_engines([1, 2])
+        d.addCallback(lambda r: self.assertEquals(s.multiengine_client.killed, [1]))
+        d.addCallback(lambda r: s.retire_engines([2]))
+        d.addCallback(lambda r: self.assertEquals(s.multiengine_client.killed, [1]))
+        return d
+
+    def test_no_retire_with_scheduled_tasks(self):
+        s = self.scaler
+        s.max_engines = 2
+        s.decide(status([0,1], idle=[0,1], scheduled=5), 0.0)
+        self.assertEquals(
+            s.decide(status([0,1], idle=[0,1], scheduled=5), 20.0), (0, [])
+        )
+
+    def test_check_starts_engines(self):
+        RecordingLauncher.started = []
+        s = self.scaler
+        s.task_client = QueueStatus(status([0], scheduled=10))
+        s.launcher_class = RecordingLauncher
+        s.cluster_dir = u'/cluster'
+        d = s.check()
+        d.addCallback(
+            lambda r: self.assertEquals(RecordingLauncher.started, [(4, u'/cluster')])
+        )
+        return d
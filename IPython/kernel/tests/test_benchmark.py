@@ -0,0 +1,67 @@
+# encoding: utf-8
+
+"""This file contains unittests for the kernel.benchmark.py module."""
+
+__docformat__ = "restructuredtext en"
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2008  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+# Tell nose to skip this module
+__test__ = {}
+
+import json
+import os
+from cStringIO import StringIO
+
+from twisted.trial import unittest
+
+from IPython.kernel import benchmark
+
+#-----------------------------------------------------------------------------
+# Tests
+#-----------------------------------------------------------------------------
+
+class BenchmarkTest(unittest.TestCase):
+
+    def testPercentile(self):
+        values = range(101)
+        self.assertEquals(benchmark.percentile(values, 0), 0)
+        self.assertEquals(benchmark.percentile(values, 50), 50)
+        self.assertEquals(benchmark.percentile(values, 99), 99)
+        self.assertEquals(benchmark.percentile(values, 100), 100)
+        self.assertEquals(benchmark.percentile([1, 2], 50), 1.5)
+        self.assertEquals(benchmark.percentile([3], 90), 3)
+        self.assertRaises(ValueError, benchmark.percentile, [], 50)
+
+    def testSummarize(self):
+        s = benchmark.summarize([0.003, 0.001, 0.002])
+        self.assertEquals(s['count'], 3)
+        self.assertAlmostEquals(s['min'], 1.0)
+        self.assertAlmostEquals(s['max'], 3.0)
+        self.assertAlmostEquals(s['mean'], 2.0)
+        self.assertAlmostEquals(s['p50'], 2.0)
+
+    def testProcessCpuTime(self):
+        self.assertEquals(benchmark.process_cpu_time(None), None)
+        if os.path.isfile('/proc/%i/stat' % os.getpid()):
+            cpu = benchmark.process_cpu_time(os.getpid())
+            self.assert_(cpu >= 0.0)
+
+    def testSerializationToJSON(self):
+        results = benchmark.bench_serialization(size=1000, repeat=1)
+        self.assert_('list_of_floats' in results)
+        for r in results.values():
+            self.assert_(r['bytes'] > 0)
+        f = StringIO()
+        benchmark.dump_results(dict(serialization=results), f)
+        loaded = json.loads(f.getvalue())['serialization']
+        self.assertEquals(sorted(loaded.keys()), sorted(results.keys()))
@@ -64,8 +64,8 @@ class EngineFCTest(DeferredTestCase,
       self.engine_service.startService()
       self.engine_tub = Tub()
       self.engine_tub.startService()
-      engine_connector = EngineConnector(self.engine_tub)
-      d = engine_connector.connect_to_controller(self.engine_service, furl)
+      self.engine_connector = EngineConnector(self.engine_tub)
+      d = self.engine_connector.connect_to_controller(self.engine_service, furl)
       # This deferred doesn't fire until after register_engine has returned and
       # thus, self.engine has been defined and the tets can proceed.
       return d
@@ -89,4 +89,23 @@ class EngineFCTest(DeferredTestCase,
       return {'id':id}
  
   def unregister_engine(self, id):
-      pass
\ No newline at end of file
+      pass
+
+  def testPushFunctionByDigest(self):
+      cache = self.engine_connector.engine_reference.function_cache
+      def f(x):
+          return 2*x
+      d = self.engine.push_function(dict(f=f))
+      d.addCallback(lambda _: self.assertEquals((cache.hits, len(cache)), (0, 1)))
+      d.addCallback(lambda _: self.engine.push_function(dict(g=f)))
+      d.addCallback(lambda _: self.assertEquals((cache.hits, len(cache)), (1, 1)))
+      d.addCallback(lambda _: self.engine.execute('r = g(10)'))
+      d.addCallback(lambda _: self.engine.pull('r'))
+      d.addCallback(lambda r: self.assertEquals(r, 20))
+      # An evicted function is pushed again in full.
+      d.addCallback(lambda _: cache._functions.clear())
+      d.addCallback(lambda _: self.engine.push_function(dict(h=f)))
+      d.addCallback(lambda _: self.engine.execute('r = h(3)'))
+      d.addCallback(lambda _: self.engine.pull('r'))
+      d.addCallback(lambda r: self.assertEquals(r, 6))
+      return d
@@ -30,6 +30,7 @@ from twisted.internet import defer
 from twisted.application.service import IService
 
 from IPython.kernel import engineservice as es
+from IPython.kernel import error
 from IPython.testing.util import DeferredTestCase
 from IPython.kernel.tests.engineservicetest import \
     IEngineCoreTestCase, \
@@ -77,3 +78,53 @@ class QueuedEngineServiceTest(DeferredTestCase,
         return self.rawEngine.stopService()
 
 
+
+class PipelinedQueuedEngineServiceTest(DeferredTestCase):
+
+    def setUp(self):
+        self.rawEngine = es.ThreadedEngineService()
+        self.rawEngine.startService()
+        self.engine = es.QueuedEngine(self.rawEngine, pipeline=True)
+        self.batches = []
+        run_batch = self.rawEngine.run_batch
+        def counting_run_batch(commands):
+            self.batches.append([c[0] for c in commands])
+            return run_batch(commands)
+        self.rawEngine.run_batch = counting_run_batch
+
+    def tearDown(self):
+        return self.rawEngine.stopService()
+
+    def testCoalesce(self):
+        # The first command runs right away, the next three are queued
+        # behind it and go to the engine as a single batch.
+        dList = [self.engine.execute('a = 10'),
+                 self.engine.push(dict(b=5)),
+                 self.engine.execute('c = a*b'),
+                 self.engine.pull('c')]
+        d = defer.gatherResults(dList)
+        d.addCallback(lambda r: self.assertEquals(r[3], 50))
+        d.addCallback(lambda _: self.assertEquals(self.batches,
+            [['push', 'execute', 'pull']]))
+        return d
+
+    def testHistory(self):
+        dList = [self.engine.execute('a = 10'),
+                 self.engine.execute('b = 5')]
+        d = defer.gatherResults(dList)
+        d.addCallback(lambda r: self.engine.get_result(r[1]['number']))
+        d.addCallback(lambda r: self.assertEquals(r['input']['translated'], 'b = 5'))
+        return d
+
+    def testPipelineFailure(self):
+        d1 = self.engine.push(dict(a=10))
+        d2 = self.engine.execute('1/0')
+        d3 = self.engine.pull('a')
+        d4 = self.engine.execute('a = 20')
+        d2 = self.assertDeferredRaises(d2, ZeroDivisionError)
+        d3 = self.assertDeferredRaises(d3, error.QueueCleared)
+        d4 = self.assertDeferredRaises(d4, error.QueueCleared)
+        d = defer.gatherResults([d1, d2, d3, d4])
+        d.addCallback(lambda _: self.engine.pull('a'))
+        d.addCallback(lambda r: self.assertEquals(r, 10))
+        return d
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2008  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+# Tell nose to skip this module
+__test__ = {}
+
+import json
+import os
+
+from twisted.internet import reactor
+from twisted.internet.protocol import ClientCreator, Protocol
+from twisted.trial import unittest
+
+from IPython.kernel.launcher import LocalForkEngineSetLauncher
+
+#-----------------------------------------------------------------------------
+# Tests
+#-----------------------------------------------------------------------------
+
+class TestLocalForkEngineSetLauncher(unittest.TestCase):
+
+    def setUp(self):
+        self.launcher = LocalForkEngineSetLauncher()
+        self.launcher.n = 2
+        self.path = self.launcher.listen_for_reports()
+
+    def tearDown(self):
+        d = self.launcher.stop_listening_for_reports()
+        d.addCallback(lambda r: self.assertFalse(os.path.exists(self.path)))
+        return d
+
+    def send_report(self, report):
+        cc = ClientCreator(reactor, Protocol)
+        d = cc.connectUNIX(self.path)
+        def _send(p):
+            p.transport.write(json.dumps(report)+'\n')
+            p.transport.loseConnection()
+        return d.addCallback(_send)
+
+    def test_registered(self):
+        d = self.launcher.observe_registered()
+        self.send_report(dict(id=0, pid=1, timings=dict(fork=0.1)))
+        self.send_report(dict(id=1, pid=2, timings=dict(fork=0.2)))
+        def _check(reports):
+            self.assertEquals(len(reports), 2)
+            self.assertEquals(sorted(r['id'] for r in reports), [0, 1])
+            for r in reports:
+                self.assert_(r['elapsed'] >= 0.0)
+            # Once all engines have registered this fires right away.
+            return self.launcher.observe_registered()
+        d.addCallback(_check)
+        d.addCallback(lambda reports: self.assertEquals(len(reports), 2))
+        return d
+
+    def test_invalid_report(self):
+        d = self.launcher.observe_registered()
+        self.send_report(dict(id=0, pid=1, timings={}))
+        cc = ClientCreator(reactor, Protocol)
+        bad = cc.connectUNIX(self.path)
+        def _send_garbage(p):
+            p.transport.write('not json\n')
+            p.transport.loseConnection()
+        bad.addCallback(_send_garbage)
+        bad.addCallback(lambda r: self.send_report(dict(id=1, pid=2, timings={})))
+        d.addCallback(lambda reports: self.assertEquals(len(reports), 2))
+        return d
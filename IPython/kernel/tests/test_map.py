@@ -0,0 +1,88 @@
+# encoding: utf-8
+
+"""This file contains unittests for the kernel.map.py module."""
+
+__docformat__ = "restructuredtext en"
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2008  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+# Tell nose to skip this module
+__test__ = {}
+
+from twisted.trial import unittest
+
+from IPython.kernel import map as Map
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+#-----------------------------------------------------------------------------
+# Tests
+#-----------------------------------------------------------------------------
+
+class MapTestCase(unittest.TestCase):
+
+    def testPartitions(self):
+        m = Map.Map()
+        seq = range(10)
+        parts = m.getPartitions(seq, 4)
+        self.assertEquals(parts, [[0,1,2],[3,4,5],[6,7],[8,9]])
+        for p in range(4):
+            self.assertEquals(m.getPartition(seq, p, 4), parts[p])
+        self.assertEquals(m.joinPartitions(parts), seq)
+
+    def testMorePartitionsThanElements(self):
+        m = Map.Map()
+        parts = m.getPartitions(range(3), 5)
+        self.assertEquals(parts, [[0],[1],[2],[],[]])
+        self.assertEquals(m.joinPartitions(parts), range(3))
+
+    def testRoundRobin(self):
+        m = Map.RoundRobinMap()
+        seq = range(10)
+        parts = m.getPartitions(seq, 4)
+        self.assertEquals(parts, [[0,4,8],[1,5,9],[2,6],[3,7]])
+        self.assertEquals(m.joinPartitions(parts), seq)
+        self.assertEquals(m.joinPartitions(m.getPartitions(tuple(seq), 3)), seq)
+
+    def testWeighted(self):
+        m = Map.WeightedMap([1, 1, 2])
+        seq = range(8)
+        parts = m.getPartitions(seq, 3)
+        self.assertEquals(parts, [[0,1],[2,3],[4,5,6,7]])
+        self.assertEquals(m.getPartition(seq, 2, 3), [4,5,6,7])
+        self.assertEquals(m.joinPartitions(parts), seq)
+        self.assertRaises(ValueError, m.getPartitions, seq, 2)
+        self.assertRaises(ValueError, Map.WeightedMap, [0, 0])
+
+    def testGetMap(self):
+        self.assert_(isinstance(Map.get_map('b'), Map.Map))
+        self.assert_(isinstance(Map.get_map('r'), Map.RoundRobinMap))
+        w = Map.WeightedMap([1, 2])
+        self.assert_(Map.get_map(w) is w)
+        self.assertRaises(ValueError, Map.get_map, 'x')
+
+    def testArrayViews(self):
+        if numpy is None:
+            raise unittest.SkipTest("numpy not available")
+        a = numpy.arange(20.0).reshape(10, 2)
+        for m in [Map.Map(), Map.RoundRobinMap(), Map.WeightedMap([3, 1])]:
+            parts = m.getPartitions(a, 2)
+            for part in parts:
+                self.assert_(part.base is a or part.base is a.base)
+            out = numpy.empty_like(a)
+            result = m.joinPartitions(parts, out)
+            self.assert_(result is out)
+            self.assert_((result == a).all())
+            self.assert_((m.joinPartitions(parts) == a).all())
@@ -31,6 +31,25 @@ from IPython.kernel.clientconnector import AsyncClientConnector
 from IPython.kernel.parallelfunction import ParallelFunction
 from IPython.kernel.error import CompositeError
 from IPython.kernel.util import printer
+from IPython.kernel.ipcontrollerapp import IPControllerAppConfigLoader
+
+
+class ResultTimeoutTestCase(DeferredTestCase):
+
+    def test_result_timeout(self):
+        # The result_timeout of ipcontroller reaches the pending deferred
+        # manager of the multiengine served to the clients.
+        controller = ControllerService(result_timeout=30.0)
+        referenceable = IFCSynchronousMultiEngine(IMultiEngine(controller))
+        self.assertEquals(referenceable.smultiengine.result_timeout, 30.0)
+        controller = ControllerService()
+        referenceable = IFCSynchronousMultiEngine(IMultiEngine(controller))
+        self.assertEquals(referenceable.smultiengine.result_timeout, None)
+
+    def test_result_timeout_option(self):
+        loader = IPControllerAppConfigLoader(['--result-timeout', '30'])
+        config = loader.load_config()
+        self.assertEquals(config.Global.result_timeout, 30.0)
 
 
 def _raise_it(f):
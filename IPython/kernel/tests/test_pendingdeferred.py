@@ -184,3 +184,63 @@ class PendingDeferredManagerTest(DeferredTestCase):
         d3 = self.pdm.get_pending_deferred(did,False)
         d3.addCallback(lambda r: self.assertEquals(r,'bar'))
 
+
+    def test_clear_pending_deferreds(self):
+        dids = [self.pdm.save_pending_deferred(defer.Deferred())
+                for i in range(10)]
+        self.pdm.clear_pending_deferreds()
+        for did in dids:
+            self.assert_(not self.pdm.quick_has_id(did))
+        self.assertEquals(self.pdm.get_pending_deferred_stats()['pending'], 0)
+
+    def test_stats(self):
+        d1 = defer.Deferred()
+        d2 = defer.Deferred()
+        did1 = self.pdm.save_pending_deferred(d1)
+        did2 = self.pdm.save_pending_deferred(d2)
+        stats = self.pdm.get_pending_deferred_stats()
+        self.assertEquals(stats['pending'], 2)
+        self.assertEquals(stats['completed'], 0)
+        self.assertEquals(stats['result_bytes'], 0)
+        d1.callback(range(100))
+        stats = self.pdm.get_pending_deferred_stats()
+        self.assertEquals(stats['pending'], 1)
+        self.assertEquals(stats['completed'], 1)
+        self.assert_(stats['result_bytes'] > 0)
+        self.pdm.get_pending_deferred(did2, True)
+        self.assertEquals(self.pdm.get_pending_deferred_stats()['waiting'], 1)
+        d3 = self.pdm.get_pending_deferred(did1, False)
+        d3.addCallback(lambda r: self.assertEquals(r, range(100)))
+        stats = self.pdm.get_pending_deferred_stats()
+        self.assertEquals(stats['completed'], 0)
+        self.assertEquals(stats['result_bytes'], 0)
+        return d3
+
+    def test_expire_results(self):
+        pdm = pd.PendingDeferredManager(result_timeout=10)
+        d = defer.Deferred()
+        did = pdm.save_pending_deferred(d)
+        d.callback('foo')
+        self.assertEquals(pdm.expire_results(pdm._result_times[did] + 5), 0)
+        self.assert_(pdm.quick_has_id(did))
+        self.assertEquals(pdm.expire_results(pdm._result_times[did] + 10), 1)
+        self.assert_(not pdm.quick_has_id(did))
+        stats = pdm.get_pending_deferred_stats()
+        self.assertEquals(stats['expired'], 1)
+        self.assertEquals(stats['result_bytes'], 0)
+        d2 = pdm.get_pending_deferred(did, False)
+        d2.addErrback(lambda f: self.assertRaises(error.InvalidDeferredID, f.raiseException))
+        return d2
+
+    def test_expire_skips_unfinished_and_collected(self):
+        pdm = pd.PendingDeferredManager(result_timeout=10)
+        d1 = defer.Deferred()
+        d2 = defer.Deferred()
+        did1 = pdm.save_pending_deferred(d1)
+        did2 = pdm.save_pending_deferred(d2)
+        d1.callback('foo')
+        t = pdm._result_times[did1]
+        pdm.get_pending_deferred(did1, False)
+        # Neither the collected result nor the unfinished one are expired.
+        self.assertEquals(pdm.expire_results(t + 100), 0)
+        self.assert_(pdm.quick_has_id(did2))
@@ -0,0 +1,62 @@
+# encoding: utf-8
+
+"""This file contains unittests for the kernel.pickleutil.py module."""
+
+__docformat__ = "restructuredtext en"
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2008  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+# Tell nose to skip this module
+__test__ = {}
+
+import cPickle as pickle
+
+from twisted.trial import unittest
+
+from IPython.kernel import codeutil  # Registers code object pickling
+from IPython.kernel.pickleutil import (
+    can, uncan, code_digest, FunctionCache
+)
+
+#-----------------------------------------------------------------------------
+# Tests
+#-----------------------------------------------------------------------------
+
+def f(x):
+    return x+1
+
+def g(x):
+    return x+2
+
+
+class PickleUtilTestCase(unittest.TestCase):
+
+    def testCannedDigest(self):
+        cf = can(f)
+        self.assertEquals(cf.digest, code_digest(f.func_code))
+        self.assertNotEquals(cf.digest, can(g).digest)
+        cf2 = pickle.loads(pickle.dumps(cf, 2))
+        self.assertEquals(cf2.digest, cf.digest)
+        self.assertEquals(uncan(cf2)(1), 2)
+
+    def testFunctionCache(self):
+        cache = FunctionCache(2)
+        cache.add('a', f)
+        cache.add('b', g)
+        self.assert_(cache.get('a') is f)
+        # 'b' is now the least recently used and gets evicted
+        cache.add('c', f)
+        self.assert_('b' not in cache)
+        self.assert_('a' in cache and 'c' in cache)
+        self.assert_(cache.get('b') is None)
+        self.assertEquals((cache.hits, cache.misses), (1, 1))
+        self.assertEquals(len(cache), 2)
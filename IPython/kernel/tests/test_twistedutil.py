@@ -18,11 +18,56 @@ __test__ = {}
 import tempfile
 import os, sys
 
-from twisted.internet import reactor
+from twisted.internet import reactor, utils
 from twisted.trial import unittest
 
+from IPython.kernel import twistedutil
 from IPython.kernel.error import FileTimeoutError
-from IPython.kernel.twistedutil import wait_for_file
+from IPython.kernel.launcher import LocalForkEngineSetLauncher
+from IPython.kernel.twistedutil import wait_for_file, reset_reactor_after_fork
+
+# Forks two engines which run their reactor and report over it, through a
+# thread so that the waker is used too.  The reports tell the waker pipes
+# apart by their inode.
+fork_engines_script = """
+import json, os, sys
+from twisted.internet import %(reactor)s
+%(reactor)s.install()
+from twisted.internet import reactor, threads
+from twisted.internet.protocol import ClientCreator, Protocol
+from IPython.kernel.twistedutil import reset_reactor_after_fork
+
+class Report(Protocol):
+    def __init__(self, report):
+        self.report = report
+    def connectionMade(self):
+        self.transport.write(json.dumps(self.report)+'\\n')
+        self.transport.loseConnection()
+    def connectionLost(self, reason):
+        reactor.stop()
+
+def report(pid, engine_id):
+    waker = os.fstat(reactor.waker.fileno()).st_ino
+    report = dict(id=engine_id, pid=pid, timings={}, waker=waker)
+    return ClientCreator(reactor, Report, report).connectUNIX(%(path)r)
+
+def start(engine_id):
+    d = threads.deferToThread(os.getpid)
+    d.addCallback(report, engine_id)
+    d.addErrback(lambda f: reactor.stop())
+
+pids = []
+for i in range(2):
+    pid = os.fork()
+    if pid == 0:
+        reset_reactor_after_fork()
+        reactor.callWhenRunning(start, i)
+        reactor.callLater(10, reactor.stop)
+        reactor.run()
+        os._exit(0)
+    pids.append(pid)
+sys.exit(max([os.waitpid(pid, 0)[1] for pid in pids]) and 1)
+"""
 
 #-----------------------------------------------------------------------------
 # Tests
@@ -48,4 +93,49 @@ class TestWaitForFile(unittest.TestCase):
         d = wait_for_file(filename,delay=0.1,max_tries=1)
         d.addErrback(lambda f: self.assertRaises(FileTimeoutError,f.raiseException))
         return d
-        
\ No newline at end of file
+        
+
+
+class UnknownReactor(object):
+    running = False
+
+
+class TestResetReactorAfterFork(unittest.TestCase):
+
+    timeout = 60
+
+    def fork_engines(self, reactor_name):
+        try:
+            __import__('twisted.internet.'+reactor_name)
+        except ImportError:
+            raise unittest.SkipTest('no %s on this platform' % reactor_name)
+        launcher = LocalForkEngineSetLauncher()
+        launcher.n = 2
+        path = launcher.listen_for_reports()
+        registered = launcher.observe_registered()
+        script = fork_engines_script % dict(reactor=reactor_name, path=path)
+        d = utils.getProcessValue(sys.executable, ['-c', script],
+                                  env=os.environ)
+        d.addCallback(lambda status: self.assertEquals(status, 0))
+        d.addCallback(lambda r: registered)
+        def _check(reports):
+            self.assertEquals(sorted(r['id'] for r in reports), [0, 1])
+            self.assertEquals(len(set(r['pid'] for r in reports)), 2)
+            self.assertEquals(len(set(r['waker'] for r in reports)), 2)
+        d.addCallback(_check)
+        d.addBoth(lambda r: launcher.stop_listening_for_reports()
+                  .addCallback(lambda ignored: r))
+        return d
+
+    def test_select(self):
+        return self.fork_engines('selectreactor')
+
+    def test_poll(self):
+        return self.fork_engines('pollreactor')
+
+    def test_epoll(self):
+        return self.fork_engines('epollreactor')
+
+    def test_unknown_reactor(self):
+        self.patch(twistedutil, 'reactor', UnknownReactor())
+        self.assertRaises(RuntimeError, reset_reactor_after_fork)
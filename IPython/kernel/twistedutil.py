@@ -256,6 +256,64 @@ def wait_for_file(filename, delay=0.1, max_tries=10):
     return d
 
 
+# The reactors reset_reactor_after_fork knows how to reset, by module.  The
+# others (kqueue, the GUI reactors, ...) keep state of their own that a child
+# can't get rid of.
+_fork_safe_reactors = ('twisted.internet.selectreactor',
+                       'twisted.internet.pollreactor',
+                       'twisted.internet.epollreactor')
+
+
+def can_reset_reactor_after_fork():
+    """Tell whether :func:`reset_reactor_after_fork` can reset the reactor."""
+    return type(reactor).__module__ in _fork_safe_reactors
+
+
+def reset_reactor_after_fork():
+    """Give the reactor of a forked child process its own file descriptors.
+
+    The reactor is created when it is first imported, so a child forked
+    after that shares the waker pipe (and, with the epoll reactor, the epoll
+    instance) of its parent and of its siblings.  This replaces them by new
+    ones and must be called in the child before the reactor is run.
+
+    Only the select, poll and epoll reactors can be reset, this raises
+    :exc:`RuntimeError` for the others.
+    """
+    module = type(reactor).__module__
+    if not can_reset_reactor_after_fork():
+        raise RuntimeError(
+            'Cannot reset the %s after a fork, use the select, poll or epoll '
+            'reactor.' % type(reactor).__name__
+        )
+    if reactor.running:
+        raise RuntimeError('The reactor must be reset before it is run.')
+    # Twisted has no public way to uninstall the waker, this undoes what
+    # installWaker does.
+    waker = reactor.waker
+    if module == 'twisted.internet.epollreactor':
+        # Removing a descriptor from the shared epoll instance would remove
+        # it for the parent and the siblings too, so the descriptors to keep
+        # are moved to a new instance instead.
+        readers = [r for r in reactor.getReaders() if r is not waker]
+        writers = reactor.getWriters()
+        reactor._poller.close()
+        reactor._poller = type(reactor._poller)(1024)
+        for fds in (reactor._reads, reactor._writes, reactor._selectables):
+            fds.clear()
+        for reader in readers:
+            reactor.addReader(reader)
+        for writer in writers:
+            reactor.addWriter(writer)
+    elif waker is not None:
+        reactor.removeReader(waker)
+    if waker is not None:
+        reactor._internalReaders.discard(waker)
+        waker.connectionLost(None)
+        reactor.waker = None
+    reactor.installWaker()
+
+
 def sleep_deferred(seconds):
     """Sleep without blocking the event loop."""
     d = defer.Deferred()
@@ -6,7 +6,9 @@ meant for public usage, it implements an object which can create and manage
 new background jobs.
 
 It also provides the actual job classes managed by these BackgroundJobManager
-objects, see their docstrings below.
+objects, see their docstrings below.  Jobs run in threads by default, or in
+separate processes (see BackgroundJobProcess) so that CPU bound jobs can use
+several cores.
 
 
 This system was inspired by discussions with B. Granger and the
@@ -27,6 +29,7 @@ separate implementation).
 #*****************************************************************************
 
 # Code begins
+import multiprocessing
 import sys
 import threading
 
@@ -41,6 +44,8 @@ class BackgroundJobManager:
     Usage summary (see the method docstrings for details):
 
       jobs.new(...) -> start a new job
+
+      jobs.new(..., process=True) -> start a new job in a separate process
       
       jobs() or jobs.status() -> print status summary of all jobs
 
@@ -53,6 +58,8 @@ class BackgroundJobManager:
       jobs.remove(N) -> remove (finished) job N
 
       jobs.flush_finished() -> remove all finished jobs
+
+      jobs.kill(N) -> kill process job N, or cancel it if it hasn't started
       
     As a convenience feature, BackgroundJobManager instances provide the
     utility result and traceback methods which retrieve the corresponding
@@ -67,7 +74,17 @@ class BackgroundJobManager:
     In interactive mode, IPython provides the magic fuction %bg for quick
     creation of backgrounded expression-based jobs. Type bg? for details."""
 
-    def __init__(self):
+    def __init__(self, processes=None):
+        """Create a job manager.
+
+        processes is the maximum number of process jobs running at the same
+        time, by default the number of CPUs.  Further process jobs wait for
+        one of them to finish."""
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        self.processes = processes
+        # Created with the first process job
+        self._process_slots = None
         # Lists for job management
         self.jobs_run  = []
         self.jobs_comp = []
@@ -84,7 +101,8 @@ class BackgroundJobManager:
         self._s_dead      = BackgroundJobBase.stat_dead_c
 
     def new(self,func_or_exp,*args,**kwargs):
-        """Add a new background job and start it in a separate thread.
+        """Add a new background job and start it in a separate thread or
+        process.
 
         There are two types of jobs which can be created:
 
@@ -122,6 +140,17 @@ class BackgroundJobManager:
         In both cases, the result is stored in the job.result field of the
         background job object.
 
+        3. Either kind of job runs in a separate process if process=True is
+        given:
+
+          job_manager.new(myfunc,x,y,process=True)
+
+        The job then runs in parallel with the interactive session and with
+        other jobs, up to the number of processes given to the manager, and
+        can be killed.  The process is forked with a copy of the whole
+        interpreter state, so changes the job makes to objects are not seen
+        by the session.  The result is pickled back, so it must be picklable.
+
 
         Notes and caveats:
 
@@ -144,8 +173,10 @@ class BackgroundJobManager:
         simply wait unless the extension module releases the GIL.
 
         4. There is no way, due to limitations in the Python threads library,
-        to kill a thread once it has started."""
-        
+        to kill a thread once it has started.  Process jobs don't have this
+        limitation, nor the previous one."""
+
+        process = kwargs.get('process', False)
         if callable(func_or_exp):
             kw  = kwargs.get('kw',{})
             job = BackgroundJobFunc(func_or_exp,*args,**kw)
@@ -163,6 +194,10 @@ class BackgroundJobManager:
             job = BackgroundJobExpr(func_or_exp,glob,loc)
         else:
             raise
+        if process:
+            if self._process_slots is None:
+                self._process_slots = threading.Semaphore(self.processes)
+            job = BackgroundJobProcess(job, self._process_slots)
         jkeys = self.jobs_all.keys()
         if jkeys:
             job.num = max(jkeys)+1
@@ -170,7 +205,10 @@ class BackgroundJobManager:
             job.num = 0
         self.jobs_run.append(job)
         self.jobs_all[job.num] = job
-        print 'Starting job # %s in a separate thread.' % job.num
+        if process:
+            print 'Starting job # %s in a separate process.' % job.num
+        else:
+            print 'Starting job # %s in a separate thread.' % job.num
         job.start()
         return job
 
@@ -281,6 +319,20 @@ class BackgroundJobManager:
             elif stat_code == self._s_dead:
                 self.jobs_dead.remove(job)
 
+    def kill(self,num):
+        """Kill a running process job, or cancel it if it is still waiting
+        for a free process.  The job is then dead."""
+
+        try:
+            job = self.jobs_all[num]
+        except KeyError:
+            error('Job #%s not found' % num)
+        else:
+            if not isinstance(job, BackgroundJobProcess):
+                error('Job #%s runs in a thread, it can not be killed.' % num)
+            else:
+                job.kill()
+
     def flush_finished(self):
         """Flush all jobs finished (completed and dead) from lists.
 
@@ -363,11 +415,13 @@ class BackgroundJobBase(threading.Thread):
         # reuse the ipython traceback handler if we can get to it, otherwise
         # make a new one
         try:
-            self._make_tb = __IPYTHON__.InteractiveTB.text
+            make_tb = __IPYTHON__.InteractiveTB.text
         except:
-            self._make_tb = AutoFormattedTB(mode = 'Context',
-                                           color_scheme='NoColor',
-                                           tb_offset = 1).text
+            make_tb = AutoFormattedTB(mode = 'Context',
+                                      color_scheme='NoColor',
+                                      tb_offset = 1).text
+        # Format the exception being handled when called
+        self._make_tb = lambda : make_tb(*sys.exc_info())
         # Hold a formatted traceback if one is generated.
         self._tb = None
         
@@ -452,6 +506,85 @@ class BackgroundJobFunc(BackgroundJobBase):
         return self.func(*self.args,**self.kwargs)
 
 
+class BackgroundJobKilled(Exception):
+    """Raised in a process job killed with BackgroundJobProcess.kill()."""
+
+
+def _process_main(conn, job, make_tb):
+    """Run job.call() and send (True, result) or (False, traceback)."""
+    try:
+        msg = (True, job.call())
+    except:
+        msg = (False, make_tb())
+    try:
+        conn.send(msg)
+    except:
+        # The result can't be pickled
+        conn.send((False, make_tb()))
+    conn.close()
+
+
+class BackgroundJobProcess(BackgroundJobBase):
+    """Run another job in a separate process.
+
+    The job's thread starts a process calling the call() method of the given
+    BackgroundJobFunc or BackgroundJobExpr, and waits for its result.  Unlike
+    threads, these jobs run in parallel with the interactive session and can
+    be killed."""
+
+    def __init__(self,job,slots=None):
+        """Create a process job running job.call().
+
+        If slots is a semaphore, it is held while the process runs, to limit
+        the number of processes running at the same time."""
+
+        self.job = job
+        self.slots = slots
+        self.strform = job.strform
+        self.process = None
+        self.killed = False
+        self._init()
+
+    def call(self):
+        if self.slots is not None:
+            self.slots.acquire()
+        try:
+            if self.killed:
+                raise BackgroundJobKilled('Job cancelled before it started.')
+            conn, child_conn = multiprocessing.Pipe(False)
+            self.process = multiprocessing.Process(target=_process_main,
+                            args=(child_conn, self.job, self._make_tb))
+            self.process.daemon = True
+            self.process.start()
+            child_conn.close()
+            if self.killed:
+                # kill() was called while the process was starting
+                self.process.terminate()
+            try:
+                ok, value = conn.recv()
+            except EOFError:
+                ok, value = False, None
+            self.process.join()
+            conn.close()
+        finally:
+            if self.slots is not None:
+                self.slots.release()
+        if not ok:
+            if value is None:
+                raise BackgroundJobKilled('Job process killed (exit code %s).'
+                                          % self.process.exitcode)
+            # Show the traceback of the process rather than ours.
+            self._make_tb = lambda : value
+            raise BackgroundJobKilled(value)
+        return value
+
+    def kill(self):
+        """Kill the job's process, or cancel the job if it hasn't started."""
+        self.killed = True
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+
+
 if __name__=='__main__':
 
     import time
@@ -0,0 +1,473 @@
+# -*- coding: utf-8 -*-
+"""Line-level and sampling profilers.
+
+The deterministic profilers of the standard library (:mod:`profile` and
+:mod:`cProfile`) report time per function.  This module provides two
+complementary tools, used by ``%prun`` and ``%run -p``:
+
+* :class:`LineProfiler` times every line of a few chosen functions, using
+  :func:`sys.settrace`.  Calls to other functions are not traced, so only the
+  functions of interest pay the tracing overhead.
+
+* :class:`SamplingProfiler` records the stack of a thread at a fixed interval
+  from a background thread.  Its overhead does not depend on the number of
+  calls made by the profiled code.
+
+Both return a statistics object (:class:`LineStats` and :class:`SampleStats`)
+that can print a text report, be saved to and loaded from a JSON file with
+:meth:`save` and :func:`load_stats`, and be compared with an earlier run with
+:meth:`diff`.
+
+Authors:
+
+* The IPython Development Team
+"""
+#-----------------------------------------------------------------------------
+# Copyright (c) 2010, IPython Development Team.
+#
+# Distributed under the terms of the Modified BSD License.
+#
+# The full license is in the file COPYING.txt, distributed with this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+import inspect
+import json
+import linecache
+import os
+import sys
+import thread
+import threading
+import time
+from timeit import default_timer
+
+#-----------------------------------------------------------------------------
+# Statistics
+#-----------------------------------------------------------------------------
+
+
+def load_stats(filename):
+    """Load a :class:`LineStats` or :class:`SampleStats` saved with save()."""
+    with open(filename) as f:
+        data = json.load(f)
+    kind = data.get('kind')
+    if kind == 'line':
+        return LineStats.from_dict(data)
+    elif kind == 'sample':
+        return SampleStats.from_dict(data)
+    raise ValueError('%s does not hold profiler statistics' % filename)
+
+
+class ProfileStats(object):
+    """Common behavior of the statistics of the profilers in this module."""
+
+    kind = None
+
+    def to_dict(self):
+        raise NotImplementedError
+
+    def save(self, filename):
+        """Save the statistics to filename, as JSON."""
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    def report(self, limit=None):
+        raise NotImplementedError
+
+    def __str__(self):
+        return self.report()
+
+
+class LineStats(ProfileStats):
+    """The time spent on each line of the functions traced by LineProfiler.
+
+    Attributes
+    ----------
+    timings : dict
+        Maps (filename, first line number, function name) to a dict that maps
+        line numbers to [hits, seconds].  The time of a line includes the
+        time spent in the functions it calls.
+    """
+
+    kind = 'line'
+
+    def __init__(self, timings=None):
+        self.timings = timings if timings is not None else {}
+
+    def to_dict(self):
+        functions = []
+        for (filename, firstlineno, name), lines in sorted(self.timings.items()):
+            functions.append(dict(
+                filename=filename, firstlineno=firstlineno, name=name,
+                lines=[[lineno]+list(t) for lineno, t in sorted(lines.items())]
+            ))
+        return dict(kind=self.kind, functions=functions)
+
+    @classmethod
+    def from_dict(cls, data):
+        timings = {}
+        for func in data['functions']:
+            key = (func['filename'], func['firstlineno'], func['name'])
+            timings[key] = dict((l[0], [l[1], l[2]]) for l in func['lines'])
+        return cls(timings)
+
+    def total_time(self, key):
+        """The time spent in the function key, in seconds."""
+        return sum(t for hits, t in self.timings[key].itervalues())
+
+    def diff(self, other):
+        """Return the hits and times of self minus those of other."""
+        timings = {}
+        for key in set(self.timings) | set(other.timings):
+            mine = self.timings.get(key, {})
+            theirs = other.timings.get(key, {})
+            lines = {}
+            for lineno in set(mine) | set(theirs):
+                h1, t1 = mine.get(lineno, (0, 0.0))
+                h2, t2 = theirs.get(lineno, (0, 0.0))
+                lines[lineno] = [h1-h2, t1-t2]
+            timings[key] = lines
+        return LineStats(timings)
+
+    def report(self, limit=None):
+        """Return a text report with the source of each traced function.
+
+        If limit is given, only the limit most expensive lines of each
+        function are shown, ordered by time.
+        """
+        out = ['Timer unit: 1e-06 s']
+        for key in sorted(self.timings):
+            out.append(self._report_function(key, limit))
+        return '\n'.join(out)
+
+    def _report_function(self, key, limit):
+        filename, firstlineno, name = key
+        lines = self.timings[key]
+        total = self.total_time(key)
+        out = ['',
+               'File: %s' % filename,
+               'Function: %s at line %s' % (name, firstlineno),
+               'Total time: %g s' % total,
+               '',
+               '%6s %9s %12s %8s %8s  %s' % ('Line #', 'Hits', 'Time',
+                                            'Per Hit', '% Time',
+                                            'Line Contents'),
+               '='*62]
+        source = linecache.getlines(filename)
+        if source and firstlineno > 0:
+            block = inspect.getblock(source[firstlineno-1:])
+            linenos = range(firstlineno, firstlineno+len(block))
+        else:
+            linenos = sorted(lines)
+        if limit:
+            linenos = sorted(lines, key=lambda l: -abs(lines[l][1]))[:limit]
+        for lineno in linenos:
+            text = linecache.getline(filename, lineno).rstrip()
+            if lineno in lines:
+                hits, t = lines[lineno]
+                per_hit = (1e6*t/hits) if hits else 0.0
+                pct = (100.0*t/total) if total else 0.0
+                out.append('%6i %9i %12.0f %8.1f %8.1f  %s' %
+                           (lineno, hits, 1e6*t, per_hit, pct, text))
+            else:
+                out.append('%6i %9s %12s %8s %8s  %s' %
+                           (lineno, '', '', '', '', text))
+        return '\n'.join(out)
+
+
+class SampleStats(ProfileStats):
+    """The stacks seen by a SamplingProfiler.
+
+    Attributes
+    ----------
+    samples : dict
+        Maps a stack, a tuple of (filename, line number, function name)
+        frames from the outermost to the innermost, to the number of times
+        it was seen.
+    interval : float
+        The sampling interval, in seconds.
+    """
+
+    kind = 'sample'
+
+    def __init__(self, samples=None, interval=0.001):
+        self.samples = samples if samples is not None else {}
+        self.interval = interval
+
+    @property
+    def total(self):
+        return sum(self.samples.itervalues())
+
+    def to_dict(self):
+        samples = [[[list(frame) for frame in stack], count]
+                   for stack, count in self.samples.iteritems()]
+        return dict(kind=self.kind, interval=self.interval, samples=samples)
+
+    @classmethod
+    def from_dict(cls, data):
+        samples = {}
+        for stack, count in data['samples']:
+            samples[tuple(tuple(frame) for frame in stack)] = count
+        return cls(samples, data['interval'])
+
+    def diff(self, other):
+        """Return the samples of self minus those of other.
+
+        The counts of other are first scaled to the total of self, so that the
+        result shows where the share of the time changed between two runs of
+        different lengths.
+        """
+        scale = float(self.total)/other.total if other.total else 0.0
+        samples = {}
+        for stack in set(self.samples) | set(other.samples):
+            samples[stack] = self.samples.get(stack, 0) - \
+                scale*other.samples.get(stack, 0)
+        return SampleStats(samples, self.interval)
+
+    def functions(self):
+        """Return {(filename, name): [self samples, total samples]}."""
+        result = {}
+        for stack, count in self.samples.iteritems():
+            seen = set()
+            for filename, lineno, name in stack:
+                key = (filename, name)
+                if key not in seen:
+                    seen.add(key)
+                    result.setdefault(key, [0, 0])[1] += count
+            if stack:
+                filename, lineno, name = stack[-1]
+                result[(filename, name)][0] += count
+        return result
+
+    def lines(self):
+        """Return {(filename, lineno, name): samples} for the innermost frames."""
+        result = {}
+        for stack, count in self.samples.iteritems():
+            if stack:
+                result[stack[-1]] = result.get(stack[-1], 0) + count
+        return result
+
+    def tree(self, threshold=1.0):
+        """Return the call tree of the samples as text.
+
+        Each line shows the share of the samples spent in a function when
+        called from its parents.  Branches with less than threshold percent
+        of the samples are left out.
+        """
+        root = [0, {}]
+        for stack, count in self.samples.iteritems():
+            root[0] += count
+            node = root
+            for filename, lineno, name in stack:
+                node = node[1].setdefault((filename, name), [0, {}])
+                node[0] += count
+        total = float(root[0]) or 1.0
+        out = []
+
+        def walk(node, depth):
+            children = sorted(node[1].items(), key=lambda i: -abs(i[1][0]))
+            for (filename, name), child in children:
+                pct = 100.0*child[0]/total
+                if abs(pct) < threshold:
+                    continue
+                out.append('%6.1f%%  %s%s (%s)' % (pct, '  '*depth, name,
+                                                  os.path.basename(filename)))
+                walk(child, depth+1)
+        walk(root, 0)
+        return '\n'.join(out)
+
+    def collapsed(self):
+        """Return the stacks in the 'collapsed' format of flame graph tools."""
+        out = []
+        for stack, count in sorted(self.samples.iteritems()):
+            frames = ';'.join('%s (%s:%i)' % (name, os.path.basename(filename),
+                                              lineno)
+                              for filename, lineno, name in stack)
+            out.append('%s %s' % (frames, count))
+        return '\n'.join(out)
+
+    def report(self, limit=30):
+        """Return a text report of the functions and lines seen most often."""
+        total = self.total
+        pct = lambda n: (100.0*n/total) if total else 0.0
+        out = ['%s samples, one every %g ms' % (total, 1000*self.interval), '',
+               '%8s %8s  %s' % ('Self %', 'Total %', 'Function'),
+               '='*62]
+        funcs = sorted(self.functions().items(), key=lambda i: -abs(i[1][0]))
+        for (filename, name), (nself, ntotal) in funcs[:limit]:
+            out.append('%8.1f %8.1f  %s (%s)' % (pct(nself), pct(ntotal),
+                                                 name, filename))
+        out.extend(['', '%8s  %s' % ('Self %', 'Line'), '='*62])
+        lines = sorted(self.lines().items(), key=lambda i: -abs(i[1]))
+        for (filename, lineno, name), n in lines[:limit]:
+            text = linecache.getline(filename, lineno).strip()
+            out.append('%8.1f  %s:%i (%s) %s' % (pct(n),
+                       os.path.basename(filename), lineno, name, text))
+        return '\n'.join(out)
+
+#-----------------------------------------------------------------------------
+# Profilers
+#-----------------------------------------------------------------------------
+
+
+class LineProfiler(object):
+    """Time each line of some functions.
+
+    Functions are given as function or method objects, or as names, which
+    match any function with that name (useful for code that is not defined
+    yet, as with ``%run -p``)::
+
+        lp = LineProfiler([f, 'g'])
+        lp.runctx('f(10)', globals(), locals())
+        print lp.get_stats().report()
+    """
+
+    def __init__(self, functions=()):
+        self.codes = {}
+        self.names = set()
+        self._last = {}
+        for f in functions:
+            self.add_function(f)
+
+    def add_function(self, f):
+        """Trace the function f, or any function named f if it is a string."""
+        if isinstance(f, basestring):
+            self.names.add(f)
+            return
+        code = getattr(getattr(f, 'im_func', f), 'func_code', None)
+        if code is None:
+            raise TypeError('cannot trace the lines of %r' % f)
+        self.codes.setdefault(code, {})
+
+    def _trace(self, frame, event, arg):
+        if event == 'call':
+            code = frame.f_code
+            if code in self.codes or code.co_name in self.names:
+                self.codes.setdefault(code, {})
+                self._last[frame] = None
+                return self._trace_lines
+        return None
+
+    def _trace_lines(self, frame, event, arg):
+        now = default_timer()
+        if event == 'line' or event == 'return':
+            lines = self.codes[frame.f_code]
+            last = self._last.get(frame)
+            if last is not None:
+                lines[last[0]][1] += now - last[1]
+            if event == 'line':
+                lineno = frame.f_lineno
+                lines.setdefault(lineno, [0, 0.0])[0] += 1
+                self._last[frame] = (lineno, default_timer())
+            else:
+                self._last.pop(frame, None)
+        return self._trace_lines
+
+    def enable(self):
+        sys.settrace(self._trace)
+
+    def disable(self):
+        sys.settrace(None)
+        self._last.clear()
+
+    def runctx(self, cmd, globals, locals):
+        """Run cmd, a string, in the given namespaces while tracing."""
+        self.enable()
+        try:
+            exec cmd in globals, locals
+        finally:
+            self.disable()
+        return self
+
+    def get_stats(self):
+        """Return a LineStats with the timings gathered so far."""
+        timings = {}
+        for code, lines in self.codes.iteritems():
+            key = (code.co_filename, code.co_firstlineno, code.co_name)
+            timings[key] = dict((l, list(t)) for l, t in lines.iteritems())
+        return LineStats(timings)
+
+
+class SamplingProfiler(object):
+    """Record the stack of a thread every `interval` seconds.
+
+    The sampling is done from a daemon thread, so the profiled code runs
+    unmodified.  By default the thread calling :meth:`start` (or
+    :meth:`runctx`) is sampled.  As the sampler needs the GIL, code that
+    holds it for long stretches (a long running C function) is seen in
+    fewer, longer samples.
+
+    If `root` is a code object, only what runs below a frame executing it is
+    recorded, and samples taken outside of such a frame are dropped.
+    """
+
+    def __init__(self, interval=0.001, root=None):
+        self.interval = interval
+        self.root = root
+        self.samples = {}
+        self.thread_id = None
+        self._base = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self, thread_id=None):
+        """Start sampling thread_id, the calling thread by default."""
+        self.thread_id = thread.get_ident() if thread_id is None else thread_id
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._run)
+        self._sampler.daemon = True
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
+
+    def _run(self):
+        while not self._stop.isSet():
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.sample(frame)
+            del frame
+
+    def sample(self, frame):
+        """Record the stack that ends with frame."""
+        stack = []
+        code = None
+        while frame is not None and frame is not self._base:
+            if frame.f_code is self.root:
+                break
+            code = frame.f_code
+            stack.append((code.co_filename, frame.f_lineno, code.co_name))
+            frame = frame.f_back
+        else:
+            if self.root is not None:
+                return
+        if not stack:
+            return
+        if code in (self.start.im_func.func_code, self.stop.im_func.func_code):
+            # Caught runctx starting or stopping the sampler.
+            return
+        stack = tuple(reversed(stack))
+        self.samples[stack] = self.samples.get(stack, 0) + 1
+
+    def runctx(self, cmd, globals, locals):
+        """Run cmd, a string, in the given namespaces while sampling."""
+        # Frames from here up are not part of the profiled code.
+        self._base = sys._getframe()
+        self.start()
+        try:
+            exec cmd in globals, locals
+        finally:
+            self.stop()
+            self._base = None
+        return self
+
+    def get_stats(self):
+        """Return a SampleStats with the samples gathered so far."""
+        return SampleStats(dict(self.samples), self.interval)
@@ -20,6 +20,8 @@ Authors
 #-----------------------------------------------------------------------------
 
 from cStringIO import StringIO
+from hashlib import md5
+from weakref import WeakKeyDictionary
 
 from IPython.utils.decorators import flag_calls
 
@@ -91,6 +93,120 @@ def figure_to_svg(fig):
     return svg
 
 
+def figure_to_png(fig, dpi=72):
+    """Convert a figure to png data for inline display."""
+    fc = fig.get_facecolor()
+    ec = fig.get_edgecolor()
+    fig.set_facecolor('white')
+    fig.set_edgecolor('white')
+    try:
+        string_io = StringIO()
+        fig.canvas.print_figure(string_io, format='png', dpi=dpi)
+        png = string_io.getvalue()
+    finally:
+        fig.set_facecolor(fc)
+        fig.set_edgecolor(ec)
+    return png
+
+
+def figure_complexity(fig):
+    """Estimate the number of elements a vector rendering of fig contains.
+
+    Data points of lines, paths and offsets of collections (as made by
+    scatter), patches and texts are counted.  This is cheap compared to
+    rendering the figure.
+    """
+    n = 0
+    for ax in fig.get_axes():
+        for line in ax.get_lines():
+            n += len(line.get_xydata())
+        for collection in ax.collections:
+            n += max(len(collection.get_offsets()),
+                     len(collection.get_paths()))
+        n += len(ax.patches) + len(ax.texts)
+    return n
+
+
+def select_figure_format(fig, fmt='auto', raster_threshold=10000):
+    """Return the format to render fig in for inline display.
+
+    fmt is 'svg', 'png' or 'auto'.  With 'auto', figures whose
+    :func:`figure_complexity` is above raster_threshold are rendered as PNG,
+    as the SVG documents for them would be huge and slow to render, and the
+    others as SVG.
+    """
+    if fmt == 'auto':
+        if figure_complexity(fig) > raster_threshold:
+            return 'png'
+        return 'svg'
+    if fmt not in ('svg', 'png'):
+        raise ValueError("figure_format must be 'svg', 'png' or 'auto', "
+                         "not %r" % fmt)
+    return fmt
+
+
+def figure_key(fig):
+    """Return a digest of the state of a figure, without rendering it.
+
+    The key is made of the stale flag of the figure, its size and the
+    strings of ``fig.texts``, and for each axes the view limits, the strings
+    of ``ax.texts``, the number of patches and images and the data of the
+    lines and collections.  Titles, labels, legends, colors and most other
+    properties are left out: they are only seen through the stale flag, so
+    the key is only meaningful for the matplotlib versions which have one.
+    """
+    import numpy
+    h = md5()
+    def add(*values):
+        h.update(repr(values))
+    add(getattr(fig, 'stale', False), tuple(fig.get_size_inches()),
+        [text.get_text() for text in fig.texts])
+    for ax in fig.get_axes():
+        add(tuple(ax.get_xlim()), tuple(ax.get_ylim()),
+            [text.get_text() for text in ax.texts],
+            len(ax.patches), len(ax.images))
+        for line in ax.get_lines():
+            add('line', line.get_visible())
+            h.update(numpy.asarray(line.get_xydata()).tostring())
+        for collection in ax.collections:
+            add('collection', collection.get_visible())
+            h.update(numpy.asarray(collection.get_offsets()).tostring())
+    return h.digest()
+
+
+class SentFigures(object):
+    """Remember what was sent for each figure, to avoid sending it again.
+
+    Rendering a figure is expensive, so with the matplotlib versions which
+    flag the figures changed since they were drawn as stale, :meth:`changed`
+    first compares the cheap :func:`figure_key` with the one taken when the
+    figure was last sent.  Without that flag, the key can't tell all the
+    changes, so figures are always rendered again.  :meth:`update` then
+    tells whether the image differs from the one sent.
+    """
+
+    def __init__(self):
+        # Figure -> (key, digest of the image) when it was last sent.
+        self._sent = WeakKeyDictionary()
+
+    def changed(self, fig):
+        """Return whether fig may have changed since it was last sent."""
+        if not hasattr(fig, 'stale'):
+            return True
+        sent = self._sent.get(fig)
+        return sent is None or sent[0] != figure_key(fig)
+
+    def update(self, fig, data):
+        """Record that fig is rendered to data.
+
+        Returns whether data differs from the image last sent for fig.
+        """
+        digest = md5(data).digest()
+        sent = self._sent.get(fig)
+        self._sent[fig] = (figure_key(fig), digest)
+        return sent is None or sent[1] != digest
+
+
 # We need a little factory function here to create the closure where
 # safe_execfile can live.
 def mpl_runner(safe_execfile):
@@ -214,9 +330,22 @@ def import_pylab(user_ns, backend, import_all=True, shell=None):
         # function that will pick up the results for display.  This can only be
         # done with access to the real shell object.
         if backend == backends['inline']:
-            from IPython.zmq.pylab.backend_inline import flush_svg
+            from IPython.zmq.pylab import backend_inline
             from matplotlib import pyplot
-            shell.register_post_execute(flush_svg)
+            shell.register_post_execute(backend_inline.flush_figures)
+            # Figures are sent as SVG, or as PNG if there are too many
+            # elements in them for SVG to be practical.  This is configurable
+            # via Global.pylab_inline_format ('svg', 'png' or 'auto'),
+            # Global.pylab_inline_dpi and
+            # Global.pylab_inline_raster_threshold.
+            g = shell.config.Global
+            backend_inline.figure_format = getattr(g, 'pylab_inline_format',
+                                                   backend_inline.figure_format)
+            backend_inline.dpi = getattr(g, 'pylab_inline_dpi',
+                                         backend_inline.dpi)
+            backend_inline.raster_threshold = getattr(g,
+                'pylab_inline_raster_threshold',
+                backend_inline.raster_threshold)
             # The typical default figure size is too large for inline use,
             # so we shrink the figure size to 6x4, and tweak fonts to
             # make that fit.  This is configurable via Global.pylab_inline_rc,
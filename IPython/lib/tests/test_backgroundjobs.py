@@ -0,0 +1,88 @@
+"""Tests for IPython.lib.backgroundjobs.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2011  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+import os
+import time
+
+import nose.tools as nt
+
+from IPython.lib import backgroundjobs as bg
+from IPython.testing import decorators as dec
+
+#-----------------------------------------------------------------------------
+# Test functions
+#-----------------------------------------------------------------------------
+
+def wait(job, timeout=10):
+    job.join(timeout)
+    nt.assert_false(job.isAlive())
+
+
+def sleeper(interval=0.1):
+    time.sleep(interval)
+    return interval
+
+
+def crasher():
+    raise ValueError('crashed in %s' % os.getpid())
+
+
+def test_thread_job():
+    jobs = bg.BackgroundJobManager()
+    j = jobs.new(sleeper, 0.01)
+    wait(j)
+    nt.assert_equal(j.status, bg.BackgroundJobBase.stat_completed)
+    nt.assert_equal(jobs.result(j.num), 0.01)
+
+
+@dec.skip_win32
+def test_process_job():
+    jobs = bg.BackgroundJobManager()
+    j = jobs.new(os.getpid, process=True)
+    wait(j)
+    nt.assert_equal(j.status, bg.BackgroundJobBase.stat_completed)
+    nt.assert_not_equal(j.result, os.getpid())
+    # Expressions see a copy of the namespace they are given
+    j = jobs.new('x*2', {'x': 21}, process=True)
+    wait(j)
+    nt.assert_equal(j.result, 42)
+
+
+@dec.skip_win32
+def test_process_job_error():
+    jobs = bg.BackgroundJobManager()
+    j = jobs.new(crasher, process=True)
+    wait(j)
+    nt.assert_equal(j.stat_code, bg.BackgroundJobBase.stat_dead_c)
+    # The traceback comes from the job's process
+    nt.assert_true('ValueError' in j._tb)
+    nt.assert_true('crashed in' in j._tb)
+    nt.assert_false(('crashed in %s' % os.getpid()) in j._tb)
+
+
+@dec.skip_win32
+def test_process_job_kill():
+    jobs = bg.BackgroundJobManager(processes=1)
+    j1 = jobs.new(sleeper, 30, process=True)
+    j2 = jobs.new(sleeper, 30, process=True)
+    # j2 waits for j1 to finish
+    jobs.kill(j2.num)
+    t = time.time()
+    while j1.process is None and time.time() - t < 10:
+        time.sleep(0.01)
+    jobs.kill(j1.num)
+    wait(j1)
+    wait(j2)
+    nt.assert_true(time.time() - t < 10)
+    for j in (j1, j2):
+        nt.assert_equal(j.stat_code, bg.BackgroundJobBase.stat_dead_c)
+    nt.assert_true(j2.process is None)
@@ -0,0 +1,137 @@
+"""Tests for the line and sampling profilers.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+# stdlib
+import os
+import tempfile
+import time
+
+# third party
+import nose.tools as nt
+
+# our own
+from IPython.lib.profiling import (LineProfiler, SamplingProfiler,
+                                   LineStats, SampleStats, load_stats)
+
+#-----------------------------------------------------------------------------
+# Test functions
+#-----------------------------------------------------------------------------
+
+def loop(n):
+    s = 0
+    for i in range(n):
+        s += i
+    return s
+
+
+def busy(t):
+    end = time.time() + t
+    while time.time() < end:
+        pass
+
+
+def test_line_profiler():
+    lp = LineProfiler([loop])
+    lp.runctx('loop(10); busy(0.001)', globals(), {})
+    stats = lp.get_stats()
+    key = (loop.func_code.co_filename, loop.func_code.co_firstlineno, 'loop')
+    nt.assert_equal(stats.timings.keys(), [key])
+    first = loop.func_code.co_firstlineno
+    hits = dict((l-first, t[0]) for l, t in stats.timings[key].items())
+    nt.assert_equal(hits, {1: 1, 2: 11, 3: 10, 4: 1})
+    report = stats.report()
+    nt.assert_true('Function: loop at line %i' % first in report)
+    nt.assert_true('s += i' in report)
+
+
+def test_line_profiler_by_name():
+    lp = LineProfiler(['busy'])
+    lp.runctx('busy(0.001)', globals(), {})
+    names = [key[2] for key in lp.get_stats().timings]
+    nt.assert_equal(names, ['busy'])
+
+
+def test_line_profiler_rejects_objects():
+    nt.assert_raises(TypeError, LineProfiler().add_function, 1)
+
+
+def test_line_stats_diff():
+    key = ('f.py', 1, 'f')
+    a = LineStats({key: {2: [3, 0.5], 3: [1, 0.1]}})
+    b = LineStats({key: {2: [1, 0.25]}})
+    d = a.diff(b)
+    nt.assert_equal(d.timings[key], {2: [2, 0.25], 3: [1, 0.1]})
+
+
+def test_sampling_profiler():
+    sp = SamplingProfiler(0.001)
+    sp.runctx('busy(0.1)', globals(), {})
+    stats = sp.get_stats()
+    nt.assert_true(stats.total > 10)
+    funcs = stats.functions()
+    key = (busy.func_code.co_filename, 'busy')
+    nt.assert_true(funcs[key][1] > 0.8*stats.total)
+    # The profiler's own frames are not recorded.
+    for stack in stats.samples:
+        nt.assert_equal(stack[0][2], '<module>')
+    nt.assert_true('busy' in stats.report())
+
+
+def test_sample_stats_diff():
+    s1 = ('f.py', 1, 'f'), ('f.py', 2, 'g')
+    s2 = ('f.py', 1, 'f'), ('f.py', 3, 'h')
+    a = SampleStats({s1: 30, s2: 10})
+    b = SampleStats({s1: 10, s2: 10})
+    d = a.diff(b)
+    nt.assert_equal(d.samples, {s1: 10.0, s2: -10.0})
+    nt.assert_equal(d.collapsed().splitlines()[0], 'f (f.py:1);g (f.py:2) 10.0')
+
+
+def test_sample_stats_tree():
+    s1 = ('f.py', 1, 'f'), ('f.py', 2, 'g')
+    s2 = ('f.py', 1, 'f'), ('f.py', 3, 'h')
+    s3 = ('f.py', 1, 'f'), ('f.py', 4, 'g')
+    stats = SampleStats({s1: 6, s2: 3, s3: 2})
+    lines = stats.tree(threshold=20).splitlines()
+    nt.assert_equal(lines, [' 100.0%  f (f.py)',
+                            '  72.7%    g (f.py)',
+                            '  27.3%    h (f.py)'])
+    nt.assert_equal(len(stats.tree(threshold=50).splitlines()), 2)
+
+
+def test_sampling_profiler_root():
+    def outer():
+        busy(0.05)
+    sp = SamplingProfiler(0.001, root=outer.func_code)
+    sp.runctx('busy(0.02); outer()', globals(), dict(outer=outer))
+    stats = sp.get_stats()
+    nt.assert_true(stats.total > 5)
+    for stack in stats.samples:
+        nt.assert_equal([frame[2] for frame in stack], ['busy'])
+
+
+def test_save_load():
+    fd, fname = tempfile.mkstemp('.json')
+    os.close(fd)
+    try:
+        key = ('f.py', 1, 'f')
+        stats = LineStats({key: {2: [3, 0.5]}})
+        stats.save(fname)
+        nt.assert_equal(load_stats(fname).timings, stats.timings)
+        stack = (('f.py', 1, 'f'), ('f.py', 2, 'g'))
+        stats = SampleStats({stack: 4}, 0.01)
+        stats.save(fname)
+        loaded = load_stats(fname)
+        nt.assert_equal(loaded.samples, stats.samples)
+        nt.assert_equal(loaded.interval, 0.01)
+    finally:
+        os.remove(fname)
@@ -0,0 +1,158 @@
+"""Tests for the pylab support utilities, with stand-ins for the figures.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+# third party
+import nose.tools as nt
+
+# our own
+from IPython.lib.pylabtools import (figure_complexity, select_figure_format,
+                                    SentFigures)
+from IPython.testing import decorators as dec
+
+#-----------------------------------------------------------------------------
+# Figure stand-ins, with just what the functions tested use
+#-----------------------------------------------------------------------------
+
+class Text(object):
+    def __init__(self, text):
+        self.text = text
+
+    def get_text(self):
+        return self.text
+
+
+class Line(object):
+    def __init__(self, n):
+        self.xydata = [(i, i) for i in range(n)]
+
+    def get_xydata(self):
+        return self.xydata
+
+    def get_visible(self):
+        return True
+
+
+class Collection(object):
+    def __init__(self, n, npaths=1):
+        self.offsets = [(i, i) for i in range(n)]
+        self.paths = [None]*npaths
+
+    def get_offsets(self):
+        return self.offsets
+
+    def get_paths(self):
+        return self.paths
+
+    def get_visible(self):
+        return True
+
+
+class Axes(object):
+    def __init__(self, lines=(), collections=(), npatches=0, texts=()):
+        self.lines = list(lines)
+        self.collections = list(collections)
+        self.patches = [None]*npatches
+        self.texts = [Text(t) for t in texts]
+        self.images = []
+        self.xlim = (0, 1)
+        self.title = ''
+
+    def get_lines(self):
+        return self.lines
+
+    def get_xlim(self):
+        return self.xlim
+
+    def get_ylim(self):
+        return (0, 1)
+
+
+class Figure(object):
+    def __init__(self, *axes):
+        self.axes = list(axes)
+        self.texts = []
+
+    def get_axes(self):
+        return self.axes
+
+    def get_size_inches(self):
+        return (8, 6)
+
+
+class StaleFigure(Figure):
+    """A figure of the matplotlib versions flagging the changed figures."""
+
+    stale = False
+
+#-----------------------------------------------------------------------------
+# Test functions
+#-----------------------------------------------------------------------------
+
+def test_figure_complexity():
+    fig = Figure(Axes(lines=[Line(10), Line(5)], npatches=3, texts=['a']),
+                 Axes(collections=[Collection(100), Collection(2, 7)]))
+    nt.assert_equal(figure_complexity(fig), 10 + 5 + 3 + 1 + 100 + 7)
+    nt.assert_equal(figure_complexity(Figure()), 0)
+
+
+def test_select_figure_format():
+    small = Figure(Axes(lines=[Line(10)]))
+    big = Figure(Axes(collections=[Collection(50)]))
+    nt.assert_equal(select_figure_format(small, 'auto', 20), 'svg')
+    nt.assert_equal(select_figure_format(big, 'auto', 20), 'png')
+    # An explicit format is used whatever the figure.
+    nt.assert_equal(select_figure_format(big, 'svg', 20), 'svg')
+    nt.assert_equal(select_figure_format(small, 'png', 20), 'png')
+    nt.assert_raises(ValueError, select_figure_format, small, 'pdf')
+
+
+@dec.skipif_not_numpy
+def test_sent_figures():
+    sent = SentFigures()
+    ax = Axes(lines=[Line(10)])
+    fig = StaleFigure(ax)
+    nt.assert_true(sent.changed(fig))
+    nt.assert_true(sent.update(fig, 'image'))
+    # Nothing was drawn since, no need to render the figure again.
+    nt.assert_false(sent.changed(fig))
+    # A new line changes the key, but the image may turn out the same.
+    ax.lines.append(Line(3))
+    nt.assert_true(sent.changed(fig))
+    nt.assert_false(sent.update(fig, 'image'))
+    nt.assert_false(sent.changed(fig))
+    # So do new data and new view limits.
+    ax.lines[0].xydata[0] = (1, 2)
+    nt.assert_true(sent.changed(fig))
+    nt.assert_true(sent.update(fig, 'other image'))
+    ax.xlim = (0, 2)
+    nt.assert_true(sent.changed(fig))
+    sent.update(fig, 'other image')
+    # Other changes are seen through the stale flag.
+    fig.stale = True
+    nt.assert_true(sent.changed(fig))
+    # Other figures are tracked on their own.
+    nt.assert_true(sent.changed(StaleFigure(Axes(lines=[Line(10)]))))
+
+
+@dec.skipif_not_numpy
+def test_sent_figures_without_stale():
+    # The key can't tell a new title, so figures are always rendered again,
+    # and only the image tells whether they changed.
+    sent = SentFigures()
+    ax = Axes(lines=[Line(10)])
+    fig = Figure(ax)
+    nt.assert_true(sent.update(fig, 'image'))
+    nt.assert_true(sent.changed(fig))
+    nt.assert_false(sent.update(fig, 'image'))
+    ax.title = 'title'
+    nt.assert_true(sent.changed(fig))
+    nt.assert_true(sent.update(fig, 'image with a title'))
@@ -9,6 +9,10 @@ same database.
 
 Concurrency is possible because the values are stored in separate files. Hence
 the "database" is a directory where *all* files are governed by PickleShare.
+Values are written to a temporary file that is then renamed over the old one,
+so readers never see a partially written value, and the read-modify-write of
+hset() is done under a lock file (where fcntl is available), so several
+processes can hset() into the same category.
 
 Example usage::
     
@@ -34,71 +38,171 @@ License: MIT open source license.
 """
 
 from IPython.external.path import path as Path
-import os,stat,time
+import os,time
 import cPickle as pickle
 import UserDict
 import glob
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 def gethashfile(key):
     return ("%02x" % abs(hash(key) % 256))[-2:]
 
 _sentinel = object()
 
+# Names of the files PickleShare keeps for itself in the db directory
+_private_prefix = '.pickleshare'
+_lock_name = _private_prefix + '.lock'
+
+def _signature(fil):
+    """ What tells us a file changed: with rename-on-write, a new inode """
+    st = os.stat(fil)
+    return (st.st_ino, st.st_mtime, st.st_size)
+
 class PickleShareDB(UserDict.DictMixin):
     """ The main 'connection' object for PickleShare database """
-    def __init__(self,root):
-        """ Return a db object that will manage the specied directory"""
+    def __init__(self,root, check_mtime=True):
+        """ Return a db object that will manage the specied directory
+
+        If check_mtime is False, values in the cache are returned without
+        looking at the file first. This avoids a stat() per access, but
+        only sees changes made by other processes after uncache().
+        """
         self.root = Path(root).expanduser().abspath()
         if not self.root.isdir():
             self.root.makedirs()
-        # cache has { 'key' : (obj, orig_mod_time) }
+        self.check_mtime = check_mtime
+        # cache has { 'key' : (obj, file signature) }
         self.cache = {}
-        
+        # serializes hset() between the threads of this process, the lock
+        # file does it between processes
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
 
-    def __getitem__(self,key):
-        """ db['key'] reading """
-        fil = self.root / key
+    def _read(self, fil, check_mtime=True):
+        if not check_mtime and fil in self.cache:
+            return self.cache[fil][0]
         try:
-            mtime = (fil.stat()[stat.ST_MTIME])
+            sig = _signature(fil)
         except OSError:
-            raise KeyError(key)
+            raise KeyError(fil)
 
-        if fil in self.cache and mtime == self.cache[fil][1]:
+        if fil in self.cache and sig == self.cache[fil][1]:
             return self.cache[fil][0]
         try:
             # The cached item has expired, need to read
-            obj = pickle.load(fil.open())
+            f = open(fil, 'rb')
+            try:
+                obj = pickle.load(f)
+            finally:
+                f.close()
         except:
-            raise KeyError(key)
-            
-        self.cache[fil] = (obj,mtime)
+            raise KeyError(fil)
+
+        self.cache[fil] = (obj,sig)
         return obj
-    
+
+    def __getitem__(self,key):
+        """ db['key'] reading """
+        try:
+            return self._read(self.root / key, self.check_mtime)
+        except KeyError:
+            raise KeyError(key)
+
     def __setitem__(self,key,value):
         """ db['key'] = 5 """
         fil = self.root / key
         parent = fil.parent
         if parent and not parent.isdir():
             parent.makedirs()
-        pickled = pickle.dump(value,fil.open('w'))
+        # Write to a temporary file and rename it over the old one, so that
+        # readers see either the old or the new value, never a torn file.
+        fd, tmpname = tempfile.mkstemp(
+            prefix=_private_prefix + '-' + fil.basename() + '-', dir=parent)
+        try:
+            f = os.fdopen(fd, 'wb')
+            try:
+                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+            finally:
+                f.close()
+            if os.name == 'nt' and os.path.exists(fil):
+                # no atomic replace on windows
+                os.remove(fil)
+            os.rename(tmpname, fil)
+        except:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+            raise
         try:
-            self.cache[fil] = (value,fil.mtime)
+            self.cache[fil] = (value,_signature(fil))
         except OSError,e:
             if e.errno != 2:
                 raise
-    
+
+    def lock(self):
+        """ Acquire the db lock, shared with other processes
+
+        Locks nest and must be released with unlock(). Cross-process locking
+        needs fcntl, so on windows this only locks out the other threads of
+        this process.
+        """
+        self._lock.acquire()
+        self._lock_depth += 1
+        if self._lock_depth == 1 and fcntl is not None:
+            try:
+                self._lock_file = open(self.root / _lock_name, 'a')
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            except:
+                self.unlock()
+                raise
+
+    def unlock(self):
+        """ Release the lock acquired by lock() """
+        self._lock_depth -= 1
+        if self._lock_depth == 0 and self._lock_file is not None:
+            # closing the file releases the flock
+            self._lock_file.close()
+            self._lock_file = None
+        self._lock.release()
+
     def hset(self, hashroot, key, value):
         """ hashed set """
+        self.hset_many(hashroot, {key: value})
+
+    def hset_many(self, hashroot, items):
+        """ hashed set of all key, value pairs in dict 'items'
+
+        The items are grouped by bucket file, so each bucket is read and
+        written once, under the db lock.
+        """
         hroot = self.root / hashroot
         if not hroot.isdir():
             hroot.makedirs()
-        hfile = hroot / gethashfile(key)
-        d = self.get(hfile, {})
-        d.update( {key : value})
-        self[hfile] = d                
+        buckets = {}
+        for key, value in items.iteritems():
+            buckets.setdefault(gethashfile(key), {})[key] = value
+        self.lock()
+        try:
+            for bucket, bitems in buckets.iteritems():
+                hfile = hroot / bucket
+                try:
+                    # always look at the file, another process may have
+                    # changed it
+                    d = self._read(hfile)
+                except KeyError:
+                    d = {}
+                d = dict(d)
+                d.update(bitems)
+                self[hfile] = d
+        finally:
+            self.unlock()
 
-    
-    
     def hget(self, hashroot, key, default = _sentinel, fast_only = True):
         """ hashed get """
         hroot = self.root / hashroot
@@ -134,7 +238,7 @@ class PickleShareDB(UserDict.DictMixin):
             try:
                 all.update(self[f])
             except KeyError:
-                print "Corrupt",f,"deleted - hset is not threadsafe!"
+                print "Corrupt",f,"deleted"
                 del self[f]
                 
             self.uncache(f)
@@ -148,19 +252,23 @@ class PickleShareDB(UserDict.DictMixin):
         hset before hcompress).
         
         """
-        hfiles = self.keys(hashroot + "/*")
-        all = {}
-        for f in hfiles:
-            # print "using",f
-            all.update(self[f])
-            self.uncache(f)
-            
-        self[hashroot + '/xx'] = all
-        for f in hfiles:
-            p = self.root / f
-            if p.basename() == 'xx':
-                continue
-            p.remove()
+        self.lock()
+        try:
+            hfiles = self.keys(hashroot + "/*")
+            all = {}
+            for f in hfiles:
+                # print "using",f
+                all.update(self[f])
+                self.uncache(f)
+
+            self[hashroot + '/xx'] = all
+            for f in hfiles:
+                p = self.root / f
+                if p.basename() == 'xx':
+                    continue
+                p.remove()
+        finally:
+            self.unlock()
             
             
         
@@ -186,7 +294,8 @@ class PickleShareDB(UserDict.DictMixin):
             files = self.root.walkfiles()
         else:
             files = [Path(p) for p in glob.glob(self.root/globpat)]
-        return [self._normalized(p) for p in files if p.isfile()]
+        return [self._normalized(p) for p in files if p.isfile() and
+                not p.basename().startswith(_private_prefix)]
 
     def uncache(self,*items):
         """ Removes all, or specified items from cache
@@ -199,7 +308,7 @@ class PickleShareDB(UserDict.DictMixin):
         if not items:
             self.cache = {}
         for it in items:
-            self.cache.pop(it,None)
+            self.cache.pop(self.root / it,None)
             
     def waitget(self,key, maxwaittime = 60 ):
         """ Wait (poll) for a key to get a value
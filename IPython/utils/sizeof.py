@@ -0,0 +1,135 @@
+# encoding: utf-8
+"""
+Estimate the memory used by Python objects.
+
+:func:`estimate_size` follows the references of containers, like
+:func:`sys.getsizeof` does for a single object, but it visits a bounded number
+of objects and samples large containers, so it stays fast for huge data
+structures.  It is used by ``%whos`` and by the variable summaries sent to
+frontends.
+"""
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2008-2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+import sys
+import types
+from collections import deque
+from itertools import islice
+
+#-----------------------------------------------------------------------------
+# Code
+#-----------------------------------------------------------------------------
+
+# Objects whose references are not followed: they belong to the program
+# rather than to the data.
+_opaque_types = (type, types.ClassType, types.ModuleType, types.FunctionType,
+                 types.BuiltinFunctionType, types.MethodType, types.CodeType,
+                 types.FrameType)
+
+
+def _children(obj, sample):
+    """Return (children, weight) for obj.
+
+    At most sample children are returned; weight is the number of children
+    each of them stands for.
+    """
+    if isinstance(obj, dict):
+        n = len(obj)
+        if n <= sample:
+            items = obj.iteritems()
+        else:
+            items = islice(obj.iteritems(), sample)
+        children = [x for item in items for x in item]
+        return children, (float(n)/sample if n > sample else 1.0)
+    if isinstance(obj, (list, tuple)):
+        n = len(obj)
+        if n <= sample:
+            return obj, 1.0
+        # Evenly spaced items, indexing is cheap.
+        step = float(n)/sample
+        return [obj[int(i*step)] for i in xrange(sample)], step
+    if isinstance(obj, (set, frozenset, deque)):
+        n = len(obj)
+        if n <= sample:
+            return obj, 1.0
+        return list(islice(obj, sample)), float(n)/sample
+    if isinstance(obj, _opaque_types):
+        return (), 1.0
+    d = getattr(obj, '__dict__', None)
+    if isinstance(d, dict):
+        return [d], 1.0
+    return (), 1.0
+
+
+def _own_size(obj, numpy):
+    size = sys.getsizeof(obj, 0)
+    if numpy is not None and isinstance(obj, numpy.ndarray) and \
+            obj.flags.owndata and size < obj.nbytes:
+        # Older numpy versions don't count the data in getsizeof().
+        size += obj.nbytes
+    return size
+
+
+def estimate_size(obj, budget=10000, sample=100):
+    """Estimate the memory used by obj and the objects it refers to, in bytes.
+
+    The items of dicts, lists, tuples, sets and deques and the attributes of
+    instances are followed, each object being counted once.  Modules,
+    classes and functions are counted without what they refer to.
+
+    Parameters
+    ----------
+    obj : object
+        The object to measure.
+    budget : int
+        The maximum number of objects to visit.  What is left when it runs
+        out is not counted.
+    sample : int
+        Containers with more than this many items are measured on sample of
+        their items and the result is scaled to the size of the container.
+
+    Returns
+    -------
+    (size, exact) : (int, bool)
+        exact is False if the size was extrapolated from a sample or the
+        budget ran out.
+    """
+    # numpy is only needed if arrays can exist, that is once it's imported.
+    numpy = sys.modules.get('numpy')
+    seen = set()
+    todo = [(obj, 1.0)]
+    total = 0.0
+    exact = True
+    while todo:
+        if budget <= 0:
+            exact = False
+            break
+        o, weight = todo.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        budget -= 1
+        total += weight*_own_size(o, numpy)
+        children, child_weight = _children(o, sample)
+        if child_weight != 1.0:
+            exact = False
+        todo.extend((c, weight*child_weight) for c in children)
+    return int(total), exact
+
+
+def format_bytes(n):
+    """Format a number of bytes with a B/kB/MB/GB unit."""
+    for unit in ['B', 'kB', 'MB']:
+        if abs(n) < 1024:
+            return '%i %s' % (n, unit)
+        n /= 1024.0
+    return '%.1f GB' % n
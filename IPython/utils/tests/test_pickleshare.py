@@ -0,0 +1,99 @@
+"""Tests for the PickleShare database.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+# stdlib
+import os
+import shutil
+import tempfile
+
+# third party
+import nose.tools as nt
+
+# our own
+from IPython.utils.pickleshare import PickleShareDB
+
+#-----------------------------------------------------------------------------
+# Test functions
+#-----------------------------------------------------------------------------
+
+def setup():
+    global TMPDIR
+    TMPDIR = tempfile.mkdtemp()
+
+
+def teardown():
+    shutil.rmtree(TMPDIR)
+
+
+def test_set_get():
+    db = PickleShareDB(os.path.join(TMPDIR, 'setget'))
+    db['hello'] = 15
+    db['paths/are/ok/key'] = [1,(5,46)]
+    nt.assert_equal(db['hello'], 15)
+    nt.assert_equal(db['paths/are/ok/key'], [1,(5,46)])
+    nt.assert_equal(sorted(db.keys()), ['hello', 'paths/are/ok/key'])
+    del db['hello']
+    nt.assert_raises(KeyError, db.__getitem__, 'hello')
+
+
+def test_binary_atomic_write():
+    root = os.path.join(TMPDIR, 'binary')
+    db = PickleShareDB(root)
+    db['x'] = range(10)
+    with open(os.path.join(root, 'x'), 'rb') as f:
+        data = f.read()
+    # highest protocol pickles start with the PROTO opcode
+    nt.assert_equal(data[:1], '\x80')
+    # no temporary files are left behind
+    nt.assert_equal(os.listdir(root), ['x'])
+
+
+def test_other_process_changes():
+    root = os.path.join(TMPDIR, 'changes')
+    db1 = PickleShareDB(root)
+    db2 = PickleShareDB(root)
+    db1['a'] = 1
+    nt.assert_equal(db2['a'], 1)
+    # within the same second as the first write
+    db1['a'] = 2
+    nt.assert_equal(db2['a'], 2)
+
+
+def test_check_mtime_off():
+    root = os.path.join(TMPDIR, 'nostat')
+    db1 = PickleShareDB(root)
+    db2 = PickleShareDB(root, check_mtime=False)
+    db1['a'] = 1
+    nt.assert_equal(db2['a'], 1)
+    db1['a'] = 2
+    # served from the cache without looking at the file
+    nt.assert_equal(db2['a'], 1)
+    db2.uncache('a')
+    nt.assert_equal(db2['a'], 2)
+
+
+def test_hset():
+    root = os.path.join(TMPDIR, 'hash')
+    db1 = PickleShareDB(root)
+    db2 = PickleShareDB(root)
+    db1.hset('hash', 'aku', 12)
+    db2.hset('hash', 'ankka', 313)
+    db1.hset_many('hash', dict(('k%i' % i, i) for i in range(100)))
+    nt.assert_equal(db1.hget('hash', 'aku'), 12)
+    nt.assert_equal(db1.hget('hash', 'ankka'), 313)
+    d = db2.hdict('hash')
+    nt.assert_equal(len(d), 102)
+    nt.assert_equal(d['k42'], 42)
+    db1.hcompress('hash')
+    nt.assert_equal(db2.hdict('hash'), d)
+    # the lock file is not a key
+    nt.assert_equal(db1.keys(), ['hash/xx'])
@@ -0,0 +1,65 @@
+"""Tests for IPython.utils.sizeof.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+import sys
+
+import nose.tools as nt
+
+from IPython.utils.sizeof import estimate_size, format_bytes
+
+#-----------------------------------------------------------------------------
+# Test functions
+#-----------------------------------------------------------------------------
+
+def test_estimate_size_exact():
+    a = 'a'*100
+    l = [a, a, (1.5, 'b')]
+    expected = sum(sys.getsizeof(x) for x in (l, a, l[2], 1.5, 'b'))
+    nt.assert_equal(estimate_size(l), (expected, True))
+
+
+def test_estimate_size_instance():
+    class C(object):
+        pass
+    c = C()
+    c.data = range(10)
+    size, exact = estimate_size(c)
+    nt.assert_true(exact)
+    nt.assert_true(size > sys.getsizeof(c.data))
+
+
+def test_estimate_size_cycle():
+    l = []
+    l.append(l)
+    nt.assert_equal(estimate_size(l), (sys.getsizeof(l), True))
+
+
+def test_estimate_size_sampled():
+    l = ['%06i' % i for i in xrange(10000)]
+    expected = sys.getsizeof(l) + sum(sys.getsizeof(s) for s in l)
+    size, exact = estimate_size(l, sample=100)
+    nt.assert_false(exact)
+    nt.assert_true(abs(size - expected) < 0.01*expected)
+
+
+def test_estimate_size_budget():
+    l = [[i] for i in xrange(100)]
+    size, exact = estimate_size(l, budget=10, sample=1000)
+    nt.assert_false(exact)
+    nt.assert_true(size < estimate_size(l, sample=1000)[0])
+
+
+def test_format_bytes():
+    nt.assert_equal(format_bytes(12), '12 B')
+    nt.assert_equal(format_bytes(2048), '2 kB')
+    nt.assert_equal(format_bytes(3*1024**2), '3 MB')
+    nt.assert_equal(format_bytes(1.5*1024**3), '1.5 GB')
@@ -0,0 +1,55 @@
+"""Tests for IPython.utils.timing.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+import nose.tools as nt
+
+from IPython.utils.timing import format_time, TimeitResult
+
+#-----------------------------------------------------------------------------
+# Test functions
+#-----------------------------------------------------------------------------
+
+def test_format_time():
+    nt.assert_equal(format_time(2.5), u'2.5 s')
+    nt.assert_equal(format_time(0.0125), u'12.5 ms')
+    nt.assert_equal(format_time(3.2e-6), u'3.2 us')
+    nt.assert_equal(format_time(4e-8, 2), u'40 ns')
+    nt.assert_equal(format_time(0.0), u'0 ns')
+
+
+def test_timeit_result_stats():
+    # Runs of 10 loops, so 1, 2, 3, 4 and 10 ms per loop.
+    res = TimeitResult(10, [0.01, 0.02, 0.03, 0.04, 0.1])
+    nt.assert_equal(res.repeat, 5)
+    nt.assert_almost_equal(res.best, 0.001)
+    nt.assert_almost_equal(res.worst, 0.01)
+    nt.assert_almost_equal(res.mean, 0.004)
+    nt.assert_almost_equal(res.median, 0.003)
+    nt.assert_almost_equal(res.percentile(75), 0.004)
+    nt.assert_almost_equal(res.stdev, 0.0035355339)
+    lo, hi = res.confidence_interval()
+    nt.assert_almost_equal(hi - res.mean, 2.776*0.0035355339/5**0.5)
+    nt.assert_almost_equal(res.mean - lo, hi - res.mean)
+
+
+def test_timeit_result_single_run():
+    res = TimeitResult(1, [0.5])
+    nt.assert_equal(res.stdev, 0.0)
+    nt.assert_equal(res.confidence_interval(), (0.5, 0.5))
+
+
+def test_timeit_result_summary():
+    res = TimeitResult(100, [0.1, 0.2, 0.3])
+    lines = res.summary().splitlines()
+    nt.assert_equal(lines[0], u'100 loops, best of 3: 1 ms per loop')
+    nt.assert_true(lines[1].startswith(u'mean 2 ms +- 1 ms (std. dev.)'))
+    nt.assert_true(repr(res).startswith('<TimeitResult : 2 ms +- 1 ms'))
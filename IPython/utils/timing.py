@@ -14,6 +14,7 @@ Utilities for timing code execution.
 # Imports
 #-----------------------------------------------------------------------------
 
+import math
 import time
 
 #-----------------------------------------------------------------------------
@@ -114,3 +115,115 @@ def timing(func,*args,**kw):
 
     return timings_out(1,func,*args,**kw)[0]
 
+
+
+def format_time(timespan, precision=3):
+    """Format a time span given in seconds with a s/ms/us/ns unit."""
+
+    # XXX: Unfortunately the unicode 'micro' symbol can cause problems in
+    # certain terminals.  Until we figure out a robust way of
+    # auto-detecting if the terminal can deal with it, use plain 'us' for
+    # microseconds.  See bug: https://bugs.launchpad.net/ipython/+bug/348466
+    units = [u"s", u"ms", u'us', u"ns"]
+    scaling = [1, 1e3, 1e6, 1e9]
+
+    if timespan > 0.0 and timespan < 1000.0:
+        order = min(-int(math.floor(math.log10(timespan)) // 3), 3)
+    elif timespan >= 1000.0:
+        order = 0
+    else:
+        order = 3
+    return u"%.*g %s" % (precision, timespan * scaling[order], units[order])
+
+
+# Two sided 95% quantiles of Student's t distribution for 1-10 degrees of
+# freedom.  Above that 1.96 + 2.4/df is within 1% of the exact value.
+_t95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228]
+
+
+class TimeitResult(object):
+    """The timings of a statement collected by %timeit.
+
+    Attributes
+    ----------
+    loops : int
+        The number of loops in each run.
+    repeat : int
+        The number of runs.
+    all_runs : list of floats
+        The total time of each run, in seconds.
+    timings : list of floats
+        The time per loop of each run, in seconds.
+    compile_time : float
+        The time it took to compile the statement.
+    """
+
+    def __init__(self, loops, all_runs, compile_time=0.0, precision=3):
+        self.loops = loops
+        self.all_runs = list(all_runs)
+        self.repeat = len(self.all_runs)
+        self.timings = [t / loops for t in self.all_runs]
+        self.compile_time = compile_time
+        self.precision = precision
+
+    @property
+    def best(self):
+        return min(self.timings)
+
+    @property
+    def worst(self):
+        return max(self.timings)
+
+    @property
+    def mean(self):
+        return math.fsum(self.timings) / self.repeat
+
+    @property
+    def stdev(self):
+        """The sample standard deviation of the time per loop."""
+        if self.repeat < 2:
+            return 0.0
+        mean = self.mean
+        return math.sqrt(math.fsum([(t - mean)**2 for t in self.timings]) /
+                         (self.repeat - 1))
+
+    @property
+    def median(self):
+        return self.percentile(50)
+
+    def percentile(self, p):
+        """The p-th percentile (0-100) of the time per loop."""
+        values = sorted(self.timings)
+        k = (len(values) - 1) * (p / 100.0)
+        lo = int(k)
+        hi = min(lo + 1, len(values) - 1)
+        return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+    def confidence_interval(self):
+        """The 95% confidence interval of the mean time per loop."""
+        df = self.repeat - 1
+        if df < 1:
+            return (self.mean, self.mean)
+        elif df <= len(_t95):
+            t = _t95[df - 1]
+        else:
+            t = 1.96 + 2.4 / df
+        half = t * self.stdev / math.sqrt(self.repeat)
+        return (self.mean - half, self.mean + half)
+
+    def summary(self):
+        """The lines %timeit prints."""
+        fmt = lambda t: format_time(t, self.precision)
+        lines = [u"%d loops, best of %d: %s per loop" %
+                 (self.loops, self.repeat, fmt(self.best))]
+        lines.append(u"mean %s +- %s (std. dev.), median %s, "
+                     "95th percentile %s" % (fmt(self.mean), fmt(self.stdev),
+                     fmt(self.median), fmt(self.percentile(95))))
+        return u'\n'.join(lines)
+
+    def __repr__(self):
+        return str(u"<TimeitResult : %s +- %s per loop (mean +- std. dev. of "
+                   "%d runs, %d loops each)>" % (
+                       format_time(self.mean, self.precision),
+                       format_time(self.stdev, self.precision),
+                       self.repeat, self.loops))
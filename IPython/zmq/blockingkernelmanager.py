@@ -99,6 +99,7 @@ class BlockingRepSocketChannel(RepSocketChannel):
 class BlockingHBSocketChannel(HBSocketChannel):
     # This kernel needs rapid monitoring capabilities
     time_to_dead = 0.2
+    busy_time_to_dead = 0.1
 
     def call_handlers(self, since_last_heartbeat):
         io.rprint('[[Heart]]', since_last_heartbeat) # dbg
@@ -0,0 +1,274 @@
+"""A headless client running code in a kernel, for scripts and batch jobs.
+
+:class:`PipelineClient` sends execute requests without waiting for the reply
+to the previous one: the kernel queues them, so it is never idle waiting for
+the next request, and the throughput is bound by how fast the kernel runs the
+code rather than by the round trips. The replies and the messages the kernel
+publishes are matched to the requests by the msg_id of their parent header,
+and each request gets an :class:`ExecuteFuture`. The number of requests sent
+and not done yet is bounded, so that a script submitting many cells doesn't
+fill the queues of the kernel.
+
+Example::
+
+    km = KernelManager()
+    km.start_kernel()
+    client = PipelineClient(km.xreq_address, km.sub_address,
+                            session=km.session, context=km.context)
+    client.start()
+    futures = [client.execute('x = %i' % i) for i in range(1000)]
+    print futures[-1].result(10)['content']['status']
+    client.stop()
+"""
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2008-2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+# Standard library imports.
+from threading import Condition, Event
+import time
+
+# System library imports.
+import zmq
+from zmq.eventloop.zmqstream import ZMQStream
+from zmq.utils import jsonapi as json
+
+# Local imports.
+from kernelmanager import IOLoopThread, ReplyFuture, RequestTimeout
+from session import Session
+
+#-----------------------------------------------------------------------------
+# Classes
+#-----------------------------------------------------------------------------
+
+class ExecuteFuture(ReplyFuture):
+    """The reply to an execute_request, once the kernel is done with it.
+
+    The future is done when both the reply and the 'idle' status published
+    for the request are received, so that :attr:`outputs` then holds all the
+    messages published for it.  Requests aborted by the kernel, after an
+    error in a previous one, are never run: their future is done as soon as
+    their reply with an 'aborted' status is received.
+    """
+
+    def __init__(self, msg_id):
+        super(ExecuteFuture, self).__init__(msg_id)
+        # The messages published for the request, except the status ones, in
+        # the order they were received.
+        self.outputs = []
+        self._idle = False
+        self._early_reply = None
+
+    @property
+    def stdout(self):
+        """What the code wrote to stdout."""
+        return self._stream('stdout')
+
+    @property
+    def stderr(self):
+        """What the code wrote to stderr."""
+        return self._stream('stderr')
+
+    def _stream(self, name):
+        return ''.join(msg['content']['data'] for msg in self.outputs
+                       if msg['msg_type'] == 'stream' and
+                       msg['content']['name'] == name)
+
+    # The reply and the published messages come on different sockets, in no
+    # particular order, and are handled in the IOLoop thread.
+
+    def _add_reply(self, reply):
+        # No status is published for aborted requests.
+        if self._idle or reply['content'].get('status') == 'aborted':
+            self._set_reply(reply)
+        else:
+            self._early_reply = reply
+
+    def _add_output(self, msg):
+        if msg['msg_type'] != 'status':
+            self.outputs.append(msg)
+        elif msg['content']['execution_state'] == 'idle':
+            self._idle = True
+            if self._early_reply is not None:
+                self._set_reply(self._early_reply)
+
+
+class PipelineClient(object):
+    """Send execute requests to a kernel without waiting for the replies.
+
+    The sockets of the client run on an IOLoop in a thread of their own, and
+    all the methods are thread safe.
+
+    Parameters
+    ----------
+    xreq_address, sub_address : tuple
+        The (ip, port) of the XREP and PUB sockets of the kernel.
+    session : Session, optional
+        The session the requests are sent with, a new one by default.
+    context : zmq.Context, optional
+        The ZMQ context of the sockets, a new one by default.
+    max_pending : int, optional
+        Overrides :attr:`max_pending`.
+    """
+
+    # The maximal number of requests sent and not done: execute() waits for
+    # one to be done before sending more.
+    max_pending = 100
+
+    def __init__(self, xreq_address, sub_address, session=None, context=None,
+                 max_pending=None):
+        self.xreq_address = xreq_address
+        self.sub_address = sub_address
+        self.session = Session() if session is None else session
+        self.context = zmq.Context() if context is None else context
+        if max_pending is not None:
+            self.max_pending = max_pending
+        self.loop_thread = IOLoopThread()
+        # The futures of the requests not done, by msg_id. The condition
+        # guards it, and is notified when a request is done.
+        self._futures = {}
+        self._pending = Condition()
+        self._subscribed = Event()
+        self._xreq_stream = None
+        self._sub_stream = None
+
+    def start(self, timeout=10):
+        """Connect to the kernel.
+
+        This waits for the SUB socket to get the messages the kernel
+        publishes, or else the output of the first requests could be lost,
+        by sending empty requests until their status messages come.
+        RuntimeError is raised if it doesn't within timeout seconds.
+        """
+        loop = self.loop_thread.ioloop
+        socket = self.context.socket(zmq.XREQ)
+        socket.setsockopt(zmq.IDENTITY, self.session.session)
+        socket.connect('tcp://%s:%i' % self.xreq_address)
+        self._xreq_stream = ZMQStream(socket, loop)
+        self._xreq_stream.on_recv(self._handle_reply)
+        socket = self.context.socket(zmq.SUB)
+        socket.setsockopt(zmq.SUBSCRIBE, '')
+        socket.connect('tcp://%s:%i' % self.sub_address)
+        self._sub_stream = ZMQStream(socket, loop)
+        self._sub_stream.on_recv(self._handle_output)
+        self.loop_thread.start()
+
+        stop_time = time.time() + timeout
+        while not self._subscribed.is_set():
+            if time.time() > stop_time:
+                self.stop()
+                raise RuntimeError('No message from the kernel after %s '
+                                   'seconds.' % timeout)
+            self._send(self._execute_msg('', silent=True))
+            self._subscribed.wait(0.1)
+
+    def stop(self):
+        """Disconnect from the kernel, without waiting for the requests."""
+        if self.loop_thread.is_alive():
+            self.loop_thread.stop()
+        for stream in (self._xreq_stream, self._sub_stream):
+            if stream is not None and not stream.closed():
+                stream.close()
+
+    def execute(self, code, silent=False, user_variables=None,
+                user_expressions=None, timeout=None):
+        """Send an execute_request and return its :class:`ExecuteFuture`.
+
+        If :attr:`max_pending` requests are pending, this waits for one of
+        them to be done first, and raises :class:`RequestTimeout` if none is
+        within timeout seconds (when timeout is not None). The arguments are
+        those of :meth:`XReqSocketChannel.execute`.
+        """
+        msg = self._execute_msg(code, silent, user_variables,
+                                user_expressions)
+        msg_id = msg['header']['msg_id']
+        with self._pending:
+            self._wait_pending(self.max_pending - 1, timeout)
+            future = self._futures[msg_id] = ExecuteFuture(msg_id)
+        self._send(msg)
+        return future
+
+    @property
+    def pending(self):
+        """The number of requests sent and not done."""
+        return len(self._futures)
+
+    def wait(self, timeout=None):
+        """Wait for all the requests sent to be done.
+
+        :class:`RequestTimeout` is raised if they aren't within timeout
+        seconds (when timeout is not None).
+        """
+        with self._pending:
+            self._wait_pending(0, timeout)
+
+    #--------------------------------------------------------------------------
+    # Protected interface:
+    #--------------------------------------------------------------------------
+
+    def _execute_msg(self, code, silent=False, user_variables=None,
+                     user_expressions=None):
+        content = dict(code=code, silent=silent,
+                       user_variables=user_variables or [],
+                       user_expressions=user_expressions or {})
+        return self.session.msg('execute_request', content)
+
+    def _wait_pending(self, n, timeout):
+        """Wait for at most n requests to be pending, with the lock held."""
+        if timeout is not None:
+            stop_time = time.time() + timeout
+        while len(self._futures) > n:
+            if timeout is None:
+                self._pending.wait()
+            else:
+                remaining = stop_time - time.time()
+                if remaining <= 0:
+                    raise RequestTimeout('%i requests still pending after %s '
+                                         'seconds.' % (len(self._futures),
+                                                       timeout))
+                self._pending.wait(remaining)
+
+    def _send(self, msg):
+        # The sockets are only used in the IOLoop thread.
+        def send():
+            self.session.send(self._xreq_stream.socket, msg)
+        self.loop_thread.ioloop.add_callback(send)
+
+    def _get_future(self, msg):
+        """The future of the request a message answers, if any."""
+        parent = msg['parent_header']
+        if parent.get('session') != self.session.session:
+            # The msg_ids are only unique within a session.
+            return None
+        with self._pending:
+            return self._futures.get(parent.get('msg_id'))
+
+    def _done(self, future):
+        with self._pending:
+            del self._futures[future.msg_id]
+            self._pending.notify_all()
+
+    def _handle_reply(self, msg_list):
+        msg = json.loads(msg_list[-1])
+        future = self._get_future(msg)
+        if future is not None:
+            future._add_reply(msg)
+            if future.done():
+                self._done(future)
+
+    def _handle_output(self, msg_list):
+        self._subscribed.set()
+        msg = json.loads(msg_list[-1])
+        future = self._get_future(msg)
+        if future is not None:
+            future._add_output(msg)
+            if future.done():
+                self._done(future)
@@ -0,0 +1,79 @@
+"""A thread serving the control channel of a kernel.
+
+The requests on the XREP socket of the kernel are handled one at a time by
+its main thread, so they wait for the code being run. The control channel is
+served by a thread of its own, and answers the requests which must not wait,
+like shutting down, aborting, interrupting or asking the status of the
+kernel, while the main thread runs code.
+"""
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2008-2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+import logging
+from threading import Thread
+
+#-----------------------------------------------------------------------------
+# Code
+#-----------------------------------------------------------------------------
+
+logger = logging.getLogger(__name__)
+
+
+class ControlThread(Thread):
+    """Serve the requests on a socket, in a thread of its own.
+
+    Parameters
+    ----------
+    session : Session
+        The session to receive and reply to the requests with.
+    socket : zmq.Socket
+        An XREP socket, only used by this thread once it is started.
+    handlers : dict
+        Maps the message types served to functions called with
+        (ident, msg) in this thread, which send the replies on the socket.
+        Requests of other types, and those whose handler raises, get a reply
+        with an 'error' status.
+    """
+
+    def __init__(self, session, socket, handlers):
+        Thread.__init__(self)
+        self.session = session
+        self.socket = socket
+        self.handlers = handlers
+        self.daemon = True
+
+    def run(self):
+        while True:
+            ident, msg = self.session.recv(self.socket, 0)
+            msg_type = msg['msg_type']
+            handler = self.handlers.get(msg_type)
+            if handler is None:
+                logger.error('Unknown control message type: %r' % msg_type)
+                content = {'status' : 'error',
+                           'ename' : 'UnknownMessageType',
+                           'evalue' : msg_type}
+                self.session.send(self.socket,
+                                  msg_type.replace('_request', '_reply'),
+                                  content, msg, ident)
+                continue
+            try:
+                handler(ident, msg)
+            except Exception, e:
+                # Keep serving the channel whatever happens, and tell the
+                # client the request failed.
+                logger.exception('Error handling control message: %r' % msg)
+                content = {'status' : 'error',
+                           'ename' : type(e).__name__,
+                           'evalue' : str(e)}
+                self.session.send(self.socket,
+                                  msg_type.replace('_request', '_reply'),
+                                  content, msg, ident)
@@ -51,6 +51,8 @@ def make_argument_parser():
                         help='set the REQ channel port [default: random]')
     parser.add_argument('--hb', type=int, metavar='PORT', default=0,
                         help='set the heartbeat port [default: random]')
+    parser.add_argument('--control', type=int, metavar='PORT', default=0,
+                        help='set the control channel port [default: random]')
 
     if sys.platform == 'win32':
         parser.add_argument('--interrupt', type=int, metavar='HANDLE', 
@@ -102,6 +104,10 @@ def make_kernel(namespace, kernel_factory,
     req_port = bind_port(req_socket, namespace.ip, namespace.req)
     io.raw_print("REQ Channel on port", req_port)
 
+    control_socket = context.socket(zmq.XREP)
+    control_port = bind_port(control_socket, namespace.ip, namespace.control)
+    io.raw_print("Control XREP Channel on port", control_port)
+
     hb = Heartbeat(context, (namespace.ip, namespace.hb))
     hb.start()
     hb_port = hb.port
@@ -110,8 +116,9 @@ def make_kernel(namespace, kernel_factory,
     # Helper to make it easier to connect to an existing kernel, until we have
     # single-port connection negotiation fully implemented.
     io.raw_print("To connect another client to this kernel, use:")
-    io.raw_print("-e --xreq {0} --sub {1} --rep {2} --hb {3}".format(
-        xrep_port, pub_port, req_port, hb_port))
+    io.raw_print("-e --xreq {0} --sub {1} --rep {2} --hb {3} "
+                 "--control {4}".format(xrep_port, pub_port, req_port,
+                                        hb_port, control_port))
 
     # Redirect input streams and set a display hook.
     if out_stream_factory:
@@ -120,11 +127,19 @@ def make_kernel(namespace, kernel_factory,
     if display_hook_factory:
         sys.displayhook = display_hook_factory(session, pub_socket)
 
-    # Create the kernel.
-    kernel = kernel_factory(session=session, reply_socket=reply_socket, 
-                            pub_socket=pub_socket, req_socket=req_socket)
+    # Create the kernel. Kernels serving a control channel have a
+    # control_socket trait.
+    kwargs = dict(session=session, reply_socket=reply_socket,
+                  pub_socket=pub_socket, req_socket=req_socket)
+    if hasattr(kernel_factory, 'control_socket'):
+        kwargs['control_socket'] = control_socket
+    else:
+        control_socket.close()
+        control_port = None
+    kernel = kernel_factory(**kwargs)
     kernel.record_ports(xrep_port=xrep_port, pub_port=pub_port,
-                        req_port=req_port, hb_port=hb_port)
+                        req_port=req_port, hb_port=hb_port,
+                        control_port=control_port)
     return kernel
 
 
@@ -154,8 +169,38 @@ def make_default_main(kernel_factory):
     return main
 
 
+def resource_limiter(limits):
+    """ Returns a function which sets the given resource limits on the current
+    process, to be called in a child process before it runs the kernel.
+
+    Parameters
+    ----------
+    limits : dict
+        Maps the names of resources in the :mod:`resource` module, without
+        the RLIMIT_ prefix and case insensitive ('as', 'cpu', 'nofile', ...),
+        to a limit or a (soft limit, hard limit) tuple.
+    """
+    import resource
+    rlimits = []
+    for name, value in limits.iteritems():
+        rlimit = getattr(resource, 'RLIMIT_' + name.upper(), None)
+        if rlimit is None:
+            raise ValueError('Unknown resource limit: %r' % name)
+        if isinstance(value, (tuple, list)):
+            value = tuple(value)
+        else:
+            value = (value, value)
+        rlimits.append((rlimit, value))
+
+    def set_limits():
+        for rlimit, value in rlimits:
+            resource.setrlimit(rlimit, value)
+    return set_limits
+
+
 def base_launch_kernel(code, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
-                       independent=False, extra_arguments=[]):
+                       independent=False, extra_arguments=[], limits=None,
+                       control_port=0):
     """ Launches a localhost kernel, binding to the specified ports.
 
     Parameters
@@ -184,16 +229,24 @@ def base_launch_kernel(code, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
     extra_arguments = list, optional
         A list of extra arguments to pass when executing the launch code.
 
+    limits : dict, optional
+        Resource limits of the kernel process, see :func:`resource_limiter`.
+        Only supported on Unix.
+
+    control_port : int, optional
+        The port to use for the control XREP channel.
+
     Returns
     -------
     A tuple of form:
-        (kernel_process, xrep_port, pub_port, req_port)
+        (kernel_process, xrep_port, pub_port, req_port, hb_port, control_port)
     where kernel_process is a Popen object and the ports are integers.
     """
     # Find open ports as necessary.
     ports = []
     ports_needed = int(xrep_port <= 0) + int(pub_port <= 0) + \
-                   int(req_port <= 0) + int(hb_port <= 0)
+                   int(req_port <= 0) + int(hb_port <= 0) + \
+                   int(control_port <= 0)
     for i in xrange(ports_needed):
         sock = socket.socket()
         sock.bind(('', 0))
@@ -210,15 +263,20 @@ def base_launch_kernel(code, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
         req_port = ports.pop(0)
     if hb_port <= 0:
         hb_port = ports.pop(0)
+    if control_port <= 0:
+        control_port = ports.pop(0)
 
     # Build the kernel launch command.
     arguments = [ sys.executable, '-c', code, '--xrep', str(xrep_port), 
                   '--pub', str(pub_port), '--req', str(req_port),
-                  '--hb', str(hb_port) ]
+                  '--hb', str(hb_port), '--control', str(control_port) ]
     arguments.extend(extra_arguments)
 
     # Spawn a kernel.
     if sys.platform == 'win32':
+        if limits:
+            raise RuntimeError("Resource limits are not supported on Windows.")
+
         # Create a Win32 event for interrupting the kernel.
         interrupt_event = ParentPollerWindows.create_interrupt_event()
         arguments += [ '--interrupt', str(int(interrupt_event)) ]
@@ -252,9 +310,14 @@ def base_launch_kernel(code, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
             proc.stdin.close()
 
     else:
+        set_limits = resource_limiter(limits) if limits else None
         if independent:
-            proc = Popen(arguments, preexec_fn=lambda: os.setsid())
+            def preexec():
+                os.setsid()
+                if set_limits is not None:
+                    set_limits()
+            proc = Popen(arguments, preexec_fn=preexec)
         else:
-            proc = Popen(arguments + ['--parent'])
+            proc = Popen(arguments + ['--parent'], preexec_fn=set_limits)
 
-    return proc, xrep_port, pub_port, req_port, hb_port
+    return proc, xrep_port, pub_port, req_port, hb_port, control_port
@@ -0,0 +1,245 @@
+"""Monitor the heartbeats of kernels from an IOLoop.
+
+The kernels answer pings on their heartbeat socket (see :mod:`heartbeat`).
+:class:`HeartMonitor` pings any number of kernels from a single IOLoop, which
+polls all their sockets at once, and calls back when a kernel stops
+answering. Idle kernels are pinged every ``interval`` seconds and busy ones,
+or ones which missed a ping, every ``busy_interval`` seconds, so that a death
+is noticed quickly when it matters without pinging idle kernels much. The
+round-trip time of the pings is kept, as the best sign of an overloaded
+kernel or network.
+"""
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2008-2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+# Standard library imports.
+from collections import deque
+import time
+
+# System library imports.
+import zmq
+
+#-----------------------------------------------------------------------------
+# Classes
+#-----------------------------------------------------------------------------
+
+class _Heart(object):
+    """The heartbeat state of one kernel."""
+
+    def __init__(self, key, socket, callback, interval, busy_interval,
+                 max_misses):
+        self.key = key
+        self.socket = socket
+        self.callback = callback
+        self.interval = interval
+        self.busy_interval = busy_interval
+        self.max_misses = max_misses
+        self.busy = False
+        self.paused = False
+        self.dead = False
+        # The number of the last ping, and the unanswered pings: number ->
+        # time sent.
+        self.seq = 0
+        self.pending = {}
+        self.misses = 0
+        self.sent = 0
+        self.received = 0
+        self.last_beat = time.time()
+        # The round-trip times of the last pings.
+        self.latencies = deque(maxlen=100)
+        self.timeout = None
+
+
+class HeartMonitor(object):
+    """Ping the heartbeats of many kernels from a single IOLoop.
+
+    Kernels are identified by a key given to :meth:`add_heart`. All the
+    methods must be called from the thread running the IOLoop, or before it
+    runs.
+    """
+
+    # The time between pings of idle kernels, in seconds.
+    interval = 3.0
+
+    # The time between pings of busy kernels or of kernels which missed the
+    # last ping.
+    busy_interval = 0.5
+
+    # How many pings in a row a kernel must miss to be declared dead.
+    max_misses = 3
+
+    def __init__(self, context, loop):
+        self.context = context
+        self.loop = loop
+        self._hearts = {}
+
+    def __contains__(self, key):
+        return key in self._hearts
+
+    def add_heart(self, key, address, callback, identity=None, interval=None,
+                  busy_interval=None, max_misses=None):
+        """Start pinging the heartbeat of a kernel.
+
+        Parameters
+        ----------
+        key : hashable
+            The key identifying the kernel in the other methods.
+        address : tuple
+            The (ip, port) of the heartbeat socket of the kernel.
+        callback : callable
+            Called as callback(since_last_heartbeat) when the kernel is
+            declared dead, with the time since the last answer, in seconds.
+            It is called once, until the kernel answers again.
+        identity : str, optional
+            The identity of the socket.
+        interval, busy_interval, max_misses : optional
+            Override the attributes of the monitor for this kernel.
+        """
+        if key in self._hearts:
+            raise KeyError('Already monitoring the heartbeat of %r.' % key)
+        socket = self.context.socket(zmq.XREQ)
+        if identity is not None:
+            socket.setsockopt(zmq.IDENTITY, identity)
+        socket.setsockopt(zmq.LINGER, 0)
+        socket.connect('tcp://%s:%i' % address)
+        heart = _Heart(key, socket, callback,
+                       self.interval if interval is None else interval,
+                       self.busy_interval if busy_interval is None
+                       else busy_interval,
+                       self.max_misses if max_misses is None else max_misses)
+        self._hearts[key] = heart
+        self.loop.add_handler(socket, lambda s, e: self._handle_pongs(heart),
+                              zmq.POLLIN)
+        self._ping(heart)
+        return socket
+
+    def remove_heart(self, key):
+        """Stop pinging the heartbeat of a kernel."""
+        heart = self._hearts.pop(key)
+        self._cancel(heart)
+        self.loop.remove_handler(heart.socket)
+        heart.socket.close()
+
+    def pause(self, key):
+        """Stop pinging a kernel for now, while it restarts for instance."""
+        heart = self._hearts[key]
+        heart.paused = True
+        self._cancel(heart)
+
+    def unpause(self, key):
+        """Resume pinging a kernel, starting afresh."""
+        heart = self._hearts[key]
+        if heart.paused:
+            heart.paused = False
+            self.reset(key)
+
+    def reset(self, key):
+        """Forget the pings sent so far, as after a restart of the kernel."""
+        heart = self._hearts[key]
+        heart.pending.clear()
+        heart.misses = 0
+        heart.dead = False
+        heart.last_beat = time.time()
+        if not heart.paused:
+            self._cancel(heart)
+            self._ping(heart)
+
+    def set_busy(self, key, busy):
+        """Tell whether a kernel is busy, so it's pinged more often."""
+        heart = self._hearts[key]
+        if busy and not heart.busy and not heart.paused:
+            # Don't wait for the end of a long idle interval.
+            heart.busy = True
+            self._cancel(heart)
+            self._ping(heart)
+        heart.busy = busy
+
+    def is_dead(self, key):
+        """Has the kernel been declared dead (and not answered since)?"""
+        return self._hearts[key].dead
+
+    def stats(self, key):
+        """Return the heartbeat statistics of a kernel, as a dict of:
+
+        sent, received, missed : the numbers of pings sent, of answers and
+            of pings unanswered in a row.
+        since_last_heartbeat : the time since the last answer.
+        latency_last, latency_mean, latency_max : the round-trip time of the
+            last ping and its mean and max over the last 100 pings, in
+            seconds, or None before the first answer.
+        """
+        heart = self._hearts[key]
+        latencies = list(heart.latencies)
+        stats = dict(sent=heart.sent, received=heart.received,
+                     missed=heart.misses,
+                     since_last_heartbeat=time.time() - heart.last_beat,
+                     latency_last=None, latency_mean=None, latency_max=None)
+        if latencies:
+            stats.update(latency_last=latencies[-1],
+                         latency_mean=sum(latencies) / len(latencies),
+                         latency_max=max(latencies))
+        return stats
+
+    #--------------------------------------------------------------------------
+    # Protected interface:
+    #--------------------------------------------------------------------------
+
+    def _ping(self, heart):
+        heart.timeout = None
+        now = time.time()
+        if heart.seq in heart.pending:
+            # The last ping wasn't answered in time.
+            heart.misses += 1
+            if heart.misses >= heart.max_misses and not heart.dead:
+                heart.dead = True
+                heart.callback(now - heart.last_beat)
+        heart.seq += 1
+        heart.pending[heart.seq] = now
+        # Late answers still count as heartbeats, but only to the last few.
+        heart.pending.pop(heart.seq - heart.max_misses - 1, None)
+        heart.socket.send_multipart(['', str(heart.seq)])
+        heart.sent += 1
+        if heart.busy or heart.misses:
+            delay = heart.busy_interval
+        else:
+            delay = heart.interval
+        heart.timeout = self.loop.add_timeout(now + delay,
+                                              lambda: self._ping(heart))
+
+    def _handle_pongs(self, heart):
+        while True:
+            try:
+                msg = heart.socket.recv_multipart(zmq.NOBLOCK)
+            except zmq.ZMQError, e:
+                if e.errno == zmq.EAGAIN:
+                    break
+                raise
+            try:
+                seq = int(msg[-1])
+                sent = heart.pending.pop(seq)
+            except (KeyError, ValueError):
+                # An answer to a ping sent before a reset.
+                continue
+            now = time.time()
+            heart.received += 1
+            heart.latencies.append(now - sent)
+            heart.last_beat = now
+            heart.misses = 0
+            heart.dead = False
+            # Older pings can't be answered anymore.
+            for older in [n for n in heart.pending if n < seq]:
+                del heart.pending[older]
+
+    def _cancel(self, heart):
+        if heart.timeout is not None:
+            self.loop.remove_timeout(heart.timeout)
+            heart.timeout = None
@@ -6,7 +6,6 @@ Things to do:
 * Implement `set_parent` logic. Right before doing exec, the Kernel should
   call set_parent on all the PUB objects with the message about to be executed.
 * Implement random port and security key logic.
-* Implement control messages.
 * Implement event loop and poll version.
 """
 
@@ -18,7 +17,11 @@ from __future__ import print_function
 # Standard library imports.
 import __builtin__
 import atexit
+from functools import partial
+import os
+import signal
 import sys
+from thread import interrupt_main
 import time
 import traceback
 import logging
@@ -30,11 +33,12 @@ from IPython.config.configurable import Configurable
 from IPython.utils import io
 from IPython.utils.jsonutil import json_clean
 from IPython.lib import pylabtools
-from IPython.utils.traitlets import Instance, Float
+from IPython.utils.traitlets import Instance, Float, Int
+from control import ControlThread
 from entry_point import (base_launch_kernel, make_argument_parser, make_kernel,
                          start_kernel)
 from iostream import OutStream
-from session import Session, Message
+from session import Session, Message, MessageBuffer
 from zmqshell import ZMQInteractiveShell
 
 #-----------------------------------------------------------------------------
@@ -74,6 +78,13 @@ class Kernel(Configurable):
     reply_socket = Instance('zmq.Socket')
     pub_socket = Instance('zmq.Socket')
     req_socket = Instance('zmq.Socket')
+    control_socket = Instance('zmq.Socket')
+
+    # The number of the last messages published, and their maximal total size
+    # in bytes, kept for clients to replay those they missed with a
+    # replay_request.
+    iopub_buffer_messages = Int(1000, config=True)
+    iopub_buffer_bytes = Int(10*1024*1024, config=True)
 
     # Private interface
 
@@ -102,6 +113,16 @@ class Kernel(Configurable):
     # by record_ports and used by connect_request.
     _recorded_ports = None
 
+    # The execute_request being run and the time it started, for the requests
+    # on the control channel.
+    _executing = None
+
+    # The requests to abort, set by abort_request from the control channel:
+    # all the requests waiting if _abort_all is set, and those with the
+    # (session, msg_id) headers in _abort_ids.
+    _abort_all = False
+    _abort_ids = None
+
 
     def __init__(self, **kwargs):
         super(Kernel, self).__init__(**kwargs)
@@ -117,23 +138,55 @@ class Kernel(Configurable):
         self.shell.display_pub.session = self.session
         self.shell.display_pub.pub_socket = self.pub_socket
 
+        # Number and keep the messages published, see replay_request.
+        self.session.buffers[self.pub_socket] = MessageBuffer(
+            self.iopub_buffer_messages, self.iopub_buffer_bytes)
+        # Count the bytes published, see execute_request.
+        self.session.bytes_sent[self.pub_socket] = 0
+
         # TMP - hack while developing
         self.shell._reply_content = None
 
         # Build dict of handlers for message types
         msg_types = [ 'execute_request', 'complete_request', 
-                      'object_info_request', 'history_tail_request',
-                      'connect_request', 'shutdown_request']
+                      'object_info_request', 'history_request',
+                      'history_tail_request',
+                      'connect_request', 'replay_request',
+                      'shutdown_request']
         self.handlers = {}
         for msg_type in msg_types:
             self.handlers[msg_type] = getattr(self, msg_type)
 
+        # The control channel is served by a thread of its own, so it must
+        # only get the requests which are safe to handle while code runs.
+        self._abort_ids = set()
+        if self.control_socket is not None:
+            control_handlers = {
+                'shutdown_request' : self._control_shutdown_request,
+                'abort_request' : self.abort_request,
+                'interrupt_request' : self.interrupt_request,
+                'status_request' : self.status_request,
+            }
+            for msg_type in [ 'connect_request', 'replay_request' ]:
+                control_handlers[msg_type] = partial(
+                    getattr(self, msg_type), socket=self.control_socket)
+            self.control_thread = ControlThread(
+                self.session, self.control_socket, control_handlers)
+            self.control_thread.start()
+
     def do_one_iteration(self):
         """Do one iteration of the kernel's evaluation loop.
+
+        Returns whether a request was handled.
         """
+        self._check_exit()
+        if self._abort_all:
+            self._abort_all = False
+            self._abort_queue()
+
         ident,msg = self.session.recv(self.reply_socket, zmq.NOBLOCK)
         if msg is None:
-            return
+            return False
         
         # This assert will raise in versions of zeromq 2.0.7 and lesser.
         # We now require 2.0.8 or above, so we can uncomment for safety.
@@ -149,28 +202,35 @@ class Kernel(Configurable):
 
         # Find and call actual handler for message
         handler = self.handlers.get(msg['msg_type'], None)
-        if handler is None:
+        header = msg['header']
+        abort_id = (header.get('session'), header.get('msg_id'))
+        if abort_id in self._abort_ids:
+            self._abort_ids.discard(abort_id)
+            self._abort_request(ident, msg)
+        elif handler is None:
             logger.error("UNKNOWN MESSAGE TYPE:" +str(msg))
         else:
             handler(ident, msg)
             
         # Check whether we should exit, in case the incoming message set the
         # exit flag on
-        if self.shell.exit_now:
-            logger.debug('\nExiting IPython kernel...')
-            # We do a normal, clean exit, which allows any actions registered
-            # via atexit (such as history saving) to take place.
-            sys.exit(0)
+        self._check_exit()
+        return True
 
 
     def start(self):
         """ Start the kernel main loop.
         """
+        signal.signal(signal.SIGINT, self._handle_sigint)
         while True:
             time.sleep(self._poll_interval)
-            self.do_one_iteration()
+            # Handle all the requests waiting, for clients sending several
+            # at a time not to wait for the poll interval between each.
+            while self.do_one_iteration():
+                pass
 
-    def record_ports(self, xrep_port, pub_port, req_port, hb_port):
+    def record_ports(self, xrep_port, pub_port, req_port, hb_port,
+                     control_port=None):
         """Record the ports that this kernel is using.
 
         The creator of the Kernel instance must call this methods if they
@@ -180,7 +240,8 @@ class Kernel(Configurable):
             'xrep_port' : xrep_port,
             'pub_port' : pub_port,
             'req_port' : req_port,
-            'hb_port' : hb_port
+            'hb_port' : hb_port,
+            'control_port' : control_port
         }
 
     #---------------------------------------------------------------------------
@@ -211,86 +272,118 @@ class Kernel(Configurable):
 
         shell = self.shell # we'll need this a lot here
 
-        # Replace raw_input. Note that is not sufficient to replace 
-        # raw_input in the user namespace.
-        raw_input = lambda prompt='': self._raw_input(prompt, ident, parent)
-        __builtin__.raw_input = raw_input
-
-        # Set the parent message of the display hook and out streams.
-        shell.displayhook.set_parent(parent)
-        shell.display_pub.set_parent(parent)
-        sys.stdout.set_parent(parent)
-        sys.stderr.set_parent(parent)
-
-        # Re-broadcast our input for the benefit of listening clients, and
-        # start computing output
+        # Record the timings and cost of the cell, if enabled with %stats.
+        # Nothing is recorded for silent requests, which aren't numbered.
         if not silent:
-            self._publish_pyin(code, parent)
-
-        reply_content = {}
+            shell.cell_stats.begin()
+        iopub_bytes = self.session.bytes_sent[self.pub_socket]
+        stats = None
         try:
-            if silent:
-                # run_code uses 'exec' mode, so no displayhook will fire, and it
-                # doesn't call logging or history manipulations.  Print
-                # statements in that code will obviously still execute.
-                shell.run_code(code)
+            # Replace raw_input. Note that is not sufficient to replace 
+            # raw_input in the user namespace.
+            raw_input = lambda prompt='': self._raw_input(prompt, ident, parent)
+            __builtin__.raw_input = raw_input
+
+            # Set the parent message of the display hook and out streams.
+            shell.displayhook.set_parent(parent)
+            shell.display_pub.set_parent(parent)
+            sys.stdout.set_parent(parent)
+            sys.stderr.set_parent(parent)
+
+            # Re-broadcast our input for the benefit of listening clients, and
+            # start computing output
+            if not silent:
+                self._publish_pyin(code, parent)
+
+            # Sample the stack of the cell, if asked to with %sample.  Silent
+            # requests aren't numbered, so they aren't sampled.
+            if not silent:
+                shell.cell_sampler.start()
+
+            reply_content = {}
+            # Only the code of the user may be interrupted (see
+            # _handle_sigint), and an interrupt coming while _executing is
+            # being reset is caught below like one interrupting the code.
+            self._executing = (parent, time.time())
+            try:
+                try:
+                    if silent:
+                        # run_code uses 'exec' mode, so no displayhook will
+                        # fire, and it doesn't call logging or history
+                        # manipulations.  Print statements in that code will
+                        # obviously still execute.
+                        shell.run_code(code)
+                    else:
+                        # FIXME: the shell calls the exception handler itself.
+                        shell._reply_content = None
+                        shell.run_cell(code)
+                finally:
+                    self._executing = None
+            except:
+                status = u'error'
+                # FIXME: this code right now isn't being used yet by default,
+                # because the runlines() call above directly fires off exception
+                # reporting.  This code, therefore, is only active in the scenario
+                # where runlines itself has an unhandled exception.  We need to
+                # uniformize this, for all exception construction to come from a
+                # single location in the codbase.
+                etype, evalue, tb = sys.exc_info()
+                tb_list = traceback.format_exception(etype, evalue, tb)
+                reply_content.update(shell._showtraceback(etype, evalue, tb_list))
             else:
-                # FIXME: the shell calls the exception handler itself.
-                shell._reply_content = None
-                shell.run_cell(code)
-        except:
-            status = u'error'
-            # FIXME: this code right now isn't being used yet by default,
-            # because the runlines() call above directly fires off exception
-            # reporting.  This code, therefore, is only active in the scenario
-            # where runlines itself has an unhandled exception.  We need to
-            # uniformize this, for all exception construction to come from a
-            # single location in the codbase.
-            etype, evalue, tb = sys.exc_info()
-            tb_list = traceback.format_exception(etype, evalue, tb)
-            reply_content.update(shell._showtraceback(etype, evalue, tb_list))
-        else:
-            status = u'ok'
+                status = u'ok'
+
+            if not silent:
+                shell.cell_sampler.stop(shell.execution_count - 1)
 
-        reply_content[u'status'] = status
+            reply_content[u'status'] = status
         
-        # Return the execution counter so clients can display prompts
-        reply_content['execution_count'] = shell.execution_count -1
-
-        # FIXME - fish exception info out of shell, possibly left there by
-        # runlines.  We'll need to clean up this logic later.
-        if shell._reply_content is not None:
-            reply_content.update(shell._reply_content)
-
-        # At this point, we can tell whether the main code execution succeeded
-        # or not.  If it did, we proceed to evaluate user_variables/expressions
-        if reply_content['status'] == 'ok':
-            reply_content[u'user_variables'] = \
-                         shell.user_variables(content[u'user_variables'])
-            reply_content[u'user_expressions'] = \
-                         shell.user_expressions(content[u'user_expressions'])
-        else:
-            # If there was an error, don't even try to compute variables or
-            # expressions
-            reply_content[u'user_variables'] = {}
-            reply_content[u'user_expressions'] = {}
-
-        # Payloads should be retrieved regardless of outcome, so we can both
-        # recover partial output (that could have been generated early in a
-        # block, before an error) and clear the payload system always.
-        reply_content[u'payload'] = shell.payload_manager.read_payload()
-        # Be agressive about clearing the payload because we don't want
-        # it to sit in memory until the next execute_request comes in.
-        shell.payload_manager.clear_payload()
-
-        # Flush output before sending the reply.
-        sys.stdout.flush()
-        sys.stderr.flush()
-        # FIXME: on rare occasions, the flush doesn't seem to make it to the
-        # clients... This seems to mitigate the problem, but we definitely need
-        # to better understand what's going on.
-        if self._execute_sleep:
-            time.sleep(self._execute_sleep)
+            # Return the execution counter so clients can display prompts
+            reply_content['execution_count'] = shell.execution_count -1
+
+            # FIXME - fish exception info out of shell, possibly left there by
+            # runlines.  We'll need to clean up this logic later.
+            if shell._reply_content is not None:
+                reply_content.update(shell._reply_content)
+
+            # At this point, we can tell whether the main code execution succeeded
+            # or not.  If it did, we proceed to evaluate user_variables/expressions
+            if reply_content['status'] == 'ok':
+                reply_content[u'user_variables'] = \
+                             shell.user_variables(content[u'user_variables'])
+                reply_content[u'user_expressions'] = \
+                             shell.user_expressions(content[u'user_expressions'])
+            else:
+                # If there was an error, don't even try to compute variables or
+                # expressions
+                reply_content[u'user_variables'] = {}
+                reply_content[u'user_expressions'] = {}
+
+            # Payloads should be retrieved regardless of outcome, so we can both
+            # recover partial output (that could have been generated early in a
+            # block, before an error) and clear the payload system always.
+            reply_content[u'payload'] = shell.payload_manager.read_payload()
+            # Be agressive about clearing the payload because we don't want
+            # it to sit in memory until the next execute_request comes in.
+            shell.payload_manager.clear_payload()
+
+            # Flush output before sending the reply.
+            sys.stdout.flush()
+            sys.stderr.flush()
+            # FIXME: on rare occasions, the flush doesn't seem to make it to the
+            # clients... This seems to mitigate the problem, but we definitely need
+            # to better understand what's going on.
+            if self._execute_sleep:
+                time.sleep(self._execute_sleep)
+        finally:
+            # Always finish the record, or the next cells would be taken
+            # for nested ones and never recorded.
+            if not silent:
+                shell.cell_stats.add('iopub_bytes',
+                    self.session.bytes_sent[self.pub_socket] - iopub_bytes)
+                stats = shell.cell_stats.end()
+        if stats is not None:
+            reply_content[u'stats'] = stats
         
         # Send the reply.
         reply_msg = self.session.send(self.reply_socket, u'execute_reply',
@@ -323,6 +416,39 @@ class Kernel(Configurable):
                                 oinfo, parent, ident)
         logger.debug(msg)
 
+    def history_request(self, ident, parent):
+        # We need to pull these out, as passing **kwargs doesn't work with
+        # unicode keys before Python 2.6.5.
+        content = parent['content']
+        hist_access_type = content['hist_access_type']
+        raw = content['raw']
+        output = content['output']
+        history_manager = self.shell.history_manager
+        before = content.get('before')
+        if before is not None:
+            before = tuple(before)
+        if hist_access_type == 'tail':
+            hist = history_manager.get_tail(content['n'], raw=raw,
+                                            output=output, include_latest=True,
+                                            unique=content.get('unique', False),
+                                            before=before)
+        elif hist_access_type == 'range':
+            hist = history_manager.get_range(content['session'],
+                                             content['start'],
+                                             content.get('stop'), raw=raw,
+                                             output=output)
+        elif hist_access_type == 'search':
+            hist = history_manager.search(content['pattern'], raw=raw,
+                                          output=output, n=content.get('n'),
+                                          unique=content.get('unique', False),
+                                          before=before)
+        else:
+            hist = []
+        content = {'history' : list(hist)}
+        msg = self.session.send(self.reply_socket, 'history_reply',
+                                content, parent, ident)
+        logger.debug(str(msg))
+
     def history_tail_request(self, ident, parent):
         # We need to pull these out, as passing **kwargs doesn't work with
         # unicode keys before Python 2.6.5.
@@ -335,24 +461,95 @@ class Kernel(Configurable):
                                 content, parent, ident)
         logger.debug(str(msg))
 
-    def connect_request(self, ident, parent):
+    # The handlers taking a socket argument are also served on the control
+    # channel, and reply on the control socket there.
+
+    def connect_request(self, ident, parent, socket=None):
         if self._recorded_ports is not None:
             content = self._recorded_ports.copy()
         else:
             content = {}
-        msg = self.session.send(self.reply_socket, 'connect_reply',
+        msg = self.session.send(socket or self.reply_socket, 'connect_reply',
                                 content, parent, ident)
         logger.debug(msg)
 
+    def replay_request(self, ident, parent, socket=None):
+        buffer = self.session.buffers[self.pub_socket]
+        msgs, first_seq = buffer.since(parent['content'].get('after', 0))
+        content = {'messages' : msgs,
+                   'first_seq' : first_seq,
+                   'last_seq' : buffer.seq}
+        msg = self.session.send(socket or self.reply_socket, 'replay_reply',
+                                content, parent, ident)
+        logger.debug('replay_reply: %i messages' % len(msgs))
+
     def shutdown_request(self, ident, parent):
         self.shell.exit_now = True
         self._shutdown_message = self.session.msg(u'shutdown_reply', parent['content'], parent)
         sys.exit(0)
 
+    #---------------------------------------------------------------------------
+    # Control channel request handlers, called in the control thread
+    #---------------------------------------------------------------------------
+
+    def abort_request(self, ident, parent):
+        msg_ids = parent['content'].get('msg_ids')
+        if msg_ids:
+            session = parent['header']['session']
+            self._abort_ids.update((session, msg_id) for msg_id in msg_ids)
+        else:
+            self._abort_all = True
+        msg = self.session.send(self.control_socket, 'abort_reply',
+                                {'status' : 'ok'}, parent, ident)
+        logger.debug(msg)
+
+    def interrupt_request(self, ident, parent):
+        interrupted = self._executing is not None
+        if interrupted:
+            self._interrupt_main()
+        msg = self.session.send(self.control_socket, 'interrupt_reply',
+                                {'status' : 'ok', 'interrupted' : interrupted},
+                                parent, ident)
+        logger.debug(msg)
+
+    def status_request(self, ident, parent):
+        executing = self._executing
+        content = {'status' : 'ok',
+                   'execution_count' : self.shell.execution_count}
+        if executing is None:
+            content.update(execution_state='idle', msg_id=None, elapsed=None)
+        else:
+            request, started = executing
+            content.update(execution_state='busy',
+                           msg_id=request['header']['msg_id'],
+                           elapsed=time.time() - started)
+        msg = self.session.send(self.control_socket, 'status_reply',
+                                content, parent, ident)
+        logger.debug(msg)
+
+    def _control_shutdown_request(self, ident, parent):
+        # The main thread exits as soon as it's done with the code it runs,
+        # which is interrupted.
+        self._shutdown_message = self.session.msg(u'shutdown_reply',
+                                                  parent['content'], parent)
+        msg = self.session.send(self.control_socket, u'shutdown_reply',
+                                parent['content'], parent, ident)
+        logger.debug(msg)
+        self.shell.exit_now = True
+        if self._executing is not None:
+            self._interrupt_main()
+
     #---------------------------------------------------------------------------
     # Protected interface
     #---------------------------------------------------------------------------
 
+    def _check_exit(self):
+        if self.shell.exit_now:
+            logger.debug('\nExiting IPython kernel...')
+            # We do a normal, clean exit, which allows any actions registered
+            # via atexit (such as history saving) to take place.
+            sys.exit(0)
+
     def _abort_queue(self):
         while True:
             ident,msg = self.session.recv(self.reply_socket, zmq.NOBLOCK)
@@ -361,17 +558,38 @@ class Kernel(Configurable):
             else:
                 assert ident is not None, \
                        "Unexpected missing message part."
-
-            logger.debug("Aborting:\n"+str(Message(msg)))
-            msg_type = msg['msg_type']
-            reply_type = msg_type.split('_')[0] + '_reply'
-            reply_msg = self.session.send(self.reply_socket, reply_type, 
-                    {'status' : 'aborted'}, msg, ident=ident)
-            logger.debug(reply_msg)
+            self._abort_request(ident, msg)
             # We need to wait a bit for requests to come in. This can probably
             # be set shorter for true asynchronous clients.
             time.sleep(0.1)
 
+    def _abort_request(self, ident, msg):
+        logger.debug("Aborting:\n"+str(Message(msg)))
+        msg_type = msg['msg_type']
+        reply_type = msg_type.split('_')[0] + '_reply'
+        reply_msg = self.session.send(self.reply_socket, reply_type, 
+                {'status' : 'aborted'}, msg, ident=ident)
+        logger.debug(reply_msg)
+
+    def _handle_sigint(self, signum, frame):
+        """Interrupt the code of the user, if it is running.
+
+        Interrupts coming when it isn't, too late for the code they were
+        meant for, are ignored: raised anywhere else in the main thread,
+        they would keep the replies from being sent, or kill the kernel.
+        """
+        if self._executing is not None:
+            raise KeyboardInterrupt
+        logger.debug('Ignoring an interrupt coming while no code runs.')
+
+    def _interrupt_main(self):
+        """Interrupt the code run by the main thread, from another thread."""
+        if sys.platform == 'win32':
+            interrupt_main()
+        else:
+            # Unlike interrupt_main, this also interrupts blocking calls.
+            os.kill(os.getpid(), signal.SIGINT)
+
     def _raw_input(self, prompt, ident, parent):
         # Flush output before making the request.
         sys.stderr.flush()
@@ -551,7 +769,8 @@ class GTKKernel(Kernel):
 #-----------------------------------------------------------------------------
 
 def launch_kernel(ip=None, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
-                  independent=False, pylab=False, colors=None):
+                  independent=False, pylab=False, colors=None,
+                  limits=None, control_port=0):
     """Launches a localhost kernel, binding to the specified ports.
 
     Parameters
@@ -585,10 +804,18 @@ def launch_kernel(ip=None, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
     colors : None or string, optional (default None)
         If not None, specify the color scheme. One of (NoColor, LightBG, Linux)
 
+    limits : dict, optional
+        Resource limits of the kernel process, as (name, limit) items like
+        ``{'as': 2**30, 'cpu': 3600}``; see entry_point.resource_limiter.
+        Only supported on Unix.
+
+    control_port : int, optional
+        The port to use for the control XREP channel.
+
     Returns
     -------
     A tuple of form:
-        (kernel_process, xrep_port, pub_port, req_port)
+        (kernel_process, xrep_port, pub_port, req_port, hb_port, control_port)
     where kernel_process is a Popen object and the ports are integers.
     """
     extra_arguments = []
@@ -605,7 +832,8 @@ def launch_kernel(ip=None, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
         extra_arguments.append(colors)
     return base_launch_kernel('from IPython.zmq.ipkernel import main; main()',
                               xrep_port, pub_port, req_port, hb_port, 
-                              independent, extra_arguments)
+                              independent, extra_arguments, limits,
+                              control_port)
 
 
 def main():
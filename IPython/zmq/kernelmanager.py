@@ -21,7 +21,7 @@ from Queue import Queue, Empty
 from subprocess import Popen
 import signal
 import sys
-from threading import Thread
+from threading import Event, Lock, Thread, current_thread
 import time
 import logging
 
@@ -33,7 +33,9 @@ from zmq.eventloop import ioloop
 # Local imports.
 from IPython.utils import io
 from IPython.utils.localinterfaces import LOCALHOST, LOCAL_IPS
-from IPython.utils.traitlets import HasTraits, Any, Instance, Type, TCPAddress
+from IPython.utils.traitlets import (HasTraits, Any, Bool, Instance, Type,
+                                     TCPAddress)
+from heartmonitor import HeartMonitor
 from session import Session, Message
 
 #-----------------------------------------------------------------------------
@@ -43,6 +45,13 @@ from session import Session, Message
 class InvalidPortNumber(Exception):
     pass
 
+class RequestTimeout(Exception):
+    pass
+
+
+class RequestCancelled(Exception):
+    pass
+
 #-----------------------------------------------------------------------------
 # Utility functions
 #-----------------------------------------------------------------------------
@@ -72,6 +81,85 @@ def validate_string_dict(dct):
             raise ValueError('value %r in dict must be a string' % v)
 
 
+class IOLoopThread(Thread):
+    """A thread running an IOLoop, which can be shared by several channels.
+    """
+
+    def __init__(self):
+        super(IOLoopThread, self).__init__()
+        self.daemon = True
+        self.ioloop = ioloop.IOLoop()
+
+    def run(self):
+        """The thread's main activity.  Call start() instead."""
+        self.ioloop.start()
+
+    def stop(self):
+        """Stop the IOLoop and wait for the thread to terminate."""
+        self.ioloop.stop()
+        self.join()
+
+
+class ReplyFuture(object):
+    """The reply to a request sent on an XREQ channel, once it is received.
+
+    See :meth:`XReqSocketChannel.request`.
+    """
+
+    def __init__(self, msg_id):
+        self.msg_id = msg_id
+        self.reply = None
+        self.cancelled = False
+        self._received = Event()
+        self._callbacks = []
+        self._lock = Lock()
+
+    def done(self):
+        """Has the reply been received, or the request been cancelled?"""
+        return self._received.is_set()
+
+    def result(self, timeout=None):
+        """Wait for the reply and return it.
+
+        :class:`RequestTimeout` is raised if it isn't received within timeout
+        seconds (when timeout is not None), and :class:`RequestCancelled` if
+        the request was cancelled, because the kernel died for example.
+        """
+        if not self._received.wait(timeout):
+            raise RequestTimeout('No reply to %s after %s seconds.' %
+                                 (self.msg_id, timeout))
+        if self.cancelled:
+            raise RequestCancelled('The request %s was cancelled.' %
+                                   self.msg_id)
+        return self.reply
+
+    def add_done_callback(self, callback):
+        """Call callback(reply) when the reply is received.
+
+        The callback is called in the thread of the IOLoop of the channel, or
+        right away if the reply was already received.
+        """
+        with self._lock:
+            if not self._received.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self.reply)
+
+    def _set_reply(self, reply):
+        with self._lock:
+            self.reply = reply
+            self._received.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(reply)
+
+    def _cancel(self):
+        # The callbacks are dropped, there will be no reply to call them with.
+        with self._lock:
+            self.cancelled = True
+            self._received.set()
+            self._callbacks = []
+
 #-----------------------------------------------------------------------------
 # ZMQ Socket Channel classes
 #-----------------------------------------------------------------------------
@@ -85,6 +173,9 @@ class ZmqSocketChannel(Thread):
     ioloop = None
     iostate = None
     _address = None
+    # The IOLoopThread running the IOLoop of the channel, if it's shared.
+    _loop_thread = None
+    _on_loop = False
 
     def __init__(self, context, session, address):
         """Create a channel
@@ -108,14 +199,73 @@ class ZmqSocketChannel(Thread):
             raise InvalidPortNumber(message)
         self._address = address
 
+    def run(self):
+        """The thread's main activity.  Call start() instead."""
+        self._setup_socket()
+        self.ioloop.start()
+
+    def start(self):
+        """Start the channel's activity.
+
+        This starts the thread of the channel, or if it uses a shared IOLoop
+        (see :meth:`share_loop`), adds its socket to the IOLoop.
+        """
+        if self._loop_thread is None:
+            super(ZmqSocketChannel, self).start()
+        else:
+            self._on_loop = True
+            self.ioloop.add_callback(self._setup_socket)
+
     def stop(self):
         """Stop the channel's activity.
 
         This calls :method:`Thread.join` and returns when the thread
         terminates. :class:`RuntimeError` will be raised if 
-        :method:`self.start` is called again.
+        :method:`self.start` is called again. A channel on a shared IOLoop
+        removes its socket from the IOLoop instead, and can be restarted.
         """
-        self.join()
+        if self._loop_thread is None:
+            if self.ioloop is not None:
+                self.ioloop.stop()
+            self.join()
+        elif self._on_loop:
+            self._on_loop = False
+            removed = Event()
+            def remove_socket():
+                self._teardown_socket()
+                removed.set()
+            self.ioloop.add_callback(remove_socket)
+            if not self._in_loop_thread():
+                removed.wait()
+
+    def is_alive(self):
+        """Is the channel running?"""
+        if self._loop_thread is None:
+            return super(ZmqSocketChannel, self).is_alive()
+        return self._on_loop and self._loop_thread.is_alive()
+
+    def share_loop(self, loop_thread):
+        """Run the channel on the IOLoop of an IOLoopThread rather than in its
+        own thread. This must be called before the channel is started.
+        """
+        self._loop_thread = loop_thread
+        self.ioloop = loop_thread.ioloop
+
+    def _setup_socket(self):
+        """Create the socket of the channel and add it to the IOLoop.
+        Called in the IOLoop thread."""
+        raise NotImplementedError('_setup_socket must be defined in a subclass.')
+
+    def _teardown_socket(self):
+        """Remove the socket of the channel from the IOLoop and close it.
+        Called in the IOLoop thread."""
+        self.ioloop.remove_handler(self.socket)
+        self.socket.close()
+
+    def _in_loop_thread(self):
+        """Is this called in the thread running the IOLoop of the channel?"""
+        thread = self if self._loop_thread is None else self._loop_thread
+        return current_thread() is thread
 
     @property
     def address(self):
@@ -169,20 +319,17 @@ class XReqSocketChannel(ZmqSocketChannel):
         super(XReqSocketChannel, self).__init__(context, session, address)
         self.command_queue = Queue()
         self.ioloop = ioloop.IOLoop()
+        # Maps msg_ids to the ReplyFutures waiting for their reply.
+        self._futures = {}
+        self._futures_lock = Lock()
 
-    def run(self):
-        """The thread's main activity.  Call start() instead."""
+    def _setup_socket(self):
         self.socket = self.context.socket(zmq.XREQ)
         self.socket.setsockopt(zmq.IDENTITY, self.session.session)
         self.socket.connect('tcp://%s:%i' % self.address)
         self.iostate = POLLERR|POLLIN
         self.ioloop.add_handler(self.socket, self._handle_events, 
                                 self.iostate)
-        self.ioloop.start()
-
-    def stop(self):
-        self.ioloop.stop()
-        super(XReqSocketChannel, self).stop()
 
     def call_handlers(self, msg):
         """This method is called in the ioloop thread when a message arrives.
@@ -194,6 +341,40 @@ class XReqSocketChannel(ZmqSocketChannel):
         """
         raise NotImplementedError('call_handlers must be defined in a subclass.')
 
+    def request(self, method, *args, **kwargs):
+        """Send a request and return a :class:`ReplyFuture` for its reply.
+
+        Parameters
+        ----------
+        method : str
+            The name of the method sending the request, like 'execute' or
+            'complete'. The other arguments are passed to it.
+
+        Examples
+        --------
+        ::
+
+            reply = km.xreq_channel.request('execute', 'a = 1').result(10)
+        """
+        # The lock keeps the reply from being handled before the future is
+        # registered.
+        with self._futures_lock:
+            msg_id = getattr(self, method)(*args, **kwargs)
+            future = self._futures[msg_id] = ReplyFuture(msg_id)
+        return future
+
+    def cancel_requests(self):
+        """Cancel the futures of all the requests waiting for a reply.
+
+        This is for requests which won't get a reply, because the kernel
+        died or was restarted: their :meth:`ReplyFuture.result` raises
+        :class:`RequestCancelled`, and the channel forgets them.
+        """
+        with self._futures_lock:
+            futures, self._futures = self._futures.values(), {}
+        for future in futures:
+            future._cancel()
+
     def execute(self, code, silent=False,
                 user_variables=None, user_expressions=None):
         """Execute code in the kernel.
@@ -282,6 +463,53 @@ class XReqSocketChannel(ZmqSocketChannel):
         self._queue_request(msg)
         return msg['header']['msg_id']
 
+    def history(self, hist_access_type='tail', raw=True, output=False,
+                **kwargs):
+        """Get entries from the history list.
+
+        Parameters
+        ----------
+        hist_access_type : str
+            'tail' for the last entries, 'range' for a range of a session
+            or 'search' for the entries matching a pattern.
+        raw : bool
+            If True, return the raw input.
+        output : bool
+            If True, then return the output as well.
+
+        If hist_access_type is 'range', also give:
+
+        session : int
+            The session to get history from; 0 is the current session and
+            negative numbers count back from it.
+        start : int
+            The first line to get.
+        stop : int
+            The line after the last one to get, or None for the session end.
+
+        If hist_access_type is 'tail' or 'search', also give:
+
+        n : int
+            The number of entries to get (the latest ones). Optional for a
+            search, which returns all the matches without it.
+        pattern : str
+            For 'search' only, the glob pattern the input must match.
+        unique : bool
+            If True, skip the entries whose input matches a later entry.
+        before : (session, line) tuple
+            Only get the entries older than this one, to page backwards
+            through the history.
+
+        Returns
+        -------
+        The msg_id of the message sent.
+        """
+        content = dict(hist_access_type=hist_access_type, raw=raw,
+                       output=output, **kwargs)
+        msg = self.session.msg('history_request', content)
+        self._queue_request(msg)
+        return msg['header']['msg_id']
+
     def history_tail(self, n=10, raw=True, output=False):
         """Get the history list.
 
@@ -303,6 +531,27 @@ class XReqSocketChannel(ZmqSocketChannel):
         self._queue_request(msg)
         return msg['header']['msg_id']
 
+    def replay(self, after=0):
+        """Get the messages published by the kernel that the SUB channel
+        missed, among those the kernel still keeps.
+
+        Pass the 'messages' of the reply to :meth:`SubSocketChannel.replay`
+        to handle them as if they had been received on the SUB channel.
+
+        Parameters
+        ----------
+        after : int
+            Get the messages published after this one, usually the
+            last_seq of the SUB channel.
+
+        Returns
+        -------
+        The msg_id of the message sent.
+        """
+        msg = self.session.msg('replay_request', {'after' : after})
+        self._queue_request(msg)
+        return msg['header']['msg_id']
+
     def shutdown(self, restart=False):
         """Request an immediate kernel shutdown.
 
@@ -330,6 +579,11 @@ class XReqSocketChannel(ZmqSocketChannel):
 
     def _handle_recv(self):
         ident,msg = self.session.recv(self.socket, 0)
+        with self._futures_lock:
+            future = self._futures.pop(msg['parent_header'].get('msg_id'),
+                                       None)
+        if future is not None:
+            future._set_reply(msg)
         self.call_handlers(msg)
 
     def _handle_send(self):
@@ -351,16 +605,73 @@ class XReqSocketChannel(ZmqSocketChannel):
         self.add_io_state(POLLOUT)
 
 
+class ControlSocketChannel(XReqSocketChannel):
+    """The control channel, for the requests the kernel answers right away,
+    even while it runs code.
+
+    The kernel serves it in a thread of its own. Only the requests sent by the
+    methods of this class are served, plus connect, replay and shutdown; the
+    others get a reply with an 'error' status.
+    """
+
+    def status(self):
+        """Ask whether the kernel is running code, which one and for how long.
+
+        Returns
+        -------
+        The msg_id of the message sent.
+        """
+        msg = self.session.msg('status_request')
+        self._queue_request(msg)
+        return msg['header']['msg_id']
+
+    def abort(self, msg_ids=None):
+        """Abort requests sent on the XREQ channel and waiting for the kernel.
+
+        Parameters
+        ----------
+        msg_ids : list, optional
+            The msg_ids of the requests to abort, all the requests waiting by
+            default. They must have been sent with the session of this
+            channel.
+
+        Returns
+        -------
+        The msg_id of the message sent.
+        """
+        msg = self.session.msg('abort_request', {'msg_ids' : msg_ids or []})
+        self._queue_request(msg)
+        return msg['header']['msg_id']
+
+    def interrupt(self):
+        """Interrupt the code the kernel runs, if it runs any.
+
+        Returns
+        -------
+        The msg_id of the message sent.
+        """
+        msg = self.session.msg('interrupt_request')
+        self._queue_request(msg)
+        return msg['header']['msg_id']
+
+
 class SubSocketChannel(ZmqSocketChannel):
     """The SUB channel which listens for messages that the kernel publishes.
     """
 
+    # The heartbeat channel told when the kernel is busy, if any.
+    hb_channel = None
+
+    # The kernel session and sequence number of the last message received,
+    # see XReqSocketChannel.replay.
+    last_session = None
+    last_seq = 0
+
     def __init__(self, context, session, address):
         super(SubSocketChannel, self).__init__(context, session, address)
         self.ioloop = ioloop.IOLoop()
 
-    def run(self):
-        """The thread's main activity.  Call start() instead."""
+    def _setup_socket(self):
         self.socket = self.context.socket(zmq.SUB)
         self.socket.setsockopt(zmq.SUBSCRIBE,'')
         self.socket.setsockopt(zmq.IDENTITY, self.session.session)
@@ -368,11 +679,6 @@ class SubSocketChannel(ZmqSocketChannel):
         self.iostate = POLLIN|POLLERR
         self.ioloop.add_handler(self.socket, self._handle_events, 
                                 self.iostate)
-        self.ioloop.start()
-
-    def stop(self):
-        self.ioloop.stop()
-        super(SubSocketChannel, self).stop()
 
     def call_handlers(self, msg):
         """This method is called in the ioloop thread when a message arrives.
@@ -399,14 +705,33 @@ class SubSocketChannel(ZmqSocketChannel):
             The maximum amount of time to spend flushing, in seconds. The
             default is one second.
         """
+        if self._in_loop_thread():
+            # Waiting for the IOLoop would block it, read the socket instead.
+            self._handle_recv()
+            return
+
         # We do the IOLoop callback process twice to ensure that the IOLoop
         # gets to perform at least one full poll.
         stop_time = time.time() + timeout
         for i in xrange(2):
-            self._flushed = False
-            self.ioloop.add_callback(self._flush)
-            while not self._flushed and time.time() < stop_time:
-                time.sleep(0.01)
+            flushed = Event()
+            self.ioloop.add_callback(flushed.set)
+            if not flushed.wait(max(stop_time - time.time(), 0.0)):
+                break
+
+    def replay(self, msgs):
+        """Handle the messages of a replay_reply as if they had been received
+        on the channel, skipping the ones which were.
+
+        This method is thread safe.
+        """
+        def handle_msgs():
+            for msg in msgs:
+                self._handle_msg(msg)
+        if self._in_loop_thread():
+            handle_msgs()
+        else:
+            self.ioloop.add_callback(handle_msgs)
 
     def _handle_events(self, socket, events):
         # Turn on and off POLLOUT depending on if we have made a request
@@ -431,11 +756,23 @@ class SubSocketChannel(ZmqSocketChannel):
             else:
                 if msg is None:
                     break
-                self.call_handlers(msg)
-
-    def _flush(self):
-        """Callback for :method:`self.flush`."""
-        self._flushed = True
+                self._handle_msg(msg)
+
+    def _handle_msg(self, msg):
+        header = msg['header']
+        seq = header.get('seq')
+        if seq is not None:
+            if header['session'] != self.last_session:
+                # A new kernel, numbering its messages from 1.
+                self.last_session = header['session']
+            elif seq <= self.last_seq:
+                # Replayed, but already received.
+                return
+            self.last_seq = seq
+        if msg['msg_type'] == 'status' and self.hb_channel is not None:
+            state = msg['content']['execution_state']
+            self.hb_channel.set_busy(state == 'busy')
+        self.call_handlers(msg)
 
 
 class RepSocketChannel(ZmqSocketChannel):
@@ -448,19 +785,13 @@ class RepSocketChannel(ZmqSocketChannel):
         self.ioloop = ioloop.IOLoop()
         self.msg_queue = Queue()
 
-    def run(self):
-        """The thread's main activity.  Call start() instead."""
+    def _setup_socket(self):
         self.socket = self.context.socket(zmq.XREQ)
         self.socket.setsockopt(zmq.IDENTITY, self.session.session)
         self.socket.connect('tcp://%s:%i' % self.address)
         self.iostate = POLLERR|POLLIN
         self.ioloop.add_handler(self.socket, self._handle_events, 
                                 self.iostate)
-        self.ioloop.start()
-
-    def stop(self):
-        self.ioloop.stop()
-        super(RepSocketChannel, self).stop()
 
     def call_handlers(self, msg):
         """This method is called in the ioloop thread when a message arrives.
@@ -515,88 +846,51 @@ class HBSocketChannel(ZmqSocketChannel):
     Note that the heartbeat channel is paused by default. As long as you start
     this channel, the kernel manager will ensure that it is paused and un-paused
     as appropriate.
+
+    The kernel is pinged every time_to_dead seconds, or busy_time_to_dead
+    seconds while it's busy or after it missed a ping, and is declared dead
+    after max_misses pings in a row without answer (see
+    :class:`heartmonitor.HeartMonitor`).
     """
 
     time_to_dead = 3.0
-    socket = None
-    poller = None
-    _running = None
+    busy_time_to_dead = 0.5
+    max_misses = 3
+    monitor = None
     _pause = None
+    _busy = False
 
     def __init__(self, context, session, address):
         super(HBSocketChannel, self).__init__(context, session, address)
-        self._running = False
+        self.ioloop = ioloop.IOLoop()
         self._pause = True
 
-    def _create_socket(self):
-        self.socket = self.context.socket(zmq.REQ)
-        self.socket.setsockopt(zmq.IDENTITY, self.session.session)
-        self.socket.connect('tcp://%s:%i' % self.address)
-        self.poller = zmq.Poller()
-        self.poller.register(self.socket, zmq.POLLIN)
+    def _setup_socket(self):
+        self.monitor = HeartMonitor(self.context, self.ioloop)
+        self.socket = self.monitor.add_heart(
+            'kernel', self.address, self.call_handlers,
+            identity=self.session.session, interval=self.time_to_dead,
+            busy_interval=self.busy_time_to_dead, max_misses=self.max_misses)
+        self._update_state()
 
-    def run(self):
-        """The thread's main activity.  Call start() instead."""
-        self._create_socket()
-        self._running = True
-        while self._running:
-            if self._pause:
-                time.sleep(self.time_to_dead)
-            else:
-                since_last_heartbeat = 0.0
-                request_time = time.time()
-                try:
-                    #io.rprint('Ping from HB channel') # dbg
-                    self.socket.send(b'ping')
-                except zmq.ZMQError, e:
-                    #io.rprint('*** HB Error:', e) # dbg
-                    if e.errno == zmq.EFSM:
-                        #io.rprint('sleep...', self.time_to_dead) # dbg
-                        time.sleep(self.time_to_dead)
-                        self._create_socket()
-                    else:
-                        raise
-                else:
-                    while True:
-                        try:
-                            self.socket.recv(zmq.NOBLOCK)
-                        except zmq.ZMQError, e:
-                            #io.rprint('*** HB Error 2:', e) # dbg
-                            if e.errno == zmq.EAGAIN:
-                                before_poll = time.time()
-                                until_dead = self.time_to_dead - (before_poll -
-                                                                  request_time)
-
-                                # When the return value of poll() is an empty
-                                # list, that is when things have gone wrong
-                                # (zeromq bug). As long as it is not an empty
-                                # list, poll is working correctly even if it
-                                # returns quickly. Note: poll timeout is in
-                                # milliseconds.
-                                self.poller.poll(1000*until_dead)
-                            
-                                since_last_heartbeat = time.time()-request_time
-                                if since_last_heartbeat > self.time_to_dead:
-                                    self.call_handlers(since_last_heartbeat)
-                                    break
-                            else:
-                                # FIXME: We should probably log this instead.
-                                raise
-                        else:
-                            until_dead = self.time_to_dead - (time.time() -
-                                                              request_time)
-                            if until_dead > 0.0:
-                                #io.rprint('sleep...', self.time_to_dead) # dbg
-                                time.sleep(until_dead)
-                            break
+    def _teardown_socket(self):
+        self.monitor.remove_heart('kernel')
 
     def pause(self):
         """Pause the heartbeat."""
         self._pause = True
+        self._update_state_later()
 
     def unpause(self):
         """Unpause the heartbeat."""
         self._pause = False
+        self._update_state_later()
+
+    def set_busy(self, busy):
+        """Tell whether the kernel is busy, to ping it more often if so."""
+        if busy != self._busy:
+            self._busy = busy
+            self._update_state_later()
 
     def is_beating(self):
         """Is the heartbeat running and not paused."""
@@ -605,12 +899,31 @@ class HBSocketChannel(ZmqSocketChannel):
         else:
             return False
 
-    def stop(self):
-        self._running = False
-        super(HBSocketChannel, self).stop()
+    def stats(self):
+        """Return the heartbeat statistics of the kernel, as a dict (see
+        :meth:`HeartMonitor.stats`), or None if the channel isn't running."""
+        if self.monitor is None:
+            return None
+        return self.monitor.stats('kernel')
+
+    def _update_state(self):
+        """Pass the pause and busy states to the monitor. Called in the
+        IOLoop thread."""
+        if self.monitor is None or 'kernel' not in self.monitor:
+            return
+        if self._pause:
+            self.monitor.pause('kernel')
+        else:
+            self.monitor.unpause('kernel')
+        self.monitor.set_busy('kernel', self._busy)
+
+    def _update_state_later(self):
+        if self.is_alive():
+            self.ioloop.add_callback(self._update_state)
 
     def call_handlers(self, since_last_heartbeat):
-        """This method is called in the ioloop thread when a message arrives.
+        """This method is called in the ioloop thread when the kernel is
+        declared dead.
 
         Subclasses should override this method to handle incoming messages.
         It is important to remember that this method is called in the thread
@@ -634,6 +947,9 @@ class KernelManager(HasTraits):
     
     The REP channel is for the kernel to request stdin (raw_input) from the
     frontend.
+
+    Each channel runs in its own thread, unless shared_loop is set: the
+    channels then all run on the IOLoop of a single thread.
     """
     # The PyZMQ Context to use for communication with the kernel.
     context = Instance(zmq.Context,(),{})
@@ -649,19 +965,27 @@ class KernelManager(HasTraits):
     sub_address = TCPAddress((LOCALHOST, 0))
     rep_address = TCPAddress((LOCALHOST, 0))
     hb_address = TCPAddress((LOCALHOST, 0))
+    control_address = TCPAddress((LOCALHOST, 0))
 
     # The classes to use for the various channels.
     xreq_channel_class = Type(XReqSocketChannel)
     sub_channel_class = Type(SubSocketChannel)
     rep_channel_class = Type(RepSocketChannel)
     hb_channel_class = Type(HBSocketChannel)
+    control_channel_class = Type(ControlSocketChannel)
+
+    # Whether the channels share a single IOLoop thread. This must be set
+    # before the channels are created.
+    shared_loop = Bool(False)
 
     # Protected traits.
     _launch_args = Any
+    _loop_thread = Any
     _xreq_channel = Any
     _sub_channel = Any
     _rep_channel = Any
     _hb_channel = Any
+    _control_channel = Any
 
     def __init__(self, **kwargs):
         super(KernelManager, self).__init__(**kwargs)
@@ -672,7 +996,8 @@ class KernelManager(HasTraits):
     # Channel management methods:
     #--------------------------------------------------------------------------
 
-    def start_channels(self, xreq=True, sub=True, rep=True, hb=True):
+    def start_channels(self, xreq=True, sub=True, rep=True, hb=True,
+                       control=False):
         """Starts the channels for this kernel.
 
         This will create the channels if they do not exist and then start
@@ -680,6 +1005,9 @@ class KernelManager(HasTraits):
         must first call :method:`start_kernel`. If the channels have been
         stopped and you call this, :class:`RuntimeError` will be raised.
         """
+        if self.shared_loop and (xreq or sub or rep or hb or control):
+            if not self.loop_thread.is_alive():
+                self.loop_thread.start()
         if xreq:
             self.xreq_channel.start()
         if sub:
@@ -688,6 +1016,8 @@ class KernelManager(HasTraits):
             self.rep_channel.start()
         if hb:
             self.hb_channel.start()
+        if control:
+            self.control_channel.start()
 
     def stop_channels(self):
         """Stops all the running channels for this kernel.
@@ -700,12 +1030,20 @@ class KernelManager(HasTraits):
             self.rep_channel.stop()
         if self.hb_channel.is_alive():
             self.hb_channel.stop()
+        if self._control_channel is not None and \
+                self._control_channel.is_alive():
+            self._control_channel.stop()
+        if self._loop_thread is not None and self._loop_thread.is_alive():
+            self._loop_thread.stop()
+        self._cancel_requests()
 
     @property
     def channels_running(self):
         """Are any of the channels created and running?"""
         return (self.xreq_channel.is_alive() or self.sub_channel.is_alive() or
-                self.rep_channel.is_alive() or self.hb_channel.is_alive())
+                self.rep_channel.is_alive() or self.hb_channel.is_alive() or
+                (self._control_channel is not None and
+                 self._control_channel.is_alive()))
 
     #--------------------------------------------------------------------------
     # Kernel process management methods:
@@ -722,10 +1060,11 @@ class KernelManager(HasTraits):
         ipython : bool, optional (default True)
              Whether to use an IPython kernel instead of a plain Python kernel.
         """
-        xreq, sub, rep, hb = self.xreq_address, self.sub_address, \
-            self.rep_address, self.hb_address
+        xreq, sub, rep, hb, control = self.xreq_address, self.sub_address, \
+            self.rep_address, self.hb_address, self.control_address
         if xreq[0] not in LOCAL_IPS or sub[0] not in LOCAL_IPS or \
-                rep[0] not in LOCAL_IPS or hb[0] not in LOCAL_IPS:
+                rep[0] not in LOCAL_IPS or hb[0] not in LOCAL_IPS or \
+                control[0] not in LOCAL_IPS:
             raise RuntimeError("Can only launch a kernel on a local interface. "
                                "Make sure that the '*_address' attributes are "
                                "configured properly. "
@@ -737,13 +1076,14 @@ class KernelManager(HasTraits):
             from ipkernel import launch_kernel
         else:
             from pykernel import launch_kernel
-        self.kernel, xrep, pub, req, _hb = launch_kernel(
+        self.kernel, xrep, pub, req, _hb, _control = launch_kernel(
             xrep_port=xreq[1], pub_port=sub[1], 
-            req_port=rep[1], hb_port=hb[1], **kw)
+            req_port=rep[1], hb_port=hb[1], control_port=control[1], **kw)
         self.xreq_address = (xreq[0], xrep)
         self.sub_address = (sub[0], pub)
         self.rep_address = (rep[0], req)
         self.hb_address = (hb[0], _hb)
+        self.control_address = (control[0], _control)
 
     def shutdown_kernel(self, restart=False):
         """ Attempts to the stop the kernel process cleanly. If the kernel
@@ -760,8 +1100,13 @@ class KernelManager(HasTraits):
 
         # Don't send any additional kernel kill messages immediately, to give
         # the kernel a chance to properly execute shutdown actions. Wait for at
-        # most 1s, checking every 0.1s.
-        self.xreq_channel.shutdown(restart=restart)
+        # most 1s, checking every 0.1s. The control channel doesn't wait for
+        # the code the kernel runs.
+        if self._control_channel is not None and \
+                self._control_channel.is_alive():
+            self._control_channel.shutdown(restart=restart)
+        else:
+            self.xreq_channel.shutdown(restart=restart)
         for i in range(10):
             if self.is_alive:
                 time.sleep(0.1)
@@ -771,6 +1116,7 @@ class KernelManager(HasTraits):
             # OK, we've waited long enough.
             if self.has_kernel:
                 self.kill_kernel()
+        self._cancel_requests()
     
     def restart_kernel(self, now=False):
         """Restarts a kernel with the same arguments that were used to launch
@@ -826,6 +1172,7 @@ class KernelManager(HasTraits):
                 if not (sys.platform == 'win32' and e.winerror == 5):
                     raise
             self.kernel = None
+            self._cancel_requests()
         else:
             raise RuntimeError("Cannot kill kernel. No kernel is running!")
 
@@ -870,6 +1217,14 @@ class KernelManager(HasTraits):
     # Channels used for communication with the kernel:
     #--------------------------------------------------------------------------
 
+    @property
+    def loop_thread(self):
+        """Get the thread running the IOLoop shared by the channels, when
+        shared_loop is set."""
+        if self._loop_thread is None:
+            self._loop_thread = IOLoopThread()
+        return self._loop_thread
+
     @property
     def xreq_channel(self):
         """Get the REQ socket channel object to make requests of the kernel."""
@@ -877,6 +1232,8 @@ class KernelManager(HasTraits):
             self._xreq_channel = self.xreq_channel_class(self.context, 
                                                          self.session,
                                                          self.xreq_address)
+            if self.shared_loop:
+                self._xreq_channel.share_loop(self.loop_thread)
         return self._xreq_channel
 
     @property
@@ -886,6 +1243,9 @@ class KernelManager(HasTraits):
             self._sub_channel = self.sub_channel_class(self.context,
                                                        self.session,
                                                        self.sub_address)
+            if self.shared_loop:
+                self._sub_channel.share_loop(self.loop_thread)
+            self._sub_channel.hb_channel = self.hb_channel
         return self._sub_channel
 
     @property
@@ -895,6 +1255,8 @@ class KernelManager(HasTraits):
             self._rep_channel = self.rep_channel_class(self.context, 
                                                        self.session,
                                                        self.rep_address)
+            if self.shared_loop:
+                self._rep_channel.share_loop(self.loop_thread)
         return self._rep_channel
 
     @property
@@ -905,4 +1267,24 @@ class KernelManager(HasTraits):
             self._hb_channel = self.hb_channel_class(self.context, 
                                                        self.session,
                                                        self.hb_address)
+            if self.shared_loop:
+                self._hb_channel.share_loop(self.loop_thread)
         return self._hb_channel
+
+    @property
+    def control_channel(self):
+        """Get the control channel object, for the requests answered even
+        while the kernel runs code. It is only started by start_channels if
+        asked to."""
+        if self._control_channel is None:
+            self._control_channel = self.control_channel_class(
+                self.context, self.session, self.control_address)
+            if self.shared_loop:
+                self._control_channel.share_loop(self.loop_thread)
+        return self._control_channel
+
+    def _cancel_requests(self):
+        """Cancel the futures of the requests which won't get a reply."""
+        for channel in (self._xreq_channel, self._control_channel):
+            if channel is not None:
+                channel.cancel_requests()
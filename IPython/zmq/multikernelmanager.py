@@ -0,0 +1,301 @@
+"""A manager for many kernels, for servers hosting kernels for many clients.
+
+A :class:`KernelManager` runs four channel threads, each with its own
+:class:`IOLoop`, for the single kernel it manages. :class:`MultiKernelManager`
+keeps one :class:`KernelManager` per kernel for starting, stopping and
+signaling the kernel process only; the messages of all the kernels go through
+:class:`ZMQStream` objects on a single IOLoop, in one thread, and one ZMQ
+context.
+"""
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2008-2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+# Standard library imports.
+from threading import Thread
+import time
+import uuid
+
+# System library imports.
+import zmq
+from zmq.eventloop import ioloop
+from zmq.eventloop.zmqstream import ZMQStream
+
+# Local imports.
+from IPython.utils.traitlets import HasTraits, Any, Dict, Instance, Type
+from heartmonitor import HeartMonitor
+from kernelmanager import KernelManager
+
+#-----------------------------------------------------------------------------
+# Classes
+#-----------------------------------------------------------------------------
+
+class MultiKernelManager(HasTraits):
+    """Manage many kernels, identified by their kernel id.
+
+    The kernels are started with :meth:`start_kernel`, which returns the id
+    the other methods take. Messages are exchanged with the kernels through
+    the streams made by :meth:`create_stream`, which all run on :attr:`ioloop`:
+    either call :meth:`start_loop` to run it in a thread, or run it yourself.
+    Like everything on an IOLoop, the streams must only be used from the
+    thread running it (use ``ioloop.add_callback`` from other threads).
+    """
+
+    # The ZMQ context shared by the sockets of all the kernels.
+    context = Instance(zmq.Context, (), {})
+
+    # The IOLoop all the streams run on.
+    ioloop = Instance(ioloop.IOLoop, (), {})
+
+    # The class managing each kernel process.
+    kernel_manager_class = Type(KernelManager)
+
+    # The default resource limits of the kernel processes, see
+    # IPython.zmq.entry_point.resource_limiter.
+    limits = Dict()
+
+    # Protected traits.
+    _kernels = Dict()
+    _streams = Dict()
+    _loop_thread = Any
+    _heart_monitor = Any
+
+    #--------------------------------------------------------------------------
+    # Kernel process management methods:
+    #--------------------------------------------------------------------------
+
+    def start_kernel(self, kernel_id=None, limits=None, **kwargs):
+        """Start a new kernel and return its kernel id.
+
+        Parameters
+        ----------
+        kernel_id : str, optional
+            The id of the kernel, a new uuid by default.
+        limits : dict, optional
+            Resource limits for this kernel, overriding the ones in
+            :attr:`limits`.
+        **kwargs :
+            Passed to :meth:`KernelManager.start_kernel`.
+        """
+        if kernel_id is None:
+            kernel_id = unicode(uuid.uuid4())
+        if kernel_id in self._kernels:
+            raise KeyError('A kernel with id %r already exists.' % kernel_id)
+        kernel_limits = dict(self.limits)
+        if limits:
+            kernel_limits.update(limits)
+        if kernel_limits:
+            kwargs['limits'] = kernel_limits
+        km = self.kernel_manager_class(context=self.context)
+        km.start_kernel(**kwargs)
+        self._kernels[kernel_id] = km
+        self._streams[kernel_id] = []
+        return kernel_id
+
+    def shutdown_kernel(self, kernel_id):
+        """Ask a kernel to shut down, and kill it if it hasn't within a
+        second."""
+        self.shutdown_all([kernel_id])
+
+    def shutdown_all(self, kernel_ids=None):
+        """Shut down several kernels, all the kernels by default.
+
+        The kernels are all asked to shut down first, and those still running
+        a second later are killed.
+        """
+        if kernel_ids is None:
+            kernel_ids = self.list_kernel_ids()
+        kms = [self.get_kernel(kernel_id) for kernel_id in kernel_ids]
+        for km in kms:
+            self._send_shutdown(km)
+        for i in range(10):
+            if not any(km.is_alive for km in kms):
+                break
+            time.sleep(0.1)
+        for kernel_id, km in zip(kernel_ids, kms):
+            if km.has_kernel and km.is_alive:
+                km.kill_kernel()
+            self._remove_kernel(kernel_id)
+
+    def kill_kernel(self, kernel_id):
+        """Kill a kernel, without giving it a chance to clean up."""
+        self.get_kernel(kernel_id).kill_kernel()
+        self._remove_kernel(kernel_id)
+
+    def restart_kernel(self, kernel_id, now=False):
+        """Restart a kernel with the same arguments and ports.
+
+        The streams of the kernel stay open and reconnect to the new kernel.
+
+        Parameters
+        ----------
+        now : bool, optional
+          If True, the kernel is killed rather than asked to shut down.
+        """
+        km = self.get_kernel(kernel_id)
+        monitored = self._heart_monitor is not None and \
+                    kernel_id in self._heart_monitor
+        if monitored:
+            self._call_in_loop(self._heart_monitor.pause, kernel_id)
+        if km.has_kernel:
+            if now:
+                km.kill_kernel()
+            else:
+                self._send_shutdown(km, restart=True)
+                for i in range(10):
+                    if not km.is_alive:
+                        break
+                    time.sleep(0.1)
+                else:
+                    km.kill_kernel()
+        km.start_kernel(**km._launch_args)
+        if monitored:
+            self._call_in_loop(self._heart_monitor.unpause, kernel_id)
+
+    def interrupt_kernel(self, kernel_id):
+        """Interrupt a kernel, see :meth:`KernelManager.interrupt_kernel`."""
+        self.get_kernel(kernel_id).interrupt_kernel()
+
+    def signal_kernel(self, kernel_id, signum):
+        """Send a signal to a kernel (Unix only)."""
+        self.get_kernel(kernel_id).signal_kernel(signum)
+
+    def get_kernel(self, kernel_id):
+        """Get the KernelManager of a kernel, a KeyError is raised if there is
+        no kernel with this id."""
+        try:
+            return self._kernels[kernel_id]
+        except KeyError:
+            raise KeyError('Unknown kernel id: %r' % kernel_id)
+
+    def list_kernel_ids(self):
+        """Return the ids of the kernels, in no particular order."""
+        return self._kernels.keys()
+
+    def __len__(self):
+        return len(self._kernels)
+
+    def __contains__(self, kernel_id):
+        return kernel_id in self._kernels
+
+    #--------------------------------------------------------------------------
+    # Communication with the kernels:
+    #--------------------------------------------------------------------------
+
+    def create_stream(self, kernel_id, channel):
+        """Create a stream connected to one of the channels of a kernel.
+
+        Parameters
+        ----------
+        channel : str
+            One of 'xreq' (requests and replies), 'sub' (what the kernel
+            publishes), 'rep' (raw_input requests), 'hb' (heartbeat) or
+            'control' (requests answered while the kernel runs code).
+
+        Returns
+        -------
+        A :class:`ZMQStream` on :attr:`ioloop`. Messages are sent and received
+        on it with the Session of the kernel, ``get_kernel(id).session``. The
+        stream is closed when the kernel is shut down or killed.
+        """
+        km = self.get_kernel(kernel_id)
+        if channel == 'xreq':
+            socket_type, address = zmq.XREQ, km.xreq_address
+        elif channel == 'sub':
+            socket_type, address = zmq.SUB, km.sub_address
+        elif channel == 'rep':
+            socket_type, address = zmq.XREQ, km.rep_address
+        elif channel == 'hb':
+            socket_type, address = zmq.REQ, km.hb_address
+        elif channel == 'control':
+            socket_type, address = zmq.XREQ, km.control_address
+        else:
+            raise ValueError('Unknown channel: %r' % channel)
+        socket = self.context.socket(socket_type)
+        socket.setsockopt(zmq.IDENTITY, km.session.session)
+        if socket_type == zmq.SUB:
+            socket.setsockopt(zmq.SUBSCRIBE, '')
+        socket.connect('tcp://%s:%i' % address)
+        stream = ZMQStream(socket, self.ioloop)
+        self._streams[kernel_id].append(stream)
+        return stream
+
+    @property
+    def heart_monitor(self):
+        """The :class:`HeartMonitor` of the kernels, on :attr:`ioloop`. Its
+        stats(kernel_id) method gives the heartbeat latency of a kernel."""
+        if self._heart_monitor is None:
+            self._heart_monitor = HeartMonitor(self.context, self.ioloop)
+        return self._heart_monitor
+
+    def monitor_heartbeat(self, kernel_id, callback):
+        """Call callback(kernel_id, since_last_heartbeat) when a kernel stops
+        answering its heartbeat.
+
+        Like the streams, the heartbeat is checked on :attr:`ioloop`; this
+        must be called from its thread or before it runs.
+        """
+        km = self.get_kernel(kernel_id)
+        self.heart_monitor.add_heart(kernel_id, km.hb_address,
+                                     lambda since: callback(kernel_id, since),
+                                     identity=km.session.session)
+
+    def start_loop(self):
+        """Run :attr:`ioloop` in a daemon thread."""
+        if self._loop_thread is None:
+            self._loop_thread = Thread(target=self.ioloop.start)
+            self._loop_thread.daemon = True
+            self._loop_thread.start()
+
+    def stop_loop(self):
+        """Stop the thread started by :meth:`start_loop`."""
+        if self._loop_thread is not None:
+            self.ioloop.stop()
+            self._loop_thread.join()
+            self._loop_thread = None
+
+    #--------------------------------------------------------------------------
+    # Protected interface:
+    #--------------------------------------------------------------------------
+
+    def _send_shutdown(self, km, restart=False):
+        """Send a shutdown_request to a kernel, without waiting for the reply.
+        """
+        if not km.has_kernel:
+            return
+        socket = self.context.socket(zmq.XREQ)
+        # Give the message some time to go out after the socket is closed.
+        socket.setsockopt(zmq.LINGER, 1000)
+        socket.connect('tcp://%s:%i' % km.xreq_address)
+        km.session.send(socket, 'shutdown_request', {'restart' : restart})
+        socket.close()
+
+    def _remove_kernel(self, kernel_id):
+        """Forget a kernel which is not running anymore, closing its streams.
+        """
+        del self._kernels[kernel_id]
+        streams = self._streams.pop(kernel_id)
+        def close_streams():
+            for stream in streams:
+                stream.close()
+            monitor = self._heart_monitor
+            if monitor is not None and kernel_id in monitor:
+                monitor.remove_heart(kernel_id)
+        self._call_in_loop(close_streams)
+
+    def _call_in_loop(self, callback, *args):
+        """Call a function in the thread of :attr:`ioloop`, if start_loop()
+        runs it in a thread, or right away."""
+        if self._loop_thread is not None:
+            # Streams are only safe to use in the thread of their IOLoop.
+            self.ioloop.add_callback(lambda: callback(*args))
+        else:
+            callback(*args)
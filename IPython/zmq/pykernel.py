@@ -80,9 +80,12 @@ class Kernel(HasTraits):
             else:
                 handler(ident, omsg)
 
-    def record_ports(self, xrep_port, pub_port, req_port, hb_port):
+    def record_ports(self, xrep_port, pub_port, req_port, hb_port,
+                     control_port=None):
         """Record the ports that this kernel is using.
 
+        This kernel has no control channel, control_port is None.
+
         The creator of the Kernel instance must call this methods if they
         want the :meth:`connect_request` method to return the port numbers.
         """
@@ -248,7 +251,7 @@ class Kernel(HasTraits):
 #-----------------------------------------------------------------------------
 
 def launch_kernel(ip=None, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
-                  independent=False):
+                  independent=False, limits=None, control_port=0):
     """ Launches a localhost kernel, binding to the specified ports.
 
     Parameters
@@ -274,10 +277,19 @@ def launch_kernel(ip=None, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
         when this process dies. Note that in this case it is still good practice
         to kill kernels manually before exiting.
 
+    limits : dict, optional
+        Resource limits of the kernel process, as (name, limit) items like
+        ``{'as': 2**30, 'cpu': 3600}``; see entry_point.resource_limiter.
+        Only supported on Unix.
+
+    control_port : int, optional
+        The port to use for the control XREP channel, not served by this
+        kernel.
+
     Returns
     -------
     A tuple of form:
-        (kernel_process, xrep_port, pub_port, req_port)
+        (kernel_process, xrep_port, pub_port, req_port, hb_port, control_port)
     where kernel_process is a Popen object and the ports are integers.
     """
     extra_arguments = []
@@ -288,7 +300,8 @@ def launch_kernel(ip=None, xrep_port=0, pub_port=0, req_port=0, hb_port=0,
     
     return base_launch_kernel('from IPython.zmq.pykernel import main; main()',
                               xrep_port, pub_port, req_port, hb_port,
-                              independent, extra_arguments=extra_arguments)
+                              independent, extra_arguments=extra_arguments,
+                              limits=limits, control_port=control_port)
 
 main = make_default_main(Kernel)
 
@@ -1,4 +1,5 @@
-"""Produce SVG versions of active plots for display by the rich Qt frontend.
+"""Produce SVG or PNG versions of active plots for display by the rich Qt
+frontend.
 """
 #-----------------------------------------------------------------------------
 # Imports
@@ -6,6 +7,7 @@
 from __future__ import print_function
 
 # Standard library imports
+from base64 import encodestring
 
 import matplotlib
 from matplotlib.backends.backend_svg import new_figure_manager
@@ -13,24 +15,39 @@ from matplotlib._pylab_helpers import Gcf
 
 # Local imports.
 from IPython.core.displaypub import publish_display_data
-from IPython.lib.pylabtools import figure_to_svg
+from IPython.lib.pylabtools import (figure_to_svg, figure_to_png,
+                                    select_figure_format, SentFigures)
+
+#-----------------------------------------------------------------------------
+# Settings
+#-----------------------------------------------------------------------------
+
+# The format figures are sent in: 'svg', 'png', or 'auto' for SVG unless the
+# figure has more than raster_threshold elements (lines points, scatter
+# markers, ...), which make SVG documents huge and slow to render.
+figure_format = 'auto'
+
+# The resolution of PNG figures, in dots per inch.
+dpi = 72
+
+raster_threshold = 10000
 
 #-----------------------------------------------------------------------------
 # Functions
 #-----------------------------------------------------------------------------
 
 def show(close=False):
-    """Show all figures as SVG payloads sent to the IPython clients.
+    """Show all figures as SVG or PNG payloads sent to the IPython clients.
 
     Parameters
     ----------
     close : bool, optional
       If true, a ``plt.close('all')`` call is automatically issued after
-      sending all the SVG figures. If this is set, the figures will entirely
+      sending all the figures. If this is set, the figures will entirely
       removed from the internal list of figures.
     """
     for figure_manager in Gcf.get_all_fig_managers():
-        send_svg_figure(figure_manager.canvas.figure)
+        send_figure(figure_manager.canvas.figure)
     if close:
         matplotlib.pyplot.close('all')
 
@@ -38,36 +55,72 @@ def show(close=False):
 # This flag will be reset by draw_if_interactive when called
 show._draw_called = False
 
+# The numbers of the figures drawn on since the last flush_figures() call.
+_changed_figures = set()
+
+# What was last sent for each figure.
+_sent_figures = SentFigures()
+
 
 def draw_if_interactive():
     """
     Is called after every pylab drawing command
     """
     # We simply flag we were called and otherwise do nothing.  At the end of
-    # the code execution, a separate call to show_close() will act upon this.
+    # the code execution, a separate call to flush_figures() will act upon
+    # this.
     show._draw_called = True
+    # The command acted on the active figure.
+    manager = Gcf.get_active()
+    if manager is not None:
+        _changed_figures.add(manager.num)
 
 
-def flush_svg():
-    """Call show, close all open figures, sending all SVG images.
+def flush_figures():
+    """Send the figures changed during the last code execution.
 
-    This is meant to be called automatically and will call show() if, during
-    prior code execution, there had been any calls to draw_if_interactive.
+    This is meant to be called automatically and will send the figures on
+    which there has been calls to draw_if_interactive during prior code
+    execution, if their image differs from the one last sent.
     """
     if show._draw_called:
-        # Show is called with the default close=False here, otherwise, the
-        # Figure will be closed and not available for future plotting.
-        show()
+        for figure_manager in Gcf.get_all_fig_managers():
+            if figure_manager.num in _changed_figures:
+                send_figure(figure_manager.canvas.figure, only_changed=True)
+        _changed_figures.clear()
         show._draw_called = False
 
+# Backwards compatibility
+flush_svg = flush_figures
+
+
+def figure_data(fig):
+    """Render a figure in the configured format.
+
+    Returns a (mimetype, data) tuple, PNG data being base64 encoded.
+    """
+    fmt = select_figure_format(fig, figure_format, raster_threshold)
+    if fmt == 'png':
+        return 'image/png', encodestring(figure_to_png(fig, dpi))
+    return 'image/svg+xml', figure_to_svg(fig)
+
+
+def send_figure(fig, only_changed=False):
+    """Draw a figure and send it as an SVG or PNG payload.
 
-def send_svg_figure(fig):
-    """Draw the current figure and send it as an SVG payload.
+    If only_changed is true, the figure is not sent if it looks the same as
+    when it was last sent, and not even rendered if nothing was drawn on it.
     """
-    svg = figure_to_svg(fig)
+    if only_changed and not _sent_figures.changed(fig):
+        return
+    mimetype, data = figure_data(fig)
+    if not _sent_figures.update(fig, data) and only_changed:
+        return
     publish_display_data(
-        'IPython.zmq.pylab.backend_inline.send_svg_figure',
+        'IPython.zmq.pylab.backend_inline.send_figure',
         'Matplotlib Plot',
-        {'image/svg+xml' : svg}
+        {mimetype : data}
     )
 
+# Backwards compatibility
+send_svg_figure = send_figure
@@ -0,0 +1,81 @@
+"""Sample the stack of the kernel while it runs each cell.
+
+The :class:`CellSampler` of the shell is started and stopped by the kernel
+around each ``execute_request`` when it is turned on with ``%sample on``.
+Sampling is done from a background thread with
+:class:`IPython.lib.profiling.SamplingProfiler`, so the cell runs unmodified
+and the overhead only depends on the sampling interval.
+"""
+
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+#-----------------------------------------------------------------------------
+# Imports
+#-----------------------------------------------------------------------------
+
+import os
+
+from IPython.core.interactiveshell import InteractiveShell
+from IPython.lib.profiling import SamplingProfiler
+
+#-----------------------------------------------------------------------------
+# Code
+#-----------------------------------------------------------------------------
+
+
+class CellSampler(object):
+    """Sample each cell run by the kernel while enabled.
+
+    Attributes
+    ----------
+    enabled : bool
+        Whether the kernel samples the cells it runs.
+    interval : float
+        The sampling interval, in seconds.  The default of 10 ms costs well
+        under 1% of the run time.
+    output_dir : str
+        If not empty, the folded stacks of each sampled cell are written to
+        ``cell-<execution count>.folded`` in this directory, ready for flame
+        graph tools.
+    last : SampleStats
+        The samples of the last sampled cell.
+    """
+
+    def __init__(self, interval=0.01):
+        self.enabled = False
+        self.interval = interval
+        self.output_dir = ''
+        self.last = None
+        self._profiler = None
+
+    def start(self):
+        """Start sampling the calling thread, if enabled."""
+        if not self.enabled:
+            return
+        # Only record what runs below run_code, that is the code of the cell.
+        self._profiler = SamplingProfiler(self.interval,
+            root=InteractiveShell.run_code.im_func.func_code)
+        self._profiler.start()
+
+    def stop(self, execution_count):
+        """Stop sampling and keep the samples of the cell."""
+        if self._profiler is None:
+            return
+        self._profiler.stop()
+        stats = self._profiler.get_stats()
+        self._profiler = None
+        if not self.enabled or not stats.samples:
+            # Turned off by the cell itself, or too short to be seen: keep
+            # the samples of the cell before.
+            return
+        self.last = stats
+        if self.output_dir and self.last.samples:
+            fname = os.path.join(self.output_dir,
+                                 'cell-%i.folded' % execution_count)
+            with open(fname, 'w') as f:
+                f.write(self.last.collapsed() + '\n')
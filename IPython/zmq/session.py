@@ -1,6 +1,8 @@
 import os
 import uuid
 import pprint
+from collections import deque
+from threading import Lock
 
 import zmq
 
@@ -64,6 +66,53 @@ def extract_header(msg_or_header):
     return h
 
 
+class MessageBuffer(object):
+    """The last messages sent on a socket, numbered in sequence.
+
+    The messages are kept until there are more than max_messages of them, or
+    until their total size is more than max_bytes, so that clients which
+    connect late, or missed messages, can ask for the ones sent after the last
+    one they saw (see :meth:`Session.send`).
+    """
+
+    def __init__(self, max_messages=1000, max_bytes=10*1024*1024):
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        # The number of the last message added.
+        self.seq = 0
+        self.nbytes = 0
+        self._messages = deque()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._messages)
+
+    def add(self, msg, size):
+        """Keep a message, numbered with msg['header']['seq'], of the given
+        size in bytes."""
+        with self._lock:
+            self.seq = msg['header']['seq']
+            self._messages.append((self.seq, size, msg))
+            self.nbytes += size
+            while len(self._messages) > self.max_messages or \
+                  (self.nbytes > self.max_bytes and len(self._messages) > 1):
+                self.nbytes -= self._messages.popleft()[1]
+
+    def since(self, seq):
+        """Return the messages sent after the message number seq, and the
+        number of the first message kept.
+
+        If that number is above seq+1, some messages were dropped.
+        """
+        with self._lock:
+            if self._messages:
+                first = self._messages[0][0]
+            else:
+                first = self.seq + 1
+            msgs = [msg for n, size, msg in self._messages if n > seq]
+        return msgs, first
+
+
 class Session(object):
 
     def __init__(self, username=os.environ.get('USER','username'), session=None):
@@ -73,10 +122,17 @@ class Session(object):
         else:
             self.session = session
         self.msg_id = 0
+        # The kernel sends messages from its control thread too.
+        self._msg_id_lock = Lock()
+        # The number of bytes sent through some sockets, see send().
+        self.bytes_sent = {}
+        # The MessageBuffers keeping the messages sent through some sockets.
+        self.buffers = {}
 
     def msg_header(self):
-        h = msg_header(self.msg_id, self.username, self.session)
-        self.msg_id += 1
+        with self._msg_id_lock:
+            h = msg_header(self.msg_id, self.username, self.session)
+            self.msg_id += 1
         return h
 
     def msg(self, msg_type, content=None, parent=None):
@@ -114,14 +170,27 @@ class Session(object):
         -------
         msg : dict
             The message, as constructed by self.msg(msg_type,content,parent)
+
+        If the socket has a MessageBuffer in self.buffers, the message is
+        numbered with a 'seq' entry in its header and added to the buffer.
+        If the socket is in self.bytes_sent, the size of the message is added
+        to its count.
         """
         if isinstance(msg_or_type, (Message, dict)):
             msg = dict(msg_or_type)
         else:
             msg = self.msg(msg_or_type, content, parent)
+        buffer = self.buffers.get(socket)
+        if buffer is not None:
+            msg['header'] = dict(msg['header'], seq=buffer.seq + 1)
         if ident is not None:
             socket.send(ident, zmq.SNDMORE)
-        socket.send_json(msg)
+        data = json.dumps(msg)
+        socket.send(data)
+        if socket in self.bytes_sent:
+            self.bytes_sent[socket] += len(data)
+        if buffer is not None:
+            buffer.add(msg, len(data))
         return msg
     
     def recv(self, socket, mode=zmq.NOBLOCK):
@@ -0,0 +1,140 @@
+"""Tests for the pipelined kernel client.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+from threading import Event, Thread
+
+import nose.tools as nt
+import zmq
+
+from ..client import ExecuteFuture, PipelineClient
+from ..kernelmanager import KernelManager, RequestTimeout
+
+
+def stream(name, data):
+    return {'msg_type' : 'stream', 'content' : {'name' : name, 'data' : data}}
+
+
+def status(state):
+    return {'msg_type' : 'status', 'content' : {'execution_state' : state}}
+
+
+def reply(status):
+    return {'msg_type' : 'execute_reply', 'content' : {'status' : status}}
+
+
+def test_execute_future():
+    # The reply may come before or after the output, the future is done
+    # once it has both.
+    for early_reply in (True, False):
+        future = ExecuteFuture(1)
+        if early_reply:
+            future._add_reply(reply('ok'))
+        for msg in (status('busy'), stream('stdout', 'a'),
+                    stream('stderr', 'b'), stream('stdout', 'c')):
+            future._add_output(msg)
+        nt.assert_false(future.done())
+        future._add_output(status('idle'))
+        if not early_reply:
+            nt.assert_false(future.done())
+            future._add_reply(reply('ok'))
+        nt.assert_equal(future.result(0), reply('ok'))
+        nt.assert_equal(future.stdout, 'ac')
+        nt.assert_equal(future.stderr, 'b')
+        nt.assert_equal(len(future.outputs), 3)
+
+
+def test_aborted_future():
+    # Nothing is published for aborted requests.
+    future = ExecuteFuture(1)
+    future._add_reply(reply('aborted'))
+    nt.assert_equal(future.result(0), reply('aborted'))
+    nt.assert_equal(future.outputs, [])
+
+
+def test_pipeline():
+    km = KernelManager()
+    km.start_kernel()
+    client = PipelineClient(km.xreq_address, km.sub_address,
+                            context=km.context, max_pending=5)
+    try:
+        client.start()
+        futures = [client.execute('print %i' % i) for i in range(20)]
+        nt.assert_true(client.pending <= 5)
+        client.wait(30)
+        nt.assert_equal(client.pending, 0)
+        nt.assert_equal([future.stdout for future in futures],
+                        ['%i\n' % i for i in range(20)])
+        # With too many requests pending, execute gives up after timeout.
+        client.max_pending = 1
+        client.execute('import time; time.sleep(1)')
+        nt.assert_raises(RequestTimeout, client.execute, '1', timeout=0.1)
+    finally:
+        client.stop()
+        km.kill_kernel()
+
+
+def test_pipeline_error():
+    # The requests queued after an error are aborted, and done all the same.
+    km = KernelManager()
+    km.start_kernel()
+    client = PipelineClient(km.xreq_address, km.sub_address,
+                            context=km.context)
+    try:
+        client.start()
+        futures = [client.execute('import time; time.sleep(0.5)'),
+                   client.execute('1/0')]
+        futures += [client.execute('print %i' % i) for i in range(5)]
+        client.wait(30)
+        nt.assert_equal(client.pending, 0)
+        statuses = [future.result(0)['content']['status']
+                    for future in futures]
+        nt.assert_equal(statuses[:2], ['ok', 'error'])
+        nt.assert_equal(set(statuses[2:]), set(['aborted']))
+        # The kernel runs the requests sent after that.
+        nt.assert_equal(client.execute('print 1').result(10)['content']
+                        ['status'], 'ok')
+    finally:
+        client.stop()
+        km.kill_kernel()
+
+
+def test_pipeline_interrupts():
+    # Interrupts come at any point of the requests, but the kernel still
+    # sends all the replies and 'idle' statuses, and stays up.
+    km = KernelManager()
+    km.start_kernel()
+    client = PipelineClient(km.xreq_address, km.sub_address,
+                            context=km.context, max_pending=10)
+    control = km.context.socket(zmq.XREQ)
+    control.connect('tcp://%s:%i' % km.control_address)
+    done = Event()
+    def interrupt():
+        while not done.is_set():
+            km.session.send(control, 'interrupt_request')
+            done.wait(0.002)
+    thread = Thread(target=interrupt)
+    try:
+        client.start()
+        thread.start()
+        futures = [client.execute('x = %i' % i, timeout=30)
+                   for i in range(100)]
+        client.wait(30)
+        done.set()
+        thread.join()
+        statuses = set(future.result(0)['content']['status']
+                       for future in futures)
+        nt.assert_true(statuses <= set(['ok', 'error', 'aborted']))
+        nt.assert_true(km.is_alive)
+        nt.assert_equal(client.execute('x = 1').result(10)['content']
+                        ['status'], 'ok')
+    finally:
+        done.set()
+        client.stop()
+        control.close()
+        km.kill_kernel()
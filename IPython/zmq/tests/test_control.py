@@ -0,0 +1,43 @@
+"""Tests for the control channel thread.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+import nose.tools as nt
+import zmq
+
+from ..control import ControlThread
+from ..session import Session
+
+
+def test_error_replies():
+    context = zmq.Context()
+    xrep = context.socket(zmq.XREP)
+    port = xrep.bind_to_random_port('tcp://127.0.0.1')
+    xreq = context.socket(zmq.XREQ)
+    xreq.connect('tcp://127.0.0.1:%i' % port)
+    session = Session()
+    def fail(ident, msg):
+        raise ValueError('bad request')
+    def echo(ident, msg):
+        session.send(xrep, 'echo_reply', msg['content'], msg, ident)
+    ControlThread(session, xrep, dict(fail_request=fail,
+                                      echo_request=echo)).start()
+    try:
+        for msg_type in ('fail_request', 'other_request', 'echo_request'):
+            session.send(xreq, msg_type, {'x' : 1})
+        replies = [session.recv(xreq, 0)[1] for i in range(3)]
+    finally:
+        xreq.close()
+    nt.assert_equal([reply['msg_type'] for reply in replies],
+                    ['fail_reply', 'other_reply', 'echo_reply'])
+    nt.assert_equal(replies[0]['content'], {'status' : 'error',
+                                            'ename' : 'ValueError',
+                                            'evalue' : 'bad request'})
+    nt.assert_equal(replies[1]['content']['ename'], 'UnknownMessageType')
+    # The thread keeps serving after the errors.
+    nt.assert_equal(replies[2]['content'], {'x' : 1})
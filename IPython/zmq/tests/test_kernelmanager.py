@@ -0,0 +1,81 @@
+"""Tests for the kernel manager channels.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+from threading import Thread, Timer
+
+import nose.tools as nt
+
+from ..kernelmanager import (ReplyFuture, RequestTimeout, RequestCancelled,
+                             IOLoopThread, XReqSocketChannel)
+
+
+class ReplySession(object):
+    """A session receiving the replies it is given, whatever the socket."""
+
+    def __init__(self):
+        self.session = 'session'
+        self.replies = []
+
+    def recv(self, socket, mode):
+        return 'ident', self.replies.pop(0)
+
+
+class FastReplyChannel(XReqSocketChannel):
+    """A channel whose replies are handled before request() returns."""
+
+    def call_handlers(self, msg):
+        pass
+
+    def ping(self, msg_id):
+        self.session.replies.append({'parent_header' : {'msg_id' : msg_id}})
+        # The IOLoop thread gets the reply right away.
+        thread = Thread(target=self._handle_recv)
+        thread.start()
+        thread.join(0.1)
+        return msg_id
+
+
+def test_reply_future():
+    future = ReplyFuture(1)
+    nt.assert_false(future.done())
+    nt.assert_raises(RequestTimeout, future.result, 0.01)
+    replies = []
+    future.add_done_callback(replies.append)
+    Timer(0.01, future._set_reply, ['reply']).start()
+    nt.assert_equal(future.result(10), 'reply')
+    nt.assert_true(future.done())
+    # Callbacks added later are called right away.
+    future.add_done_callback(replies.append)
+    nt.assert_equal(replies, ['reply', 'reply'])
+
+
+def test_early_reply():
+    channel = FastReplyChannel(None, ReplySession(), ('127.0.0.1', 5555))
+    future = channel.request('ping', 'msg-1')
+    nt.assert_equal(future.result(10), {'parent_header' : {'msg_id' : 'msg-1'}})
+
+
+def test_cancel_requests():
+    channel = FastReplyChannel(None, ReplySession(), ('127.0.0.1', 5555))
+    future = ReplyFuture('msg-1')
+    channel._futures['msg-1'] = future
+    channel.cancel_requests()
+    nt.assert_true(future.done())
+    nt.assert_raises(RequestCancelled, future.result, 0)
+    nt.assert_equal(channel._futures, {})
+
+
+def test_ioloop_thread():
+    thread = IOLoopThread()
+    thread.start()
+    future = ReplyFuture(1)
+    thread.ioloop.add_callback(lambda: future._set_reply('called'))
+    nt.assert_equal(future.result(10), 'called')
+    thread.stop()
+    nt.assert_false(thread.is_alive())
@@ -0,0 +1,127 @@
+"""Tests for the manager of many kernels.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+import time
+
+import nose.tools as nt
+from zmq.utils import jsonapi as json
+
+from IPython.testing import decorators as dec
+from ..entry_point import resource_limiter
+from ..multikernelmanager import MultiKernelManager
+
+
+def test_start_shutdown():
+    km = MultiKernelManager()
+    ids = [km.start_kernel(ipython=False) for i in range(2)]
+    try:
+        nt.assert_equal(len(km), 2)
+        nt.assert_true(ids[0] in km)
+        nt.assert_raises(KeyError, km.start_kernel, ids[0])
+        km.restart_kernel(ids[1], now=True)
+        nt.assert_true(km.get_kernel(ids[1]).is_alive)
+    finally:
+        km.shutdown_all()
+    nt.assert_equal(len(km), 0)
+    nt.assert_raises(KeyError, km.get_kernel, ids[0])
+
+
+def test_streams():
+    km = MultiKernelManager()
+    kernel_id = km.start_kernel(ipython=False)
+    session = km.get_kernel(kernel_id).session
+    replies = []
+    def on_reply(msg_list):
+        replies.append(msg_list)
+        km.ioloop.stop()
+    stream = km.create_stream(kernel_id, 'xreq')
+    stream.on_recv(on_reply)
+    session.send(stream, 'execute_request', dict(code='x=1', silent=False))
+    # Don't wait forever if the reply doesn't come.
+    km.ioloop.add_timeout(time.time() + 10, km.ioloop.stop)
+    try:
+        km.ioloop.start()
+    finally:
+        km.shutdown_all()
+    nt.assert_equal(len(replies), 1)
+    nt.assert_true(stream.closed())
+
+
+@dec.skip_win32
+def test_limits():
+    nt.assert_raises(ValueError, resource_limiter, {'no_such_limit' : 1})
+    km = MultiKernelManager(limits={'nofile' : 200})
+    kernel_id = km.start_kernel(ipython=False, limits={'core' : (0, 0)})
+    try:
+        nt.assert_equal(km.get_kernel(kernel_id)._launch_args['limits'],
+                        {'nofile' : 200, 'core' : (0, 0)})
+    finally:
+        km.shutdown_all()
+
+
+def test_heartbeat():
+    km = MultiKernelManager()
+    kernel_id = km.start_kernel(ipython=False)
+    monitor = km.heart_monitor
+    monitor.interval = monitor.busy_interval = 0.1
+    # Leave the kernel a few seconds to start.
+    monitor.max_misses = 50
+    deaths = []
+    def on_death(dead_id, since_last_heartbeat):
+        deaths.append(dead_id)
+        km.ioloop.stop()
+    def check_beating():
+        if monitor.stats(kernel_id)['received']:
+            km.get_kernel(kernel_id).kill_kernel()
+        else:
+            km.ioloop.add_timeout(time.time() + 0.1, check_beating)
+    km.monitor_heartbeat(kernel_id, on_death)
+    check_beating()
+    km.ioloop.add_timeout(time.time() + 10, km.ioloop.stop)
+    try:
+        km.ioloop.start()
+        stats = monitor.stats(kernel_id)
+    finally:
+        km.shutdown_all()
+    nt.assert_equal(deaths, [kernel_id])
+    nt.assert_true(stats['latency_max'] >= stats['latency_mean'] > 0)
+    nt.assert_false(kernel_id in monitor)
+
+
+def test_control():
+    km = MultiKernelManager()
+    kernel_id = km.start_kernel()
+    session = km.get_kernel(kernel_id).session
+    replies = []
+    xreq = km.create_stream(kernel_id, 'xreq')
+    control = km.create_stream(kernel_id, 'control')
+    def on_recv(msg_list):
+        msg = json.loads(msg_list[-1])
+        replies.append((msg['msg_type'], msg['content']))
+        if msg['msg_type'] == 'execute_reply':
+            km.ioloop.stop()
+        elif msg['msg_type'] == 'status_reply':
+            session.send(control, 'interrupt_request')
+    xreq.on_recv(on_recv)
+    control.on_recv(on_recv)
+    session.send(xreq, 'execute_request',
+                 dict(code='import time; time.sleep(30)', silent=True))
+    # Ask for the status once the code runs.
+    km.ioloop.add_timeout(time.time() + 3,
+                          lambda: session.send(control, 'status_request'))
+    km.ioloop.add_timeout(time.time() + 20, km.ioloop.stop)
+    try:
+        km.ioloop.start()
+    finally:
+        km.shutdown_all()
+    msg_types = [msg_type for msg_type, content in replies]
+    nt.assert_equal(msg_types,
+                    ['status_reply', 'interrupt_reply', 'execute_reply'])
+    nt.assert_equal(replies[0][1]['execution_state'], 'busy')
+    nt.assert_true(replies[1][1]['interrupted'])
@@ -0,0 +1,50 @@
+"""Tests for the cell sampler of the kernel.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+
+import nose.tools as nt
+
+from ..sampler import CellSampler
+
+
+def run_cell(sampler, code, execution_count=1):
+    """Run code through run_code, as the kernel does, while sampling."""
+    sampler.start()
+    get_ipython().run_code(compile(code, '<cell>', 'exec'))
+    sampler.stop(execution_count)
+
+
+def test_disabled():
+    sampler = CellSampler(0.001)
+    run_cell(sampler, 'import time; time.sleep(0.05)')
+    nt.assert_equal(sampler.last, None)
+
+
+def test_sample_cell():
+    tmp = tempfile.mkdtemp()
+    try:
+        sampler = CellSampler(0.001)
+        sampler.enabled = True
+        sampler.output_dir = tmp
+        code = ('import time\n'
+                'end = time.time() + 0.1\n'
+                'while time.time() < end: pass\n')
+        run_cell(sampler, code, 5)
+        stats = sampler.last
+        nt.assert_true(stats.total > 10)
+        # Only the cell and what it calls is recorded.
+        for stack in stats.samples:
+            nt.assert_equal(stack[0][0], '<cell>')
+        folded = open(os.path.join(tmp, 'cell-5.folded')).read()
+        nt.assert_true(folded.startswith('<module> (<cell>:'))
+    finally:
+        shutil.rmtree(tmp)
@@ -0,0 +1,63 @@
+"""Tests for the message session.
+"""
+#-----------------------------------------------------------------------------
+#  Copyright (C) 2010  The IPython Development Team
+#
+#  Distributed under the terms of the BSD License.  The full license is in
+#  the file COPYING.txt, distributed as part of this software.
+#-----------------------------------------------------------------------------
+
+import nose.tools as nt
+
+from ..session import Session, MessageBuffer
+
+
+class DummySocket(object):
+    """A socket keeping what is sent on it."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, data, flags=0):
+        self.sent.append(data)
+
+
+def test_message_buffer():
+    session = Session()
+    socket, other_socket = DummySocket(), DummySocket()
+    buffer = session.buffers[socket] = MessageBuffer(max_messages=3)
+    msgs = [session.send(socket, 'stream', {'data' : str(i)})
+            for i in range(5)]
+    nt.assert_equal([msg['header']['seq'] for msg in msgs], range(1, 6))
+    nt.assert_equal(len(buffer), 3)
+    replayed, first_seq = buffer.since(3)
+    nt.assert_equal(first_seq, 3)
+    nt.assert_equal([msg['content']['data'] for msg in replayed], ['3', '4'])
+    nt.assert_equal(buffer.since(5), ([], 3))
+    # Messages on other sockets aren't numbered.
+    msg = session.send(other_socket, 'stream', {'data' : 'x'})
+    nt.assert_false('seq' in msg['header'])
+
+
+def test_message_buffer_bytes():
+    session = Session()
+    socket = DummySocket()
+    buffer = session.buffers[socket] = MessageBuffer(max_bytes=1)
+    for i in range(3):
+        session.send(socket, 'stream', {'data' : str(i)})
+    # The last message is kept, even if bigger than max_bytes.
+    nt.assert_equal(len(buffer), 1)
+    nt.assert_equal(buffer.nbytes, len(socket.sent[-1]))
+    nt.assert_equal(buffer.since(0)[1], 3)
+
+
+def test_bytes_sent():
+    session = Session()
+    socket, other_socket = DummySocket(), DummySocket()
+    session.bytes_sent[socket] = 0
+    for i in range(3):
+        session.send(socket, 'stream', {'data' : str(i)})
+    nt.assert_equal(session.bytes_sent[socket], sum(map(len, socket.sent)))
+    # Only the sockets asked for are counted, and kept.
+    session.send(other_socket, 'stream', {'data' : 'x'})
+    nt.assert_false(other_socket in session.bytes_sent)
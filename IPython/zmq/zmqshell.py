@@ -24,6 +24,7 @@ from IPython.core.interactiveshell import (
     InteractiveShell, InteractiveShellABC
 )
 from IPython.core import page
+from IPython.core.error import UsageError
 from IPython.core.displayhook import DisplayHook
 from IPython.core.displaypub import DisplayPublisher
 from IPython.core.macro import Macro
@@ -32,6 +33,7 @@ from IPython.utils import io
 from IPython.utils.path import get_py_filename
 from IPython.utils.traitlets import Instance, Type, Dict
 from IPython.utils.warn import warn
+from IPython.zmq.sampler import CellSampler
 from IPython.zmq.session import extract_header
 from session import Session
 
@@ -107,6 +109,9 @@ class ZMQInteractiveShell(InteractiveShell):
 
     keepkernel_on_exit = None
 
+    # Samples the stack of cells while they run, see %sample.
+    cell_sampler = Instance(CellSampler, ())
+
     def init_environment(self):
         """Configure the user's environment.
 
@@ -593,6 +598,70 @@ class ZMQInteractiveShell(InteractiveShell):
         )
         self.payload_manager.write_payload(payload)
         
+    def magic_sample(self, parameter_s=''):
+        """Sample the stack of each cell while it runs.
+
+        Usage:
+          %sample on [-i <ms>] [-d <dir>]
+          %sample off
+          %sample [-t|-f|-r]
+
+        With 'on', the kernel records the stack of every cell it runs, from a
+        background thread, until '%sample off'. Unlike %prun this doesn't
+        slow down the code being run: the default interval of 10 ms costs
+        well under 1% of the run time. Only the code of the cell (and what it
+        calls) is recorded.
+
+        Without arguments, the functions and lines seen most often in the
+        last sampled cell are shown.
+
+        Options:
+
+        -i <ms>: the sampling interval, in milliseconds. Default: 10
+
+        -d <dir>: also write the folded stacks of each sampled cell to
+        <dir>/cell-<N>.folded, where N is the prompt number. This is the
+        format read by flame graph tools like flamegraph.pl.
+
+        -t: show the call tree of the last sampled cell.
+
+        -f: show the folded stacks of the last sampled cell.
+
+        -r: return the samples of the last sampled cell, as a
+        IPython.lib.profiling.SampleStats object.
+        """
+        opts, args = self.parse_options(parameter_s, 'i:d:tfr')
+        sampler = self.cell_sampler
+        if args == 'on':
+            if opts.has_key('i'):
+                sampler.interval = float(opts.i)/1000
+            if opts.has_key('d'):
+                output_dir = os.path.abspath(os.path.expanduser(opts.d))
+                if not os.path.isdir(output_dir):
+                    os.makedirs(output_dir)
+                sampler.output_dir = output_dir
+            sampler.enabled = True
+            print('Sampling cells every %g ms.' % (1000*sampler.interval))
+        elif args == 'off':
+            sampler.enabled = False
+            print('Cell sampling is off.')
+        elif args:
+            raise UsageError('%%sample takes on, off or no argument: %s' % args)
+        else:
+            # The cell running this is still being sampled, this is the one
+            # before it.
+            stats = sampler.last
+            if stats is None:
+                print('No cell has been sampled, use %sample on first.')
+            elif opts.has_key('r'):
+                return stats
+            elif opts.has_key('f'):
+                page.page(stats.collapsed())
+            elif opts.has_key('t'):
+                page.page(stats.tree())
+            else:
+                page.page(stats.report())
+
     def magic_Exit(self, parameter_s=''):
         """Exit IPython. If the -k option is provided, the kernel will be left
         running. Otherwise, it will shutdown without prompting.
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+"""Benchmark the pending deferred bookkeeping of the controller.
+
+Every non-blocking call on the multiengine interface (``block=False``) goes
+through `PendingDeferredManager.save_pending_deferred` on the controller and
+the result is later retrieved with `get_pending_deferred`.  This script drives
+a `SynchronousMultiEngine` that wraps a trivial in-process multiengine, so only
+the bookkeeping cost is measured (no engines or network are needed)::
+
+    python pendingdeferred_benchmark.py -n 100000
+
+The time per operation should stay flat as -n grows.
+"""
+from optparse import OptionParser
+
+from twisted.internet import defer
+
+from IPython.utils.timing import time
+from IPython.kernel.multiengine import SynchronousMultiEngine
+
+
+class NullMultiEngine(object):
+    """A multiengine whose execute returns immediately."""
+
+    def execute(self, lines, targets='all'):
+        return defer.succeed([])
+
+
+def collect(result, into):
+    into.append(result)
+
+
+def main():
+    parser = OptionParser()
+    parser.set_defaults(n=100000)
+    parser.add_option("-n", type='int', dest='n',
+        help='the number of non-blocking executes to submit')
+    (opts, args) = parser.parse_args()
+
+    sme = SynchronousMultiEngine(NullMultiEngine())
+    dids = []
+
+    start = time.time()
+    for i in xrange(opts.n):
+        sme.execute('pass', block=False).addCallback(collect, dids)
+    submitted = time.time()
+    stats = sme.get_pending_deferred_stats()
+    for did in dids:
+        sme.get_pending_deferred(did, False)
+    stop = time.time()
+
+    print "submitted %i non-blocking executes in %.3f secs (%.2f usec each)" % \
+        (opts.n, submitted-start, 1e6*(submitted-start)/opts.n)
+    print "held %i uncollected results, about %.1f MB" % \
+        (stats['completed'], stats['result_bytes']/1e6)
+    print "collected %i results in %.3f secs (%.2f usec each)" % \
+        (opts.n, stop-submitted, 1e6*(stop-submitted)/opts.n)
+    print "remaining:", sme.get_pending_deferred_stats()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""Benchmark the partitioning done by scatter and gather.
+
+By default this only measures the client side work of partitioning a
+sequence into one piece per engine and joining the pieces back together,
+for lists and NumPy arrays::
+
+    python scatter_benchmark.py -e 64 -n 1000000
+
+With -c the full scatter/gather round trip is timed against a running
+cluster instead (the number of engines is then that of the cluster)::
+
+    ipcluster start -n 64
+    python scatter_benchmark.py -c -n 1000000
+"""
+from optparse import OptionParser
+
+import numpy
+
+from IPython.utils.timing import time
+from IPython.kernel import map as Map
+
+
+def best_of(repeat, f, *args):
+    times = []
+    for i in range(repeat):
+        start = time.time()
+        f(*args)
+        times.append(time.time()-start)
+    return min(times)
+
+
+def bench_local(seq, nengines, dist, repeat):
+    m = Map.get_map(dist)
+    parts = m.getPartitions(seq, nengines)
+    t_scatter = best_of(repeat, m.getPartitions, seq, nengines)
+    t_gather = best_of(repeat, m.joinPartitions, parts)
+    return t_scatter, t_gather
+
+
+def bench_cluster(mec, seq, dist, repeat):
+    t_scatter = best_of(repeat, mec.scatter, 'x', seq, dist)
+    t_gather = best_of(repeat, mec.gather, 'x', dist)
+    return t_scatter, t_gather
+
+
+def main():
+    parser = OptionParser()
+    parser.set_defaults(n=1000000, engines=64, repeat=5, cluster=False)
+    parser.add_option("-n", type='int', dest='n',
+        help='the number of elements in the sequence')
+    parser.add_option("-e", type='int', dest='engines',
+        help='the number of partitions (engines) for the local benchmark')
+    parser.add_option("-r", type='int', dest='repeat',
+        help='the number of repeats, the best time is reported')
+    parser.add_option("-c", action='store_true', dest='cluster',
+        help='scatter/gather through a running cluster')
+    (opts, args) = parser.parse_args()
+
+    if opts.cluster:
+        from IPython.kernel import client
+        mec = client.MultiEngineClient()
+        mec.block = True
+        nengines = len(mec.get_ids())
+    else:
+        nengines = opts.engines
+
+    data = [('list', range(opts.n)),
+            ('array', numpy.arange(opts.n, dtype='float64'))]
+    print "%i elements over %i engines" % (opts.n, nengines)
+    for name, seq in data:
+        for dist in ['b', 'r']:
+            if opts.cluster:
+                ts, tg = bench_cluster(mec, seq, dist, opts.repeat)
+            else:
+                ts, tg = bench_local(seq, nengines, dist, opts.repeat)
+            print "%-6s dist=%s  scatter: %8.3f ms  gather: %8.3f ms" % \
+                (name, dist, 1000*ts, 1000*tg)
+
+
+if __name__ == '__main__':
+    main()
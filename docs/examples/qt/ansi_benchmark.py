@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""Benchmark the parsing of ANSI escape codes done by the Qt console.
+
+AnsiCodeProcessor.split_string is run over typical console output: colored
+tracebacks as made by IPython, plain text, and colored progress lines. Only
+the pure Python parsing is timed, no Qt formats are built::
+
+    python ansi_benchmark.py -n 200
+"""
+import sys
+from optparse import OptionParser
+
+from IPython.core import ultratb
+from IPython.frontend.qt.console.ansi_code_processor import AnsiCodeProcessor
+from IPython.utils.timing import time
+
+
+def colored_traceback():
+    """Return the text of a colored traceback, as the kernel sends it."""
+    def f(n):
+        if n:
+            return f(n-1)
+        return {}['missing']
+    tb = ultratb.AutoFormattedTB(mode='Context', color_scheme='Linux')
+    try:
+        f(5)
+    except KeyError:
+        return tb.text(*sys.exc_info())
+
+
+def samples():
+    traceback = colored_traceback()
+    plain = ''.join('line %i of plain output\n' % i for i in xrange(200))
+    progress = ''.join('\x1b[32m%3i%%\x1b[0m [%-50s]\n' % (i, '#'*(i//2))
+                       for i in xrange(101))
+    return [('colored traceback', traceback),
+            ('plain text', plain),
+            ('colored progress', progress)]
+
+
+def best_of(repeat, f, *args):
+    times = []
+    for i in range(repeat):
+        start = time.time()
+        f(*args)
+        times.append(time.time()-start)
+    return min(times)
+
+
+def parse(processor, text, n):
+    for i in xrange(n):
+        for substring in processor.split_string(text):
+            pass
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-n', type='int', dest='number', default=200,
+                      help='times each sample is parsed [default: %default]')
+    parser.add_option('-r', type='int', dest='repeat', default=3,
+                      help='best of this many runs [default: %default]')
+    opts, args = parser.parse_args()
+
+    processor = AnsiCodeProcessor()
+    for name, text in samples():
+        t = best_of(opts.repeat, parse, processor, text, opts.number)
+        mb = len(text) * opts.number / 1e6
+        print '%-18s %8.3f s  %8.2f MB/s' % (name, t, mb / t)
+
+
+if __name__ == '__main__':
+    main()
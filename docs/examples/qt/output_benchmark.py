@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""Benchmark how fast the Qt console writes stream output from the kernel.
+
+Stream messages of one line each are fed to a FrontendWidget that is never
+shown, as they would arrive from a kernel printing in a loop, and the number
+of lines written per second is reported with output buffering (the default
+'output_flush_rate' of 30 writes per second) and without it (0, which writes
+every message as it arrives)::
+
+    python output_benchmark.py -n 50000
+
+With Qt 5 or later no display is needed, the 'offscreen' platform is used
+unless QT_QPA_PLATFORM is set. With Qt 4 on X11, run it under Xvfb.
+"""
+import os
+import time
+from optparse import OptionParser
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from IPython.external.qt import QtGui
+from IPython.frontend.qt.console.frontend_widget import FrontendWidget
+
+
+def bench(nlines, rate, buffer_size, ansi):
+    widget = FrontendWidget(output_flush_rate=rate, buffer_size=buffer_size)
+    # Accept the messages although there is no kernel.
+    widget._is_from_this_session = lambda msg: True
+    # Output comes while executing, when the buffer size is enforced.
+    widget._executing = True
+    widget._control.document().setMaximumBlockCount(buffer_size)
+    if ansi:
+        line = '\x1b[0;32mline\x1b[0m %i of the output\n'
+    else:
+        line = 'line %i of the output\n'
+
+    app = QtGui.QApplication.instance()
+    start = time.time()
+    for i in xrange(nlines):
+        widget._handle_stream({'content': {'data': line % i}})
+        # Let the event loop run as it does between messages from the kernel.
+        if i % 100 == 0:
+            app.processEvents()
+    # Wait for the last write.
+    widget._get_end_cursor()
+    app.processEvents()
+    return time.time() - start
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('-n', type='int', dest='nlines', default=50000,
+                      help='number of lines printed [default: %default]')
+    parser.add_option('-b', type='int', dest='buffer_size', default=500,
+                      help='buffer size of the console [default: %default]')
+    parser.add_option('-a', action='store_true', dest='ansi', default=False,
+                      help='color each line with ANSI codes')
+    opts, args = parser.parse_args()
+
+    app = QtGui.QApplication([])
+    for rate in (0, 30):
+        t = bench(opts.nlines, rate, opts.buffer_size, opts.ansi)
+        print 'output_flush_rate=%-3i %8.3f s  %10.0f lines/s' % (
+            rate, t, opts.nlines / t)
+
+
+if __name__ == '__main__':
+    main()